@@ -1,174 +1,328 @@
 from flask import Flask, request, jsonify
-import requests
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import hmac
 import logging
+import math
 import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timezone # <-- add timezone
 
+import metrics
+from archive import ARCHIVE_API_TOKEN, ARCHIVE_DIR, TranscriptArchive, epoch_seconds
+from batching import ZAPIER_BATCH_SIZE, ZAPIER_BATCH_WINDOW, Coalescer, result_timeout
+from circuit import ZAPIER_RATE_MAX_WAIT, DestinationUnavailable, get_guard, guard_status, open_breakers
+from dedupe import DEDUPE_WINDOW_SECONDS, IdempotencyCache, request_key
+from deadletter import DEAD_LETTER_API_TOKEN, DEAD_LETTER_REPLAY_CONCURRENCY, DEAD_LETTER_REPLAY_RATE, ReplayJob
+
+from classifier import classify_practice_area
+from http_client import DeadlineExceeded, get_client, out_of_time
+from ingest import NotAnObject, parse_body, truncate
+from leads import LEADS_API_TOKEN, LEADS_DB_PATH, LeadStore
+from profiler import PROFILE_HEADER, profile_request, section
+from routing import load_routing_table
+from rules import current_rules
+from spoken import DOMAIN_MAPPINGS, find_spoken_email, find_spoken_phone, tokenize
+from spool import SPOOL_PATH, OutboundSpool, Dispatcher
+from telemetry import (configure_logging, detail, details_enabled, emit_summary, record, request_deadline,
+                       request_trace, skipped_steps, stage, within_budget)
+from transcript import caller_turns, parse_transcript
+
 app = Flask(__name__)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Largest webhook body accepted; anything bigger is answered 413 before it is read or parsed
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', 2 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = MAX_BODY_BYTES
+# Transcript characters mined for caller info and the summary; the rest is ignored
+TRANSCRIPT_MAX_CHARS = int(os.environ.get('TRANSCRIPT_MAX_CHARS', 100000))
+# End-to-end budget for one webhook, counted from when the app starts handling it (0 = no limit)
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', 20))
+# Optional enrichment steps are skipped once this little of the budget is left - the time
+# kept back for classification and delivery
+DEADLINE_RESERVE_SECONDS = float(os.environ.get('DEADLINE_RESERVE_SECONDS', 10))
+# Characters of a failing request body / error message written to the logs
+ERROR_LOG_MAX_CHARS = int(os.environ.get('ERROR_LOG_MAX_CHARS', 2000))
+
+# Configure logging (LOG_MODE / LOG_LEVEL / LOG_SAMPLE_RATE, see telemetry.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Your Zapier webhook endpoint
-ZAPIER_WEBHOOK_URL = "https://hooks.zapier.com/hooks/catch/11662046/uu00807/"
+# Your Zapier webhook endpoint (override to point at a staging hook or benchmarks/loadtest.py's fake)
+ZAPIER_WEBHOOK_URL = os.environ.get('ZAPIER_WEBHOOK_URL', "https://hooks.zapier.com/hooks/catch/11662046/uu00807/")
+
+# "inline" posts to Zapier inside the request; "queue" spools the lead to disk,
+# answers GHL right away and lets background dispatchers do the delivery
+DELIVERY_MODE = os.environ.get('DELIVERY_MODE', 'inline').lower()
+
+# What an inline delivery does when Zapier's breaker is open or its rate limit is used up:
+# "spill" spools the lead and answers GHL 200, "reject" answers 503 + Retry-After so GHL retries
+OVERLOAD_ACTION = os.environ.get('OVERLOAD_ACTION', 'spill').lower()
+
+# Park leads whose inline delivery raised or got a non-2xx answer as dead letters for replay
+# (false: a transport error answers GHL 500, a non-2xx answer is only logged)
+DEAD_LETTERS = os.environ.get('DEAD_LETTERS', 'true').lower() == 'true'
+
+# Run warm_up() before the port opens (gunicorn, uvicorn and `python app.py`); off opens it
+# sooner and lets the first webhook pay for the tables and the HTTP client instead
+WARM_UP = os.environ.get('WARM_UP', 'true').lower() == 'true'
+
+# Threads per process for delivering one lead to several destinations at once
+FANOUT_THREADS = int(os.environ.get('FANOUT_THREADS', 16))
+
+_routing_table = None
+_fanout_pool = None
+_spool = None
+_dispatcher = None
+_spool_lock = threading.Lock()
+_spool_reader = None
+_replay_job = None
+
+def deliver_to_zapier(destination, payload, deadline=None):
+    """POST one outbound payload (or a list of them, as one array) to a Zapier catch hook over the shared pooled client.
+
+    Raises DestinationUnavailable, without sending, while the destination's breaker is open
+    or its rate limit is exhausted - and, given a request `deadline`, once retrying inline
+    would run past it.
+    """
+    if out_of_time(deadline):
+        raise DestinationUnavailable(destination, "out of time", 1)
+    guard = get_guard(destination)
+    wait = guard.admit(ZAPIER_RATE_MAX_WAIT if deadline is None else min(ZAPIER_RATE_MAX_WAIT, deadline - time.perf_counter()))
+    if wait:
+        time.sleep(wait)
+    # each configured destination gets its own connection pool and read timeout
+    route = get_routing_table().destination(destination)
+    client = get_client(route.name, route.timeout) if route else get_client()
+    metrics.ZAPIER_BATCH_LEADS.observe(len(payload) if isinstance(payload, list) else 1)
+    metrics.ZAPIER_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        response = client.post_json(destination, payload, deadline=deadline)
+    except DeadlineExceeded as e:
+        guard.record(None, time.perf_counter() - started)
+        metrics.ZAPIER_RESPONSES.inc("out_of_time")
+        raise DestinationUnavailable(destination, "out of time", max(1, e.retry_after)) from e
+    except Exception:
+        guard.record(None, time.perf_counter() - started)
+        metrics.ZAPIER_RESPONSES.inc("error")
+        raise
+    finally:
+        metrics.ZAPIER_SECONDS.observe(time.perf_counter() - started)
+        metrics.ZAPIER_IN_FLIGHT.dec()
+    guard.record(response.status_code, time.perf_counter() - started, response.headers.get('Retry-After', ''))
+    metrics.ZAPIER_RESPONSES.inc(str(response.status_code))
+    return response
+
+metrics.BREAKERS_OPEN.set_callback(open_breakers)
+
+_dedupe_cache = None
+_coalescer = None
+_lead_store = None
+_archive = None
+
+def get_routing_table():
+    """ROUTES_PATH routing table (everything to ZAPIER_WEBHOOK_URL when unset), loaded once"""
+    global _routing_table
+    if _routing_table is None:
+        with _spool_lock:
+            if _routing_table is None:
+                _routing_table = load_routing_table(ZAPIER_WEBHOOK_URL)
+    return _routing_table
+
+def get_dedupe_cache():
+    """Idempotency cache for GHL retries, or None when DEDUPE_WINDOW_SECONDS is 0"""
+    global _dedupe_cache
+    if _dedupe_cache is None and DEDUPE_WINDOW_SECONDS > 0:
+        with _spool_lock:
+            if _dedupe_cache is None:
+                _dedupe_cache = IdempotencyCache()
+    return _dedupe_cache
+
+def get_lead_store():
+    """Indexed record of every lead for repeat-caller checks and /leads, or None when LEADS_DB_PATH is unset"""
+    global _lead_store
+    if _lead_store is None and LEADS_DB_PATH:
+        with _spool_lock:
+            if _lead_store is None:
+                _lead_store = LeadStore()
+    return _lead_store
+
+def remember_lead(data, outbound_payload):
+    """Flag a caller seen before on the payload and queue the lead for the lead store"""
+    lead_store = get_lead_store()
+    if lead_store is None:
+        return
+    # a GHL retry of the same body is the same lead, not a repeat call
+    key = request_key(data)
+    with stage('lead_store'):
+        previous = lead_store.previous_leads(outbound_payload, key)
+    outbound_payload["Repeat Caller"] = previous > 0
+    outbound_payload["Previous Leads"] = previous
+    record(repeat_caller=previous > 0)
+    lead_store.add(key, outbound_payload)
+
+def get_archive():
+    """Compressed transcript archive, or None when ARCHIVE_DIR is unset"""
+    global _archive
+    if _archive is None and ARCHIVE_DIR:
+        with _spool_lock:
+            if _archive is None:
+                _archive = TranscriptArchive()
+    return _archive
+
+def archive_transcript(data, outbound_payload):
+    """Queue the webhook's transcript for the archive, keyed by contact_id"""
+    archive = get_archive()
+    if archive is None:
+        return
+    transcription = find_transcript(data)
+    if transcription:
+        archive.add(outbound_payload["Contact ID"], transcription)
+
+def get_spool():
+    """Open the outbound spool and start its dispatchers (once per process)"""
+    global _spool, _dispatcher
+    with _spool_lock:
+        if _spool is None:
+            _spool = OutboundSpool()
+            _dispatcher = Dispatcher(_spool, deliver_to_zapier, batch_size=ZAPIER_BATCH_SIZE,
+                                     batch_window=ZAPIER_BATCH_WINDOW)
+            _dispatcher.start()
+            metrics.QUEUED_DELIVERIES.set_callback(_spool.depth)
+            metrics.DEAD_LETTERS.set_callback(_spool.dead_letter_count)
+    return _spool
+
+def get_coalescer():
+    """Inline-mode batcher that groups concurrent leads into array POSTs (once per process)"""
+    global _coalescer
+    if _coalescer is None:
+        with _spool_lock:
+            if _coalescer is None:
+                _coalescer = Coalescer(deliver_to_zapier)
+    return _coalescer
+
+def send_lead(destination, outbound_payload, deadline=None):
+    """Deliver one lead inline, through the coalescer when ZAPIER_BATCH_SIZE > 1"""
+    if ZAPIER_BATCH_SIZE > 1:
+        future = get_coalescer().submit(destination, outbound_payload, deadline)
+        try:
+            return future.result(result_timeout(deadline))
+        except FutureTimeout:
+            raise DestinationUnavailable(destination, "out of time", 1) from None
+    return deliver_to_zapier(destination, outbound_payload, deadline)
+
+def _attempt(destination, outbound_payload, deadline):
+    try:
+        return send_lead(destination.url, outbound_payload, deadline)
+    except Exception as e:
+        return e
+
+def deliver_lead(destinations, outbound_payload):
+    """Send one lead to all its destinations concurrently; [(destination, response or exception)] in order.
+
+    Every delivery is bounded by the request's deadline: one that runs out of time comes
+    back as DestinationUnavailable and is shed like an overloaded destination.
+    """
+    global _fanout_pool
+    # read here - the fan-out threads do not see the request's trace
+    deadline = request_deadline()
+    if len(destinations) <= 1:
+        return [(destination, _attempt(destination, outbound_payload, deadline)) for destination in destinations]
+    if _fanout_pool is None:
+        with _spool_lock:
+            if _fanout_pool is None:
+                _fanout_pool = ThreadPoolExecutor(FANOUT_THREADS, thread_name_prefix="fanout")
+    # the request thread takes the primary destination itself; total time is the slowest one
+    futures = [_fanout_pool.submit(_attempt, destination, outbound_payload, deadline) for destination in destinations[1:]]
+    outcomes = [(destinations[0], _attempt(destinations[0], outbound_payload, deadline))]
+    outcomes.extend((destination, future.result()) for destination, future in zip(destinations[1:], futures))
+    return outcomes
+
+def settle_deliveries(outcomes, outbound_payload):
+    """Turn per-destination outcomes into the answer for GHL, shedding destinations that were unavailable.
+
+    Only the primary destination (the first) can fail the request. A GHL retry goes to
+    every destination again, so a copy that failed is spooled on its own instead.
+    """
+    result = ("OK", 200)
+    error = None
+    statuses = {}
+    for i, (destination, outcome) in enumerate(outcomes):
+        primary = i == 0
+        if isinstance(outcome, DestinationUnavailable):
+            shed = shed_delivery(destination.url, outbound_payload, outcome, OVERLOAD_ACTION if primary else 'spill')
+            if shed[1] != 200:
+                result = shed
+        elif isinstance(outcome, Exception):
+            logger.error(f"❌ Delivery to {destination.name} failed: {outcome}")
+            if dead_letter(destination, outbound_payload, f"{outcome.__class__.__name__}: {outcome}",
+                           getattr(outcome, 'attempts', 1)):
+                continue
+            if primary:
+                error = outcome
+            else:
+                spool_lead([destination], outbound_payload)
+        else:
+            statuses[destination.name] = outcome.status_code
+            if details_enabled(logger):
+                detail(logger, "%s response body: %s", destination.name, outcome.text)
+            if not 200 <= outcome.status_code < 300:
+                logger.error(f"❌ {destination.name} answered {outcome.status_code}")
+                dead_letter(destination, outbound_payload, f"HTTP {outcome.status_code}: {outcome.text[:200]}",
+                            getattr(outcome, 'attempts', 1))
+    if statuses:
+        record(zapier_status=next(iter(statuses.values())) if len(outcomes) == 1 else statuses)
+    if error is not None:
+        raise error
+    return result
+
+def dead_letter(destination, outbound_payload, error, attempts=1):
+    """Park a lead whose inline delivery failed after `attempts` POSTs for a later replay; False if it could not be stored"""
+    if not DEAD_LETTERS:
+        return False
+    try:
+        with stage('dead_letter'):
+            entry_id = get_spool().dead_letter(destination.url, outbound_payload, attempts, error)
+    except sqlite3.Error as e:
+        logger.error(f"❌ Could not dead-letter lead {outbound_payload['Contact ID']} for {destination.name}: {e}")
+        return False
+    record(dead_letter=entry_id)
+    logger.warning(f"📮 Lead {outbound_payload['Contact ID']} dead-lettered for {destination.name} (spool entry {entry_id})")
+    return True
+
+def spool_lead(destinations, outbound_payload):
+    """Queue mode: persist one spool entry per destination"""
+    with stage('enqueue'):
+        spool = get_spool()
+        entry_ids = [spool.enqueue(destination.url, outbound_payload) for destination in destinations]
+    record(spool_entry=entry_ids[0] if len(entry_ids) == 1 else entry_ids)
+
+def resume_spool():
+    """Start the dispatchers at boot when the spool may hold leads from an earlier run"""
+    if DELIVERY_MODE == 'queue' or (OVERLOAD_ACTION == 'spill' and os.path.exists(SPOOL_PATH)):
+        get_spool()
+
+def shed_delivery(destination, outbound_payload, unavailable, action=None):
+    """The destination is open, rate limited or out of time: spool the lead for later, or ask GHL to retry"""
+    action = action or OVERLOAD_ACTION
+    metrics.SHED.inc(unavailable.reason, action)
+    record(shed=unavailable.reason, overload_action=action)
+    logger.warning(f"⚠️ Shedding lead {outbound_payload['Contact ID']} ({action}): {unavailable}")
+    if action == 'spill':
+        with stage('enqueue'):
+            entry_id = get_spool().enqueue(destination, outbound_payload)
+        record(spool_entry=entry_id)
+        return "OK", 200
+    return "Service Unavailable", 503, {"Retry-After": str(math.ceil(unavailable.retry_after))}
 
 def extract_practice_area(description):
     """Extract practice area from description text - EXPANDED for all legal matters"""
-    if not description:
-        return "Other"
-
-    description_lower = description.lower()
-
-    # Personal Injury Law
-    personal_injury_keywords = [
-        "personal injury", "accident", "injury", "hurt", "slip and fall", 
-        "car accident", "auto accident", "motor vehicle", "medical malpractice", 
-        "wrongful death", "premises liability", "product liability", "dog bite",
-        "bicycle accident", "motorcycle accident", "pedestrian accident",
-        "nursing home abuse", "construction accident", "workplace injury"
-    ]
-    for keyword in personal_injury_keywords:
-        if keyword in description_lower:
-            return "Personal Injury"
-
-    # Family Law
-    family_law_keywords = [
-        "divorce", "custody", "child support", "alimony", "spousal support",
-        "marriage", "separation", "adoption", "family", "spouse", "prenup",
-        "prenuptial", "domestic violence", "restraining order", "paternity",
-        "visitation", "guardianship", "child custody", "domestic relations"
-    ]
-    for keyword in family_law_keywords:
-        if keyword in description_lower:
-            return "Family Law"
-
-    # DUI/DWI - CHECK FIRST (separate from other criminal law)
-    dui_keywords = [
-        "dui", "dwi", "owi", "drunk driving", "driving under influence", 
-        "driving under the influence", "intoxicated driving", "impaired driving"
-    ]
-    for keyword in dui_keywords:
-        if keyword in description_lower:
-            return "DUI/DWI"
-
-    # Traffic/Criminal Law - CHECK NEXT for traffic violations
-    traffic_keywords = [
-        "speeding ticket", "traffic ticket", "speeding", "traffic violation",
-        "traffic offense", "moving violation", "reckless driving", "careless driving"
-    ]
-    for keyword in traffic_keywords:
-        if keyword in description_lower:
-            return "Traffic Law"
-
-    # Criminal Law (after DUI and Traffic are checked)
-    criminal_law_keywords = [
-        "criminal", "arrest", "arrested", "charge", "charged", "offense", 
-        "crime", "theft", "shoplifting", "stealing", "assault", "battery", 
-        "probation", "jail", "prison", "felony", "misdemeanor", "warrant", 
-        "drug", "trafficking", "possession", "domestic violence", "fraud",
-        "embezzlement", "burglary", "robbery", "homicide", "manslaughter", 
-        "larceny", "petty theft", "grand theft", "citation"
-    ]
-    for keyword in criminal_law_keywords:
-        if keyword in description_lower:
-            return "Criminal Law"
-
-    # Estate Planning & Probate
-    estate_planning_keywords = [
-        "estate", "will", "trust", "inheritance", "probate", "executor",
-        "beneficiary", "death", "asset", "living will", "power of attorney",
-        "estate planning", "succession", "heir", "testamentary", "guardian",
-        "conservatorship", "elder law", "medicaid planning"
-    ]
-    for keyword in estate_planning_keywords:
-        if keyword in description_lower:
-            return "Estate Planning"
-
-    # Bankruptcy Law (check before Real Estate to avoid foreclosure conflicts)
-    bankruptcy_keywords = [
-        "bankruptcy", "chapter 7", "chapter 13", "debt", "creditor", 
-        "discharge", "filing bankruptcy", "debt relief", "debt settlement"
-    ]
-    for keyword in bankruptcy_keywords:
-        if keyword in description_lower:
-            return "Bankruptcy"
-
-    # Real Estate Law
-    real_estate_keywords = [
-        "real estate", "property", "house", "home", "closing", "deed",
-        "title", "mortgage", "foreclosure", "landlord", "tenant", "lease",
-        "eviction", "zoning", "easement", "boundary", "construction",
-        "homeowners association", "hoa", "purchase agreement"
-    ]
-    for keyword in real_estate_keywords:
-        if keyword in description_lower:
-            return "Real Estate"
-
-    # Business Law
-    business_law_keywords = [
-        "business", "contract", "llc", "corporation", "partnership",
-        "employment", "fired", "wrongful termination", "discrimination",
-        "harassment", "wage", "overtime", "breach of contract", "lawsuit",
-        "commercial", "intellectual property", "trademark", "copyright",
-        "non-compete", "partnership dispute", "shareholder"
-    ]
-    for keyword in business_law_keywords:
-        if keyword in description_lower:
-            return "Business Law"
-
-    # Immigration Law
-    immigration_keywords = [
-        "immigration", "visa", "green card", "citizenship", "deportation",
-        "asylum", "refugee", "work permit", "naturalization", "ice",
-        "immigration court", "removal proceedings", "family petition"
-    ]
-    for keyword in immigration_keywords:
-        if keyword in description_lower:
-            return "Immigration"
-
-    # Social Security Disability
-    disability_keywords = [
-        "disability", "social security", "ssdi", "ssi", "disabled",
-        "disability benefits", "social security disability"
-    ]
-    for keyword in disability_keywords:
-        if keyword in description_lower:
-            return "Social Security Disability"
-
-    # Workers' Compensation
-    workers_comp_keywords = [
-        "workers compensation", "workers comp", "work injury", 
-        "on the job injury", "workplace accident", "injured at work"
-    ]
-    for keyword in workers_comp_keywords:
-        if keyword in description_lower:
-            return "Workers' Compensation"
-
-    # Civil Rights
-    civil_rights_keywords = [
-        "civil rights", "discrimination", "police brutality", "excessive force",
-        "constitutional rights", "section 1983", "civil lawsuit"
-    ]
-    for keyword in civil_rights_keywords:
-        if keyword in description_lower:
-            return "Civil Rights"
-
-    # Tax Law
-    tax_keywords = [
-        "tax", "irs", "tax debt", "tax lien", "tax levy", "audit",
-        "tax resolution", "offer in compromise", "innocent spouse"
-    ]
-    for keyword in tax_keywords:
-        if keyword in description_lower:
-            return "Tax Law"
-
-    # If no match is found, return "General"
-    return "General"
+    with section('practice_area.keywords'):
+        return classify_practice_area(description).practice_area
 
 def extract_caller_info_from_transcript(transcription):
     """Extract caller name, phone, email from transcript text - handles ALL formats"""
@@ -178,69 +332,37 @@ def extract_caller_info_from_transcript(transcription):
         "email": ""
     }
 
-    logger.info(f"Extracting info from transcript: {transcription[:100] if transcription else 'No transcript'}...")
+    parsed = parse_transcript(transcription)
+    transcription = parsed.text
+    transcript_lower = parsed.lower
+
+    if details_enabled(logger):
+        detail(logger, "Extracting info from transcript: %s...", transcription[:100] if transcription else 'No transcript')
 
     if not transcription:
         return caller_info
 
-    # Split into lines for easier processing
-    lines = transcription.split('\n')
-
-    # Look for name patterns - EXPANDED to catch direct names
-    name_patterns = [
-        r"[Mm]y name is ([A-Za-z\s]+)",               # "My name is David Glick"
-        r"[Ii]t'?s ([A-Za-z\s]+)",                    # "It's David Glick" 
-        r"[Tt]his is ([A-Za-z\s]+)",                  # "This is David Glick"
-        r"[Ii]'m ([A-Za-z\s]+)",                      # "I'm David Glick"
-        r"[Cc]all me ([A-Za-z\s]+)",                  # "Call me David"
-        r"([A-Za-z]+\s+[A-Za-z]+)\.?"                 # "John Smith." or "John Smith" (direct response)
-    ]
-
-    # Look for the name in ANY human/caller line
-    for line in lines:
-        line = line.strip()
-
-        # Check if this is a human/caller line
-        is_human_line = (
-            line.lower().startswith('human:') or 
-            line.lower().startswith('caller:') or
-            line.lower().startswith('**caller:') or
-            '**caller:**' in line.lower() or
-            'caller:**' in line.lower()
-        )
-
-        if is_human_line:
-            # Clean the line - remove ALL prefixes
-            clean_line = line
-            clean_line = re.sub(r'^\*+\s*caller:\s*', '', clean_line, flags=re.IGNORECASE)
-            clean_line = re.sub(r'^caller:\s*', '', clean_line, flags=re.IGNORECASE)  
-            clean_line = re.sub(r'^human:\s*', '', clean_line, flags=re.IGNORECASE)
-            clean_line = re.sub(r'^\*+', '', clean_line).strip()
+    # Name patterns and their false positives come from the rules file
+    rules = current_rules()
 
-            for pattern in name_patterns:
-                match = re.search(pattern, clean_line, re.IGNORECASE)
+    # Look for the name in ANY human/caller line (prefixes already stripped by the parser)
+    with section('extract.name'):
+        for turn in caller_turns(parsed):
+            clean_line = turn.text
+            for pattern in rules.name_patterns:
+                match = pattern.search(clean_line)
                 if match:
                     potential_name = match.group(1).strip()
 
-                    # Filter out common false positives - EXPANDED
-                    false_positives = [
-                        'not sure', 'not sure what', 'good', 'fine', 'okay', 'ok',
-                        'yes', 'no', 'yeah', 'yep', 'sure', 'right', 'correct',
-                        'that', 'this', 'here', 'there', 'help', 'calling',
-                        'having trouble', 'trouble with', 'need help', 'looking for',
-                        'thank you', 'thanks', 'hello', 'hi', 'bye', 'goodbye',
-                        'hold on', 'wait', 'one moment', 'just a', 'let me',
-                        'just got', 'got a', 'need help', 'just need'
-                    ]
-
-                    is_false_positive = any(fp in potential_name.lower() for fp in false_positives)
+                    # Filter out common false positives
+                    is_false_positive = any(fp in potential_name.lower() for fp in rules.name_false_positives)
 
                     if not is_false_positive and len(potential_name) > 1:
                         words = potential_name.split()
                         if len(words) >= 1:
                             clean_name = re.sub(r',.*$', '', potential_name).strip()
                             caller_info["name"] = clean_name.title()
-                            logger.info(f"✓ Successfully extracted name: {caller_info['name']}")
+                            detail(logger, "✓ Successfully extracted name: %s", caller_info['name'])
                             break
 
             # If we found a name, break out of the outer loop too
@@ -249,179 +371,137 @@ def extract_caller_info_from_transcript(transcription):
 
     # Look for phone patterns - EXPANDED for spoken numbers
     phone_patterns = [
-        r"(\+?1?\s*\(?\d{3}\)?\s*[-.\s]?\d{3}\s*[-.\s]?\d{4})",
+        # must start on "+", "(" or a digit - starting inside a whitespace run made this quadratic
+        r"(?=[+(\d])(\+?1?\s*\(?\d{3}\)?\s*[-.\s]?\d{3}\s*[-.\s]?\d{4})",
         r"(\d{3}\s+\d{3}\s+\d{4})",
         r"(\d{10})"
     ]
 
     # First try standard digit patterns
-    for pattern in phone_patterns:
-        match = re.search(pattern, transcription)
-        if match:
-            phone = match.group(1)
-            phone = re.sub(r'[^\d+]', '', phone)
-            if phone.startswith('1') and len(phone) == 11:
-                phone = phone[1:]
-            if len(phone) == 10:
-                caller_info["phone"] = f"({phone[:3]}) {phone[3:6]}-{phone[6:]}"
-                logger.info(f"✓ Extracted phone: {caller_info['phone']}")
-                break
+    with section('extract.phone'):
+        for pattern in phone_patterns:
+            match = re.search(pattern, transcription)
+            if match:
+                phone = match.group(1)
+                phone = re.sub(r'[^\d+]', '', phone)
+                if phone.startswith('1') and len(phone) == 11:
+                    phone = phone[1:]
+                if len(phone) == 10:
+                    caller_info["phone"] = f"({phone[:3]}) {phone[3:6]}-{phone[6:]}"
+                    detail(logger, "✓ Extracted phone: %s", caller_info['phone'])
+                    break
+
+    # Spoken numbers and emails are found by a token scan rather than regex
+    # backtracking, so a long transcript with no match still costs one pass
+    spoken_tokens = None
 
-    # If no digits found, try spoken number pattern
-    if not caller_info["phone"]:
-        # More specific pattern for spoken phone numbers (exactly 10 number words)
-        spoken_pattern = r"\b((?:zero|one|two|three|four|five|six|seven|eight|nine)\s+){9}(?:zero|one|two|three|four|five|six|seven|eight|nine)\b"
-        spoken_match = re.search(spoken_pattern, transcription.lower())
-        if spoken_match:
-            spoken_numbers = spoken_match.group(0)
-            # Convert spoken to digits
-            digit_map = {
-                'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
-                'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9'
-            }
-
-            digits = ""
-            for word in spoken_numbers.split():
-                if word in digit_map:
-                    digits += digit_map[word]
-
-            if len(digits) == 10:
-                caller_info["phone"] = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
-                logger.info(f"✓ Extracted phone from spoken: {caller_info['phone']}")
-            elif len(digits) == 11 and digits.startswith('1'):
-                digits = digits[1:]  # Remove country code
-                caller_info["phone"] = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
-                logger.info(f"✓ Extracted phone from spoken (removed 1): {caller_info['phone']}")
+    # If no digits found, try spoken number pattern (skipped when the request is out of time)
+    if not caller_info["phone"] and within_budget('spoken_phone', DEADLINE_RESERVE_SECONDS):
+        with section('extract.spoken_phone'):
+            spoken_tokens = tokenize(transcript_lower)
+            digits = find_spoken_phone(spoken_tokens)
+        if digits:
+            caller_info["phone"] = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+            detail(logger, "✓ Extracted phone from spoken: %s", caller_info['phone'])
 
     # Look for email patterns - EXPANDED for spoken emails
-    email_pattern = r"([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"
-    email_match = re.search(email_pattern, transcription.lower())
+    # (the lookbehind only lets a match start at the beginning of a run, keeping the search linear)
+    email_pattern = r"(?<![a-zA-Z0-9._%+-])([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"
+    with section('extract.email'):
+        email_match = re.search(email_pattern, transcript_lower)
     if email_match:
         caller_info["email"] = email_match.group(1)
-        logger.info(f"✓ Extracted email: {caller_info['email']}")
-    else:
+        detail(logger, "✓ Extracted email: %s", caller_info['email'])
+    elif within_budget('spoken_email', DEADLINE_RESERVE_SECONDS):
         # Try spoken email patterns like "john smith at gmail dot com"
-        spoken_email_patterns = [
-            r"([a-zA-Z0-9\s]+)\s+at\s+([a-zA-Z0-9\s]+)\s+dot\s+(com|net|org|edu|gov)",
-            r"([a-zA-Z0-9\s]+)\s+@\s+([a-zA-Z0-9\s]+)\s+dot\s+(com|net|org|edu|gov)"
-        ]
-
-        # Common domain mappings for spoken emails
-        domain_mappings = {
-            'gmail': 'gmail.com',
-            'g mail': 'gmail.com', 
-            'outlook': 'outlook.com',
-            'out look': 'outlook.com',
-            'hotmail': 'hotmail.com',
-            'hot mail': 'hotmail.com',
-            'yahoo': 'yahoo.com',
-            'aol': 'aol.com',
-            'mail': 'mail.com',
-            'live': 'live.com',
-            'msn': 'msn.com',
-            'comcast': 'comcast.net',
-            'verizon': 'verizon.net',
-            'att': 'att.net',
-            'icloud': 'icloud.com',
-            'me': 'me.com'
-        }
-
-        for pattern in spoken_email_patterns:
-            match = re.search(pattern, transcription.lower())
-            if match:
-                name_part = match.group(1).strip()
-                domain_part = match.group(2).strip()
-                extension = match.group(3).strip()
+        with section('extract.spoken_email'):
+            if spoken_tokens is None:
+                spoken_tokens = tokenize(transcript_lower)
+            spoken_email = find_spoken_email(spoken_tokens)
+        if spoken_email:
+            name_part, domain_part, extension = spoken_email
 
-                logger.info(f"🔍 Found spoken email parts: '{name_part}' at '{domain_part}' dot '{extension}'")
+            detail(logger, "🔍 Found spoken email parts: '%s' at '%s' dot '%s'", name_part, domain_part, extension)
 
-                # Clean up the name part (remove spaces, make lowercase)
-                clean_name = re.sub(r'\s+', '', name_part.lower())
+            # Clean up the name part (remove spaces)
+            clean_name = name_part.replace(' ', '')
 
-                # Map spoken domain to actual domain
-                if domain_part in domain_mappings:
-                    email_domain = domain_mappings[domain_part]
-                else:
-                    # Fallback: construct domain from parts
-                    clean_domain = re.sub(r'\s+', '', domain_part.lower())
-                    email_domain = f"{clean_domain}.{extension}"
-
-                constructed_email = f"{clean_name}@{email_domain}"
+            # Map spoken domain to actual domain
+            if domain_part in DOMAIN_MAPPINGS:
+                email_domain = DOMAIN_MAPPINGS[domain_part]
+            else:
+                # Fallback: construct domain from parts
+                email_domain = f"{domain_part.replace(' ', '')}.{extension}"
 
-                # Validate the constructed email looks reasonable
-                if len(clean_name) > 0 and '.' in email_domain:
-                    caller_info["email"] = constructed_email
-                    logger.info(f"✓ Extracted spoken email: {caller_info['email']}")
-                    break
+            caller_info["email"] = f"{clean_name}@{email_domain}"
+            detail(logger, "✓ Extracted spoken email: %s", caller_info['email'])
 
-    logger.info(f"📋 Final extraction results: {caller_info}")
+    detail(logger, "📋 Final extraction results: %s", caller_info)
     return caller_info
 
+_SENTENCE_END_RE = re.compile(r"[.!?]")
+
+def _find_issue(text, sentence_ends, lead_in, joiner=None):
+    """The sentence a rules-file lead-in starts ("I was " up to the next . ! or ?), or None.
+
+    This is what re.search(r"(<lead_in>.+?)[.!?]", text, re.I) would capture; a joiner
+    turns it into r"(My .+ and I .+?)[.!?]" ("My wife and I are separating.").
+
+    Only the first lead-in can match (a later one has fewer sentence ends after it),
+    so one lookup plus a bisect replaces the regex retrying from every lead-in to the
+    end of the text - quadratic on long unpunctuated transcripts. `text` has no
+    newlines (caller turns joined by spaces), so `.` never stops early.
+    """
+    match = re.search(re.escape(lead_in), text, re.IGNORECASE)
+    if not match or not sentence_ends:
+        return None
+    # .+? takes at least one character before the sentence end
+    earliest = match.end() + 1
+    if joiner:
+        # greedy "My .+ and I": the last joiner that still has a sentence end after it
+        last_end = sentence_ends[-1]
+        joiners = [m.start() for m in re.finditer(f"(?={re.escape(joiner)})", text, re.IGNORECASE)
+                   if m.start() >= earliest and m.start() + len(joiner) + 1 <= last_end]
+        if not joiners:
+            return None
+        earliest = joiners[-1] + len(joiner) + 1
+    index = bisect_left(sentence_ends, earliest)
+    if index == len(sentence_ends):
+        return None
+    return text[match.start():sentence_ends[index]]
+
 def summarize_transcript(transcription, max_length=200):
     """Create a concise summary of the transcript for case description"""
-    if not transcription or len(transcription) <= max_length:
-        return transcription
-
-    # Clean up the transcript and separate human vs bot lines
-    lines = transcription.split('\n')
-    human_lines = []
+    parsed = parse_transcript(transcription)
+    if len(parsed.text) <= max_length:
+        return parsed.text or transcription
 
-    for line in lines:
-        if any(prefix in line.lower() for prefix in ['human:', 'caller:', '**caller:']):
-            # Remove prefixes and clean
-            clean_line = re.sub(r'^(\*+)?(human|caller):\s*', '', line, flags=re.IGNORECASE).strip()
-            if clean_line:
-                human_lines.append(clean_line)
+    # Separate human vs bot lines - the parser has already stripped the prefixes
+    human_turns = caller_turns(parsed)
 
     # Focus on human lines first - this is where the legal issue will be
-    human_text = " ".join(human_lines)
+    human_text = " ".join(turn.text for turn in human_turns)
+    human_text_lower = " ".join(turn.lower for turn in human_turns)
 
-    # Look for the main legal issue from human speech
-    legal_issue_patterns = [
-        r"(I need help with .+?)[\.\!\?]",
-        r"(I want to .+?)[\.\!\?]",
-        r"(I was .+?)[\.\!\?]", 
-        r"(I have been .+?)[\.\!\?]",
-        r"(My .+ and I .+?)[\.\!\?]",
-        r"(My .+?)[\.\!\?]",
-        r"(There was .+?)[\.\!\?]",
-        r"(Someone .+?)[\.\!\?]",
-        r"(I got .+?)[\.\!\?]",
-        r"(I am .+?)[\.\!\?]"
-    ]
+    # Lead-ins, admin words and fallback keywords come from the rules file
+    rules = current_rules()
 
+    # Look for the main legal issue from human speech
     main_issue = ""
-    for pattern in legal_issue_patterns:
-        match = re.search(pattern, human_text, re.IGNORECASE)
-        if match:
-            potential_issue = match.group(1).strip()
+    sentence_ends = [m.start() for m in _SENTENCE_END_RE.finditer(human_text)]
+    for lead_in, joiner in rules.legal_issue_lead_ins:
+        potential_issue = _find_issue(human_text, sentence_ends, lead_in, joiner)
+        if potential_issue:
+            potential_issue = potential_issue.strip()
             # Filter out administrative/contact info statements
-            if not any(admin_word in potential_issue.lower() for admin_word in 
-                      ['name is', 'phone number', 'email', 'address', 'calling about', 'contact']):
+            if not any(admin_word in potential_issue.lower() for admin_word in rules.issue_admin_words):
                 main_issue = potential_issue
                 break
 
     # If no clear issue found, look for legal keywords in human text
     if not main_issue:
-        legal_keywords = {
-            'divorce': 'seeking divorce assistance',
-            'custody': 'need help with child custody',
-            'accident': 'involved in an accident',
-            'injured': 'sustained injuries',
-            'arrested': 'facing criminal charges',
-            'fired': 'employment issue',
-            'will': 'estate planning matter',
-            'sued': 'involved in litigation',
-            'bankruptcy': 'bankruptcy consultation',
-            'disability': 'disability benefits matter',
-            'immigration': 'immigration issue',
-            'tax': 'tax matter',
-            'contract': 'contract dispute',
-            'real estate': 'real estate matter'
-        }
-
-        for keyword, description in legal_keywords.items():
-            if keyword in human_text.lower():
+        for keyword, description in rules.legal_keywords:
+            if keyword in human_text_lower:
                 main_issue = description
                 break
 
@@ -446,182 +526,441 @@ def format_phone_number(phone):
         return f"({clean_phone[:3]}) {clean_phone[3:6]}-{clean_phone[6:]}"
     return phone
 
-# Webhook handler at the root route
-@app.route('/', methods=['POST'])
-def webhook_listener():
-    try:
-        # Log the incoming request details
-        client_ip = request.remote_addr
-        timestamp = datetime.now(timezone.utc).isoformat()  # <-- timezone-aware
-        logger.info(f"=== INCOMING WEBHOOK REQUEST ===")
-        logger.info(f"Timestamp: {timestamp}")
-        logger.info(f"Client IP: {client_ip}")
-        logger.info(f"Content-Type: {request.content_type}")
-
-        # Get and log the raw incoming data
-        data = request.json or {}
-        logger.info(f"Raw incoming data keys: {list(data.keys())}")
-
-        # Debug: Check what's in customData - FORCE DEBUG
-        logger.info(f"🔍 DEBUGGING customData:")
-        logger.info(f"'customData' in data: {'customData' in data}")
+def find_transcript(data):
+    """The call transcript from wherever GHL put it: root transcription/transcript, else customData"""
+    if "transcription" in data:
+        return data["transcription"]
+    if "transcript" in data:
+        return data["transcript"]
+    custom_data = data.get("customData")
+    if isinstance(custom_data, dict):
+        return (custom_data.get("transcription", "") or
+                custom_data.get("transcript", "") or
+                custom_data.get("case_transcript", ""))
+    return ""
+
+def build_outbound_payload(data, timestamp=None):
+    """Resolve fields, mine the transcript and classify - the Zapier payload for one GHL webhook body"""
+    if timestamp is None:
+        timestamp = datetime.now(timezone.utc).isoformat()
+
+    # Debug: Check what's in customData - only built when DEBUG or sampling asks for it
+    if details_enabled(logger):
+        detail(logger, "Raw incoming data keys: %s", list(data.keys()))
         if 'customData' in data:
-            logger.info(f"customData type: {type(data['customData'])}")
-            logger.info(f"customData is dict: {isinstance(data['customData'], dict)}")
-            logger.info(f"customData content: {data['customData']}")
+            detail(logger, "customData type: %s", type(data['customData']))
+            detail(logger, "customData content: %s", data['customData'])
         else:
-            logger.info("No customData key found")
-
-        # Extract basic fields from webhook
-        full_name = data.get("full_name", "")
-        email = data.get("email", "")
-        phone = data.get("phone", "")
-        case_description = data.get("case_description", "")
-
-        # Look for transcript data in multiple locations
-        transcription = ""
-        if "transcription" in data:
-            transcription = data["transcription"]
-            logger.info(f"Found transcription in root: {len(transcription)} chars")
-        elif "transcript" in data:
-            transcription = data["transcript"]
-            logger.info(f"Found transcript in root: {len(transcription)} chars")
-        elif "customData" in data and isinstance(data["customData"], dict):
-            custom_data = data["customData"]
-            logger.info(f"🔍 CustomData keys: {list(custom_data.keys())}")
-
-            transcription = (custom_data.get("transcription", "") or 
-                           custom_data.get("transcript", "") or 
-                           custom_data.get("case_transcript", ""))
-
-            if transcription:
-                logger.info(f"✅ Found transcript: {len(transcription)} chars")
-            else:
-                logger.error(f"❌ No transcript in customData: {custom_data}")
-
-            # Also check for other fields in customData
-            if not full_name:
-                full_name = custom_data.get("full_name", "")
-            if not email:
-                email = custom_data.get("email", "")
-            if not phone:
-                phone = custom_data.get("phone", "")
-            if not case_description:
-                case_description = custom_data.get("case_description", "")
-
-        # FORCE phone formatting regardless of transcript
-        original_phone = phone
-        phone = format_phone_number(phone)
-        logger.info(f"📞 Phone: '{original_phone}' → '{phone}'")
-
-        logger.info(f"Transcript found: {len(transcription) if transcription else 0} characters")
-
-        # Extract caller info from transcript if available
-        if transcription:
-            caller_info = extract_caller_info_from_transcript(transcription)
+            detail(logger, "No customData key found")
+
+    # Extract basic fields from webhook
+    full_name = data.get("full_name", "")
+    email = data.get("email", "")
+    phone = data.get("phone", "")
+    case_description = data.get("case_description", "")
+
+    # Look for transcript data in multiple locations
+    transcription = find_transcript(data)
+    if "transcription" in data or "transcript" in data:
+        detail(logger, "Found transcript in root: %d chars", len(transcription) if transcription else 0)
+    elif "customData" in data and isinstance(data["customData"], dict):
+        custom_data = data["customData"]
+        if details_enabled(logger):
+            detail(logger, "🔍 CustomData keys: %s", list(custom_data.keys()))
 
-            # Use extracted info if the webhook data is missing
-            if not full_name and caller_info["name"]:
-                full_name = caller_info["name"]
-                logger.info(f"Used transcript name: {full_name}")
+        if transcription:
+            detail(logger, "✅ Found transcript: %d chars", len(transcription))
+        else:
+            logger.warning("❌ No transcript in customData (keys: %s)", list(custom_data.keys()))
+
+        # Also check for other fields in customData
+        if not full_name:
+            full_name = custom_data.get("full_name", "")
+        if not email:
+            email = custom_data.get("email", "")
+        if not phone:
+            phone = custom_data.get("phone", "")
+        if not case_description:
+            case_description = custom_data.get("case_description", "")
+
+    # FORCE phone formatting regardless of transcript
+    original_phone = phone
+    phone = format_phone_number(phone)
+    detail(logger, "📞 Phone: '%s' → '%s'", original_phone, phone)
+
+    detail(logger, "Transcript found: %d characters", len(transcription) if transcription else 0)
+
+    # Extract caller info from transcript if available and the request still has time for it;
+    # otherwise the raw webhook fields are used as they are
+    if transcription and within_budget('transcript', DEADLINE_RESERVE_SECONDS):
+        # Name, number and email come early in a call; a runaway transcript only costs its first window
+        window = transcription
+        if len(window) > TRANSCRIPT_MAX_CHARS:
+            window = transcription[:TRANSCRIPT_MAX_CHARS]
+            record(transcript_truncated=True)
+            logger.warning(f"⚠️ Transcript of {len(transcription)} chars cut to the first {TRANSCRIPT_MAX_CHARS}")
+
+        # Tokenize once; extraction and summarization share the speaker turns
+        with stage('extract'):
+            with section('extract.parse'):
+                parsed_transcript = parse_transcript(window)
+            caller_info = extract_caller_info_from_transcript(parsed_transcript)
+
+        # Use extracted info if the webhook data is missing
+        if not full_name and caller_info["name"]:
+            full_name = caller_info["name"]
+            detail(logger, "Used transcript name: %s", full_name)
+
+        if not phone and caller_info["phone"]:
+            phone = caller_info["phone"]
+            detail(logger, "Used transcript phone: %s", phone)
+        else:
+            # Format the existing phone number using helper function
+            phone = format_phone_number(phone)
+            if phone != data.get("phone", ""):
+                detail(logger, "Formatted phone: %s", phone)
+
+        if not email and caller_info["email"]:
+            email = caller_info["email"]
+            detail(logger, "Used transcript email: %s", email)
+
+        # Use transcript for case description if none provided
+        if not case_description and within_budget('summarize', DEADLINE_RESERVE_SECONDS):
+            with stage('summarize'), section('summarize'):
+                case_description = summarize_transcript(parsed_transcript)
+            detail(logger, "Generated case description from transcript")
+
+    # Remove the old phone formatting section since we do it above
+
+    # Also check for tags or other description fields
+    if not case_description:
+        case_description = data.get("tags", "") or "Legal consultation request"
+
+    if details_enabled(logger):
+        detail(logger, "Final extracted fields: name=%r email=%r phone=%r description=%r",
+               full_name, email, phone, case_description[:100])
+
+    # Determine practice area - FIX THE BUG
+    # One automaton pass finds both the category and any driving override term
+    with stage('classify'), section('practice_area.keywords'):
+        classification = classify_practice_area(case_description)
+    practice_area = classification.practice_area
+    detail(logger, "🎯 Detected Practice Area: %s (driving term: %s)", practice_area, classification.driving_term)
+
+    # MANUAL FIX: If we see driving-related terms, force Traffic Law
+    if classification.driving_term:
+        if practice_area not in ['Traffic Law', 'DUI/DWI']:
+            logger.warning("🚨 MANUAL FIX: Found driving term but got '%s' - forcing 'Traffic Law'", practice_area)
+            practice_area = "Traffic Law"
+
+    # Steps dropped to stay inside REQUEST_DEADLINE_SECONDS - the lead goes out less enriched rather than late
+    skipped = skipped_steps()
+    if skipped:
+        record(enrichment_skipped=skipped)
+        logger.warning(f"⏱️ Lead {data.get('contact_id', '')} running out of time - skipped {', '.join(skipped)}")
+
+    # Build outbound payload with clean field names for Zapier
+    outbound_payload = {
+        "Full Name": full_name,
+        "Email": email,
+        "Phone": phone,
+        "Case Description": case_description,
+        "Practice Area": practice_area,
+        "Case Type": practice_area,  # Alternative field name
+        "Contact ID": data.get("contact_id", ""),
+        "City": data.get("city", ""),
+        "State": data.get("state", ""),
+        "Source": "GoHighLevel",
+        "Timestamp": timestamp,
+        "Has Transcript": bool(transcription),
+        "Transcript Length": len(transcription) if transcription else 0,
+        "Partially Enriched": bool(skipped),
+        "Skipped Enrichment": ", ".join(skipped)
+    }
 
-            if not phone and caller_info["phone"]:
-                phone = caller_info["phone"]
-                logger.info(f"Used transcript phone: {phone}")
-            else:
-                # Format the existing phone number using helper function
-                phone = format_phone_number(phone)
-                if phone != data.get("phone", ""):
-                    logger.info(f"Formatted phone: {phone}")
+    return outbound_payload
+
+# Representative body used to exercise every stage before real traffic arrives
+WARMUP_PAYLOAD = {
+    "contact_id": "warmup",
+    "phone": "5551234567",
+    "customData": {
+        "transcript": (
+            "AI: Thank you for calling, who am I speaking with?\n"
+            "Human: My name is Jane Doe.\n"
+            "**Caller:** My email is jane doe at gmail dot com and my number is five five five one two three four five six seven.\n"
+            "Caller: I was in a car accident last week and I need help with my insurance claim because the other driver was careless driving."
+        )
+    }
+}
+
+def warm_up(http_client=True):
+    """Pay every first-use cost before the port opens instead of on the first webhook.
+
+    Runs one synthetic body through the pipeline (rules tables, regex caches), one
+    request through the Flask stack, and - unless deliveries go another way, as
+    under asgi.py - imports requests and builds the outbound clients.
+    """
+    started = time.perf_counter()
+    build_outbound_payload(WARMUP_PAYLOAD)
+    with app.test_client() as client:
+        client.get('/ping')
+    if http_client:
+        for destination in get_routing_table().destinations.values():
+            get_client(destination.name, destination.timeout)
+    logger.info(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+def shutdown(timeout=30):
+    """Stop the spool dispatchers and the coalescer, letting deliveries already in flight finish"""
+    if _fanout_pool is not None:
+        _fanout_pool.shutdown(wait=True)
+    if _coalescer is not None:
+        _coalescer.stop(timeout)
+    if _replay_job is not None:
+        _replay_job.cancel()
+        _replay_job.wait(timeout)
+    if _lead_store is not None:
+        _lead_store.stop(timeout)
+    if _archive is not None:
+        _archive.stop(timeout)
+    if _dispatcher is not None:
+        _dispatcher.stop(timeout)
+        logger.info("Spool dispatchers stopped")
 
-            if not email and caller_info["email"]:
-                email = caller_info["email"]
-                logger.info(f"Used transcript email: {email}")
+# Webhook handler at the root route
+@app.route('/', methods=['POST'])
+def webhook_listener():
+    metrics.REQUESTS_IN_FLIGHT.inc()
+    try:
+        with request_trace(REQUEST_DEADLINE_SECONDS) as trace:
+            with profile_request(request.headers.get(PROFILE_HEADER)):
+                status = _handle_webhook()
+            record(status=status[1])
+            emit_summary(logger, trace, logging.INFO if status[1] == 200 else logging.ERROR)
+            metrics.observe_request(trace, status[1])
+            return status
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec()
+
+def _handle_webhook():
+    body_preview = b""
+    try:
+        timestamp = datetime.now(timezone.utc).isoformat()  # <-- timezone-aware
+        detail(logger, "=== INCOMING WEBHOOK REQUEST from %s (%s) ===", request.remote_addr, request.content_type)
+
+        # Read the body once (never more than MAX_BODY_BYTES) and keep only the fields we use
+        with stage('parse_body'):
+            raw = request.get_data(cache=False)
+            body_preview = raw[:ERROR_LOG_MAX_CHARS + 1]
+            record(body_bytes=len(raw))
+            data = parse_body(raw)
+            del raw
+
+        # GHL retries slow webhooks - answer a repeat from the recorded result
+        dedupe_cache = get_dedupe_cache()
+        if dedupe_cache is None:
+            return _process_webhook(data, timestamp)
+        with stage('dedupe'):
+            dedupe_key = request_key(data)
+            recorded = dedupe_cache.claim(dedupe_key)
+        if recorded is not None:
+            record(contact_id=data.get("contact_id", ""), deduplicated=True)
+            metrics.DUPLICATES.inc()
+            return recorded
+        result = None
+        try:
+            result = _process_webhook(data, timestamp)
+        finally:
+            dedupe_cache.release(dedupe_key, result if result and result[1] == 200 else None)
+        return result
+
+    except RequestEntityTooLarge:
+        record(error=f"body over MAX_BODY_BYTES ({MAX_BODY_BYTES})")
+        logger.error(f"Rejected webhook body of {request.content_length} bytes (limit {MAX_BODY_BYTES})")
+        return "Payload Too Large", 413
+
+    except NotAnObject as e:
+        record(error=str(e))
+        logger.error(f"Rejected webhook: {e}")
+        return "Bad Request", 400
 
-            # Use transcript for case description if none provided
-            if not case_description:
-                case_description = summarize_transcript(transcription)
-                logger.info(f"Generated case description from transcript")
+    except Exception as e:
+        error = truncate(f"{e.__class__.__name__}: {e}", ERROR_LOG_MAX_CHARS)
+        record(error=error)
+        logger.error("Error processing webhook: %s", error)
+        if details_enabled(logger):
+            detail(logger, "Request data: %s", truncate(body_preview, ERROR_LOG_MAX_CHARS))
+        # Return simple error response
+        return "ERROR", 500
 
-        # Remove the old phone formatting section since we do it above
+def _process_webhook(data, timestamp):
+    """Build, then deliver or spool, the lead for one parsed webhook body"""
+    outbound_payload = build_outbound_payload(data, timestamp)
+    remember_lead(data, outbound_payload)
+    archive_transcript(data, outbound_payload)
+    record(
+        contact_id=outbound_payload["Contact ID"],
+        practice_area=outbound_payload["Practice Area"],
+        transcript_chars=outbound_payload["Transcript Length"],
+        delivery_mode=DELIVERY_MODE
+    )
+
+    destinations = get_routing_table().route(outbound_payload)
+    record(destinations=[destination.name for destination in destinations])
+    if not destinations:
+        logger.warning(f"⚠️ No route for lead {outbound_payload['Contact ID']} ({outbound_payload['Practice Area']}) - not delivered")
+        return "OK", 200
 
-        # Also check for tags or other description fields
-        if not case_description:
-            case_description = data.get("tags", "") or "Legal consultation request"
-
-        logger.info(f"Final extracted fields:")
-        logger.info(f"  - Full Name: {full_name}")
-        logger.info(f"  - Email: {email}")
-        logger.info(f"  - Phone: {phone}")
-        logger.info(f"  - Case Description: {case_description[:100]}...")
-
-        # Determine practice area - FIX THE BUG
-        logger.info(f"🎯 Case description: '{case_description}'")
-        logger.info(f"Contains 'careless driv': {'careless driv' in case_description.lower()}")
-
-        practice_area = extract_practice_area(case_description)
-        logger.info(f"  - Detected Practice Area: {practice_area}")
-
-        # MANUAL FIX: If we see driving-related terms, force Traffic Law
-        if any(term in case_description.lower() for term in ['careless driv', 'reckless driv', 'traffic ticket', 'speeding ticket']):
-            if practice_area not in ['Traffic Law', 'DUI/DWI']:
-                logger.error(f"🚨 MANUAL FIX: Found driving term but got '{practice_area}' - forcing 'Traffic Law'")
-                practice_area = "Traffic Law"
-
-        # Build outbound payload with clean field names for Zapier
-        outbound_payload = {
-            "Full Name": full_name,
-            "Email": email,
-            "Phone": phone,
-            "Case Description": case_description,
-            "Practice Area": practice_area,
-            "Case Type": practice_area,  # Alternative field name
-            "Contact ID": data.get("contact_id", ""),
-            "City": data.get("city", ""),
-            "State": data.get("state", ""),
-            "Source": "GoHighLevel",
-            "Timestamp": timestamp,
-            "Has Transcript": bool(transcription),
-            "Transcript Length": len(transcription) if transcription else 0
-        }
-
-        # Log what we're sending to Zapier
-        logger.info(f"=== SENDING TO ZAPIER ===")
-        logger.info(f"Zapier URL: {ZAPIER_WEBHOOK_URL}")
-        logger.info(f"Outbound payload keys: {list(outbound_payload.keys())}")
-
-        # Send parsed and enriched data to Zapier
-        response = requests.post(ZAPIER_WEBHOOK_URL, json=outbound_payload, timeout=30)
-
-        # Log Zapier response
-        logger.info(f"=== ZAPIER RESPONSE ===")
-        logger.info(f"Status Code: {response.status_code}")
-        logger.info(f"Response Body: {response.text}")
-        logger.info(f"=== END WEBHOOK PROCESSING ===")
-
-        # Return simple "OK" response that GHL expects
+    # Queue mode: persist the lead and acknowledge GHL without waiting on Zapier
+    if DELIVERY_MODE == 'queue':
+        spool_lead(destinations, outbound_payload)
         return "OK", 200
 
-    except Exception as e:
-        logger.error(f"=== WEBHOOK ERROR ===")
-        logger.error(f"Error processing webhook: {str(e)}")
-        logger.error(f"Request data: {request.get_data()}")
-        logger.error(f"=== END ERROR ===")
-        # Return simple error response
-        return "ERROR", 500
+    # Send parsed and enriched data to every routed destination at once
+    if details_enabled(logger):
+        detail(logger, "=== SENDING TO %s === keys=%s", [d.name for d in destinations], list(outbound_payload.keys()))
+    with stage('zapier'):
+        outcomes = deliver_lead(destinations, outbound_payload)
+
+    # Return simple "OK" response that GHL expects
+    return settle_deliveries(outcomes, outbound_payload)
 
 # Optional route to test if app is live
 @app.route('/ping', methods=['GET'])
 def ping():
     return "Webhook is live and ready to receive POSTs.", 200
 
+# Prometheus scrape endpoint (per process - scrape every worker or aggregate upstream)
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+def lookup_leads(args, authorization=''):
+    """Body and status for GET /leads?phone=|email=|contact_id=[&days=][&limit=]"""
+    lead_store = get_lead_store()
+    if lead_store is None or not LEADS_API_TOKEN:
+        return {"error": "lead lookup is disabled"}, 404
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {LEADS_API_TOKEN}".encode()):
+        return {"error": "unauthorized"}, 401
+    phone, email, contact_id = args.get('phone', ''), args.get('email', ''), args.get('contact_id', '')
+    if not (phone or email or contact_id):
+        return {"error": "give phone, email or contact_id"}, 400
+    try:
+        days = float(args['days']) if args.get('days') else None
+        limit = min(500, int(args.get('limit') or 50))
+    except ValueError:
+        return {"error": "days and limit must be numbers"}, 400
+    leads = lead_store.lookup(format_phone_number(phone), email, contact_id, days, limit)
+    return {"count": len(leads), "leads": leads}, 200
+
+# Caller history lookup (Authorization: Bearer $LEADS_API_TOKEN)
+@app.route('/leads', methods=['GET'])
+def leads_endpoint():
+    return lookup_leads(request.args, request.headers.get('Authorization', ''))
+
+def lookup_transcripts(args, authorization=''):
+    """Body and status for GET /transcripts?contact_id=[&since=][&until=][&limit=]"""
+    archive = get_archive()
+    if archive is None or not ARCHIVE_API_TOKEN:
+        return {"error": "transcript lookup is disabled"}, 404
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {ARCHIVE_API_TOKEN}".encode()):
+        return {"error": "unauthorized"}, 401
+    contact_id = args.get('contact_id', '')
+    if not contact_id:
+        return {"error": "give contact_id"}, 400
+    try:
+        since, until = epoch_seconds(args.get('since')), epoch_seconds(args.get('until'))
+        limit = min(100, int(args.get('limit') or 20))
+    except ValueError:
+        return {"error": "since and until must be ISO timestamps, limit a number"}, 400
+    transcripts = archive.get(contact_id, since, until, limit)
+    return {"count": len(transcripts), "transcripts": transcripts}, 200
+
+# Archived transcripts for a contact (Authorization: Bearer $ARCHIVE_API_TOKEN)
+@app.route('/transcripts', methods=['GET'])
+def transcripts_endpoint():
+    return lookup_transcripts(request.args, request.headers.get('Authorization', ''))
+
+def _dead_letter_destination(args):
+    """Spool destination URL for a ?destination=<routing name> filter (None = all); raises KeyError if unknown"""
+    name = args.get('destination', '')
+    return get_routing_table().destinations[name].url if name else None
+
+def _inspection_spool():
+    """The spool for looking at, never starting dispatchers: this process's own if open, else read-only"""
+    global _spool_reader
+    if _spool is not None:
+        return _spool
+    if _spool_reader is None and os.path.exists(SPOOL_PATH):
+        _spool_reader = OutboundSpool(SPOOL_PATH, read_only=True)
+    return _spool_reader
+
+def list_dead_letters(args, authorization=''):
+    """Body and status for GET /dead-letters[?destination=][&limit=]"""
+    if not DEAD_LETTER_API_TOKEN:
+        return {"error": "dead-letter admin is disabled"}, 404
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {DEAD_LETTER_API_TOKEN}".encode()):
+        return {"error": "unauthorized"}, 401
+    try:
+        destination = _dead_letter_destination(args)
+        limit = min(500, int(args.get('limit') or 50))
+    except KeyError:
+        return {"error": "unknown destination"}, 400
+    except ValueError:
+        return {"error": "limit must be a number"}, 400
+    spool = _inspection_spool()
+    count, _ = spool.dead_letter_stats(destination) if spool else (0, 0)
+    return {
+        "count": count,
+        "dead_letters": spool.dead_letters(limit, destination) if spool else [],
+        "replay": _replay_job.progress() if _replay_job else None,
+    }, 200
+
+def replay_dead_letters(args, authorization=''):
+    """Body and status for POST /dead-letters/replay[?rate=][&concurrency=][&destination=][&limit=]"""
+    global _replay_job
+    if not DEAD_LETTER_API_TOKEN:
+        return {"error": "dead-letter admin is disabled"}, 404
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {DEAD_LETTER_API_TOKEN}".encode()):
+        return {"error": "unauthorized"}, 401
+    try:
+        destination = _dead_letter_destination(args)
+        rate = float(args.get('rate') or DEAD_LETTER_REPLAY_RATE)
+        concurrency = min(64, int(args.get('concurrency') or DEAD_LETTER_REPLAY_CONCURRENCY))
+        limit = int(args['limit']) if args.get('limit') else None
+    except KeyError:
+        return {"error": "unknown destination"}, 400
+    except ValueError:
+        return {"error": "rate, concurrency and limit must be numbers"}, 400
+    spool = get_spool()
+    with _spool_lock:
+        if _replay_job is not None and _replay_job.running():
+            return {"error": "a replay is already running", "replay": _replay_job.progress()}, 409
+        _replay_job = ReplayJob(spool, deliver_to_zapier, rate, concurrency, destination, limit).start()
+    return {"replay": _replay_job.progress()}, 202
+
+# Dead letters and their replay (Authorization: Bearer $DEAD_LETTER_API_TOKEN)
+@app.route('/dead-letters', methods=['GET'])
+def dead_letters_endpoint():
+    return list_dead_letters(request.args, request.headers.get('Authorization', ''))
+
+@app.route('/dead-letters/replay', methods=['POST'])
+def dead_letter_replay_endpoint():
+    return replay_dead_letters(request.args, request.headers.get('Authorization', ''))
+
 # Health check route
 @app.route('/health', methods=['GET'])
 def health():
     return {
         "status": "healthy",
         "timestamp": datetime.now(timezone.utc).isoformat(),
-        "zapier_url": ZAPIER_WEBHOOK_URL
+        "zapier_url": ZAPIER_WEBHOOK_URL,
+        "delivery_mode": DELIVERY_MODE,
+        "queued_deliveries": _spool.depth() if _spool else 0,
+        "dead_letters": _spool.dead_letter_count() if _spool else 0,
+        "destinations": {getattr(get_routing_table().destination(url), 'name', url): status
+                         for url, status in guard_status().items()},
+        "rules_version": current_rules().version
     }, 200
 
 # Run the app
@@ -633,7 +972,14 @@ if __name__ == '__main__':
 
     logger.info(f"Starting GoHighLevel to Zapier webhook bridge on {host}:{port}")
     logger.info(f"Zapier webhook URL: {ZAPIER_WEBHOOK_URL}")
+    logger.info(f"Delivery mode: {DELIVERY_MODE}")
+
+    # Build tables and clients before accepting traffic, then pick up anything left in the spool
+    if WARM_UP:
+        warm_up()
+    resume_spool()
 
+    # Development server only - use `gunicorn -c gunicorn.conf.py app:app` in production
     app.run(host=host, port=port, debug=debug)
 
 
@@ -0,0 +1,357 @@
+"""Append-only archive of webhook transcripts, for checking an extraction against its input.
+
+    python archive.py transcripts/ --contact-id abc123
+    python archive.py transcripts/ --export transcripts.jsonl --since 2026-10-01
+    python replay.py transcripts/ --dry-run
+
+Transcripts are compressed one record at a time and appended to numbered segment
+files (segment-000001.dat, ...); a segment that has reached ARCHIVE_SEGMENT_BYTES is
+closed and the next one started. Each record carries its own header (codec,
+received_at, contact_id, length), so segments can be streamed without the index.
+index.db maps (contact_id, received_at) to (segment, offset, length) for lookups;
+reads go through mmap and only touch the records asked for.
+"""
+import argparse
+import fcntl
+import json
+import logging
+import mmap
+import os
+import queue
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Directory transcripts are archived in (unset turns the archive off)
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', '')
+# Size at which a segment file is closed and the next one started
+ARCHIVE_SEGMENT_BYTES = int(os.environ.get('ARCHIVE_SEGMENT_BYTES', 64 * 1024 * 1024))
+# Newest segments kept; older ones are deleted with their index rows on rotation (0 = keep all)
+ARCHIVE_KEEP_SEGMENTS = int(os.environ.get('ARCHIVE_KEEP_SEGMENTS', 0))
+# "zlib", or "zstd" (needs the zstandard package)
+ARCHIVE_CODEC = os.environ.get('ARCHIVE_CODEC', 'zlib').lower()
+# Transcripts written per batch, and the longest one waits in memory before it is written
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 100))
+ARCHIVE_FLUSH_SECONDS = float(os.environ.get('ARCHIVE_FLUSH_SECONDS', 1))
+# Bearer token for GET /transcripts (unset disables the endpoint - transcripts are PII)
+ARCHIVE_API_TOKEN = os.environ.get('ARCHIVE_API_TOKEN', '')
+
+# magic, codec, received_at, contact_id bytes, compressed bytes
+RECORD_HEADER = struct.Struct('<4sBdHI')
+RECORD_MAGIC = b'TRN1'
+CODECS = {'zlib': 0, 'zstd': 1}
+SEGMENT_PREFIX, SEGMENT_SUFFIX = 'segment-', '.dat'
+
+
+def _compressor(codec):
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress
+    if codec == 'zlib':
+        return zlib.compress
+    raise ValueError(f"unknown ARCHIVE_CODEC {codec!r} (use zlib or zstd)")
+
+
+def _decompress(codec_id, data):
+    if codec_id == CODECS['zlib']:
+        return zlib.decompress(data)
+    if codec_id == CODECS['zstd']:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown codec id {codec_id}")
+
+
+def segment_path(path, number):
+    return os.path.join(path, f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(path):
+    """Segment numbers in `path`, oldest first"""
+    numbers = []
+    for name in os.listdir(path):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            try:
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+            except ValueError:
+                continue
+    return sorted(numbers)
+
+
+def encode_record(contact_id, received_at, transcript, compress, codec_id):
+    contact = contact_id.encode('utf-8')[:0xFFFF]
+    data = compress(transcript.encode('utf-8'))
+    return RECORD_HEADER.pack(RECORD_MAGIC, codec_id, received_at, len(contact), len(data)) + contact + data
+
+
+def decode_record(buffer, offset):
+    """(contact_id, received_at, transcript, next_offset) for the record at `offset`; None at a torn or foreign tail"""
+    if offset + RECORD_HEADER.size > len(buffer):
+        return None
+    magic, codec_id, received_at, contact_len, data_len = RECORD_HEADER.unpack_from(buffer, offset)
+    start = offset + RECORD_HEADER.size
+    end = start + contact_len + data_len
+    if magic != RECORD_MAGIC or end > len(buffer):
+        return None
+    contact_id = bytes(buffer[start:start + contact_len]).decode('utf-8', 'replace')
+    transcript = _decompress(codec_id, buffer[start + contact_len:end]).decode('utf-8')
+    return contact_id, received_at, transcript, end
+
+
+def _entry(contact_id, received_at, transcript):
+    return {
+        "contact_id": contact_id,
+        "received_at": datetime.fromtimestamp(received_at, timezone.utc).isoformat(),
+        "transcript": transcript,
+    }
+
+
+def iter_transcripts(path=ARCHIVE_DIR, since=None, until=None):
+    """Stream every archived transcript, oldest segment first, one mmap'd segment at a time.
+
+    `since` / `until` are epoch seconds; records outside them are skipped without
+    being decompressed.
+    """
+    for number in list_segments(path):
+        try:
+            with open(segment_path(path, number), 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    offset = 0
+                    while offset + RECORD_HEADER.size <= len(buffer):
+                        _, _, received_at, contact_len, data_len = RECORD_HEADER.unpack_from(buffer, offset)
+                        if (since is not None and received_at < since) or (until is not None and received_at >= until):
+                            offset += RECORD_HEADER.size + contact_len + data_len
+                            continue
+                        record = decode_record(buffer, offset)
+                        if record is None:
+                            break
+                        contact_id, received_at, transcript, offset = record
+                        yield _entry(contact_id, received_at, transcript)
+        except FileNotFoundError:
+            continue  # rotated away while we were reading
+
+
+class TranscriptArchive:
+    """Segment files plus an SQLite offset index, appended to in batches by a background thread.
+
+    Several processes (gunicorn workers) may share one directory: each batch is
+    appended under an flock on the directory's .lock file.
+    """
+
+    def __init__(self, path=ARCHIVE_DIR, segment_bytes=ARCHIVE_SEGMENT_BYTES, keep_segments=ARCHIVE_KEEP_SEGMENTS,
+                 codec=ARCHIVE_CODEC, batch_size=ARCHIVE_BATCH_SIZE, flush_seconds=ARCHIVE_FLUSH_SECONDS):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.keep_segments = keep_segments
+        self.codec = codec
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._compress = _compressor(codec)  # fail at startup, not in the writer, on a bad codec
+        self._local = threading.local()
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._maps = {}
+        self._maps_lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                id INTEGER PRIMARY KEY,
+                contact_id TEXT NOT NULL,
+                received_at REAL NOT NULL,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS transcripts_contact ON transcripts (contact_id, received_at)")
+
+    def _conn(self):
+        """One connection per thread; WAL lets lookups run while the writer commits"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.path, 'index.db'), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, contact_id, transcript, received_at=None):
+        """Queue a transcript for the writer thread; compression and disk writes never happen on the caller's thread"""
+        self._ensure_writer()
+        # GHL may send contact_id as a JSON number
+        contact_id = '' if contact_id is None else str(contact_id)
+        self._queue.put((contact_id, time.time() if received_at is None else received_at, str(transcript)))
+
+    def _writer_running(self):
+        # pid check: a writer started before a fork does not exist in the child
+        return self._writer is not None and self._writer[0] == os.getpid() and self._writer[1].is_alive()
+
+    def _ensure_writer(self):
+        if not self._writer_running():
+            with self._writer_lock:
+                if not self._writer_running():
+                    thread = threading.Thread(target=self._write_loop, name="transcript-archiver", daemon=True)
+                    self._writer = (os.getpid(), thread)
+                    thread.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = None in batch
+            rows = [item for item in batch if item is not None]
+            if rows:
+                try:
+                    self._append(rows)
+                except Exception as e:
+                    # one bad batch is dropped; the writer must outlive it or the queue only grows
+                    logger.error(f"❌ Could not archive {len(rows)} transcript(s) in {self.path}: {e}")
+            if stop:
+                return
+
+    def _append(self, rows):
+        codec_id = CODECS[self.codec]
+        records = [(contact_id, received_at, encode_record(contact_id, received_at, transcript, self._compress, codec_id))
+                   for contact_id, received_at, transcript in rows]
+        with open(os.path.join(self.path, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            segments = list_segments(self.path)
+            number = segments[-1] if segments else 1
+            rotated = bool(segments) and os.path.getsize(segment_path(self.path, number)) >= self.segment_bytes
+            if rotated:
+                number += 1
+            with open(segment_path(self.path, number), 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(b''.join(record for _, _, record in records))
+            index_rows = []
+            for contact_id, received_at, record in records:
+                index_rows.append((contact_id, received_at, number, offset, len(record)))
+                offset += len(record)
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO transcripts (contact_id, received_at, segment, offset, length) VALUES (?, ?, ?, ?, ?)",
+                    index_rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if rotated and self.keep_segments > 0 and number > self.keep_segments:
+                self._expire(number - self.keep_segments)
+
+    def _expire(self, last_expired):
+        """Drop segments numbered up to `last_expired` and their index rows"""
+        for number in list_segments(self.path):
+            if number > last_expired:
+                break
+            os.remove(segment_path(self.path, number))
+            with self._maps_lock:
+                self._maps.pop(number, None)
+            logger.info(f"🗑️ Expired transcript segment {number}")
+        self._conn().execute("DELETE FROM transcripts WHERE segment <= ?", (last_expired,))
+
+    def _map(self, segment, end):
+        """A read-only mmap of `segment` covering at least `end` bytes (re-mapped as the segment grows).
+
+        Maps that are replaced, expired or dropped by stop() are never closed here: another
+        thread may still be decoding from one. Each is unmapped when its last reader lets go.
+        """
+        with self._maps_lock:
+            buffer = self._maps.get(segment)
+            if buffer is None or len(buffer) < end:
+                with open(segment_path(self.path, segment), 'rb') as f:
+                    buffer = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return buffer
+
+    def get(self, contact_id, since=None, until=None, limit=20):
+        """Newest-first transcripts archived for `contact_id` (since/until are epoch seconds)"""
+        sql = "SELECT segment, offset, length FROM transcripts WHERE contact_id = ? AND received_at >= ?"
+        params = [contact_id, since or 0]
+        if until is not None:
+            sql += " AND received_at < ?"
+            params.append(until)
+        rows = self._conn().execute(sql + " ORDER BY received_at DESC LIMIT ?", params + [limit]).fetchall()
+        entries = []
+        for segment, offset, length in rows:
+            try:
+                record = decode_record(self._map(segment, offset + length), offset)
+            except FileNotFoundError:
+                continue  # expired between the index read and the segment read
+            if record is not None:
+                entries.append(_entry(*record[:3]))
+        return entries
+
+    def stop(self, timeout=10):
+        """Write whatever is queued, stop the writer and drop the segment maps"""
+        if self._writer_running():
+            self._queue.put(None)
+            self._writer[1].join(timeout)
+            self._writer = None
+        with self._maps_lock:
+            self._maps.clear()
+
+
+def webhook_body(entry):
+    """A GHL-style body carrying an archived transcript, as replay.py and loadtest.py take them"""
+    return {"contact_id": entry["contact_id"], "customData": {"transcript": entry["transcript"]}}
+
+
+def epoch_seconds(value):
+    """Epoch seconds from an ISO date/datetime (UTC unless it says otherwise)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up or export archived webhook transcripts")
+    parser.add_argument("path", nargs="?", default=ARCHIVE_DIR, help="archive directory (default: ARCHIVE_DIR)")
+    parser.add_argument("--contact-id", help="print this contact's transcripts, newest first")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--export", metavar="JSONL", help="write webhook bodies for replay.py / loadtest.py ('-' for stdout)")
+    parser.add_argument("--since", help="ISO date or datetime (UTC) to start from")
+    parser.add_argument("--until", help="ISO date or datetime (UTC) to stop before")
+    args = parser.parse_args(argv)
+    if not args.path or not os.path.isdir(args.path):
+        parser.error(f"no archive at {args.path!r}")
+    since, until = epoch_seconds(args.since), epoch_seconds(args.until)
+
+    if args.contact_id:
+        archive = TranscriptArchive(args.path)
+        for entry in archive.get(args.contact_id, since, until, args.limit):
+            print(json.dumps(entry))
+        archive.stop()
+        return 0
+    if args.export:
+        out = sys.stdout if args.export == "-" else open(args.export, "w", encoding="utf-8")
+        try:
+            for entry in iter_transcripts(args.path, since, until):
+                out.write(json.dumps(webhook_body(entry)) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        return 0
+    parser.error("give --contact-id or --export")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+# ASGI variant of the webhook bridge:
+#
+#     uvicorn asgi:app --host 0.0.0.0 --port 8080 --workers 2
+#
+# Serves the same routes as app.py (/, /ping, /health, /metrics) on an event loop.
+# Parsing, transcript extraction, summarization and classification run on a thread
+# pool (CPU work off the loop), while Zapier deliveries are awaited on one shared
+# httpx client. A waiting delivery costs a coroutine, not an OS thread, so one
+# process can hold thousands of concurrent webhooks.
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+import app as flask_app
+import metrics
+from batching import ZAPIER_BATCH_SIZE, result_timeout
+from circuit import ZAPIER_RATE_MAX_WAIT, DestinationUnavailable, get_guard
+from dedupe import request_key
+from http_client import AsyncOutboundClient, DeadlineExceeded, out_of_time
+from ingest import NotAnObject, parse_body, truncate
+from profiler import PROFILE_HEADER, profile_request, run_attached
+from telemetry import details_enabled, detail, emit_summary, record, request_deadline, request_trace, stage
+
+logger = logging.getLogger(__name__)
+
+# Threads for the CPU-bound pipeline and the blocking spool/dedupe calls
+ASGI_WORKER_THREADS = int(os.environ.get('ASGI_WORKER_THREADS', min(32, (os.cpu_count() or 1) + 4)))
+
+_executor = None
+_client = None
+
+
+async def _run_blocking(func, *args):
+    """Run `func` on the worker pool, keeping the request's trace context"""
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, ctx.run, run_attached, func, *args)
+
+
+async def deliver_to_zapier(destination, payload, deadline=None):
+    """Async counterpart of app.deliver_to_zapier with the same guard, deadline and metrics"""
+    if out_of_time(deadline):
+        raise DestinationUnavailable(destination, "out of time", 1)
+    guard = get_guard(destination)
+    wait = guard.admit(ZAPIER_RATE_MAX_WAIT if deadline is None else min(ZAPIER_RATE_MAX_WAIT, deadline - time.perf_counter()))
+    if wait:
+        await asyncio.sleep(wait)
+    metrics.ZAPIER_BATCH_LEADS.observe(len(payload) if isinstance(payload, list) else 1)
+    metrics.ZAPIER_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    route = flask_app.get_routing_table().destination(destination)
+    try:
+        response = await _client.post_json(destination, payload, timeout=route.timeout if route else None,
+                                           deadline=deadline)
+    except DeadlineExceeded as e:
+        guard.record(None, time.perf_counter() - started)
+        metrics.ZAPIER_RESPONSES.inc("out_of_time")
+        raise DestinationUnavailable(destination, "out of time", max(1, e.retry_after)) from e
+    except Exception:
+        guard.record(None, time.perf_counter() - started)
+        metrics.ZAPIER_RESPONSES.inc("error")
+        raise
+    finally:
+        metrics.ZAPIER_SECONDS.observe(time.perf_counter() - started)
+        metrics.ZAPIER_IN_FLIGHT.dec()
+    guard.record(response.status_code, time.perf_counter() - started, response.headers.get('Retry-After', ''))
+    metrics.ZAPIER_RESPONSES.inc(str(response.status_code))
+    return response
+
+
+async def _process_webhook(data, timestamp):
+    outbound_payload = await _run_blocking(flask_app.build_outbound_payload, data, timestamp)
+    await _run_blocking(flask_app.remember_lead, data, outbound_payload)
+    await _run_blocking(flask_app.archive_transcript, data, outbound_payload)
+    record(
+        contact_id=outbound_payload["Contact ID"],
+        practice_area=outbound_payload["Practice Area"],
+        transcript_chars=outbound_payload["Transcript Length"],
+        delivery_mode=flask_app.DELIVERY_MODE
+    )
+
+    destinations = flask_app.get_routing_table().route(outbound_payload)
+    record(destinations=[destination.name for destination in destinations])
+    if not destinations:
+        logger.warning(f"⚠️ No route for lead {outbound_payload['Contact ID']} ({outbound_payload['Practice Area']}) - not delivered")
+        return "OK", 200
+
+    if flask_app.DELIVERY_MODE == 'queue':
+        await _run_blocking(flask_app.spool_lead, destinations, outbound_payload)
+        return "OK", 200
+
+    deadline = request_deadline()
+    with stage('zapier'):
+        outcomes = await asyncio.gather(*[_send_lead(destination, outbound_payload, deadline) for destination in destinations],
+                                        return_exceptions=True)
+    return await _run_blocking(flask_app.settle_deliveries, list(zip(destinations, outcomes)), outbound_payload)
+
+
+async def _send_lead(destination, outbound_payload, deadline):
+    if ZAPIER_BATCH_SIZE > 1:
+        future = flask_app.get_coalescer().submit(destination.url, outbound_payload, deadline)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), result_timeout(deadline))
+        except asyncio.TimeoutError:
+            raise DestinationUnavailable(destination.url, "out of time", 1) from None
+    return await deliver_to_zapier(destination.url, outbound_payload, deadline)
+
+
+async def _handle_webhook(body):
+    try:
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with stage('parse_body'):
+            record(body_bytes=len(body))
+            data = await _run_blocking(parse_body, body)
+
+        dedupe_cache = flask_app.get_dedupe_cache()
+        if dedupe_cache is None:
+            return await _process_webhook(data, timestamp)
+
+        # claim() may wait on an in-flight original, so it runs on the pool
+        with stage('dedupe'):
+            dedupe_key = request_key(data)
+            recorded = await _run_blocking(dedupe_cache.claim, dedupe_key)
+        if recorded is not None:
+            metrics.DUPLICATES.inc()
+            record(deduplicated=True)
+            return recorded
+        result = None
+        try:
+            result = await _process_webhook(data, timestamp)
+        finally:
+            await _run_blocking(dedupe_cache.release, dedupe_key, result if result and result[1] == 200 else None)
+        return result
+
+    except NotAnObject as e:
+        record(error=str(e))
+        logger.error(f"Rejected webhook: {e}")
+        return "Bad Request", 400
+
+    except Exception as e:
+        error = truncate(f"{e.__class__.__name__}: {e}", flask_app.ERROR_LOG_MAX_CHARS)
+        record(error=error)
+        logger.error("Error processing webhook: %s", error)
+        if details_enabled(logger):
+            detail(logger, "Request data: %s", truncate(body[:flask_app.ERROR_LOG_MAX_CHARS + 1], flask_app.ERROR_LOG_MAX_CHARS))
+        return "ERROR", 500
+
+
+async def webhook_listener(body, profile_token=None):
+    metrics.REQUESTS_IN_FLIGHT.inc()
+    try:
+        with request_trace(flask_app.REQUEST_DEADLINE_SECONDS) as trace:
+            # the loop thread runs other requests too, so only pool work is profiled
+            with profile_request(profile_token, attach=False):
+                result = await _handle_webhook(body)
+            record(status=result[1])
+            emit_summary(logger, trace, logging.INFO if result[1] == 200 else logging.ERROR)
+            metrics.observe_request(trace, result[1])
+            return result
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec()
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+async def _read_body(scope, receive, limit):
+    """The request body, None if the client went away; raises _BodyTooLarge past `limit` bytes"""
+    length = _header(scope, 'Content-Length')
+    if length and length.isdigit() and int(length) > limit:
+        raise _BodyTooLarge()
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise _BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b"".join(chunks)
+
+
+def _header(scope, name):
+    name = name.lower().encode()
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def _respond(send, status, body, content_type="text/plain; charset=utf-8", headers=None):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    raw_headers = [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode(), str(value).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    global _executor, _client
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            _executor = ThreadPoolExecutor(ASGI_WORKER_THREADS, thread_name_prefix="asgi-worker")
+            _client = AsyncOutboundClient()
+            if flask_app.WARM_UP:
+                # deliveries go through httpx here, so skip importing requests
+                await asyncio.get_running_loop().run_in_executor(_executor, flask_app.warm_up, False)
+            flask_app.resume_spool()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await _client.aclose()
+            await asyncio.get_running_loop().run_in_executor(None, flask_app.shutdown)
+            _executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    if path == '/' and method == 'POST':
+        try:
+            body = await _read_body(scope, receive, flask_app.MAX_BODY_BYTES)
+        except _BodyTooLarge:
+            logger.error(f"Rejected webhook body over MAX_BODY_BYTES ({flask_app.MAX_BODY_BYTES})")
+            await _respond(send, 413, "Payload Too Large")
+            return
+        if body is None:
+            return
+        text, status, *headers = await webhook_listener(body, _header(scope, PROFILE_HEADER))
+        await _respond(send, status, text, headers=headers[0] if headers else None)
+    elif path == '/ping' and method == 'GET':
+        await _respond(send, 200, "Webhook is live and ready to receive POSTs.")
+    elif path == '/health' and method == 'GET':
+        with flask_app.app.app_context():
+            payload, status = flask_app.health()
+        await _respond(send, status, json.dumps(payload), "application/json")
+    elif path == '/metrics' and method == 'GET':
+        await _respond(send, 200, metrics.render(), metrics.CONTENT_TYPE)
+    elif path == '/leads' and method == 'GET':
+        args = {name: values[0] for name, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        payload, status = await _run_blocking(flask_app.lookup_leads, args, _header(scope, 'Authorization') or '')
+        await _respond(send, status, json.dumps(payload), "application/json")
+    elif path == '/transcripts' and method == 'GET':
+        args = {name: values[0] for name, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        payload, status = await _run_blocking(flask_app.lookup_transcripts, args, _header(scope, 'Authorization') or '')
+        await _respond(send, status, json.dumps(payload), "application/json")
+    elif path == '/dead-letters' and method == 'GET':
+        args = {name: values[0] for name, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        payload, status = await _run_blocking(flask_app.list_dead_letters, args, _header(scope, 'Authorization') or '')
+        await _respond(send, status, json.dumps(payload), "application/json")
+    elif path == '/dead-letters/replay' and method == 'POST':
+        args = {name: values[0] for name, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        payload, status = await _run_blocking(flask_app.replay_dead_letters, args, _header(scope, 'Authorization') or '')
+        await _respond(send, status, json.dumps(payload), "application/json")
+    elif path in ('/', '/ping', '/health', '/metrics', '/leads', '/transcripts', '/dead-letters', '/dead-letters/replay'):
+        await _respond(send, 405, "Method Not Allowed")
+    else:
+        await _respond(send, 404, "Not Found")
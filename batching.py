@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from circuit import DestinationUnavailable
+from http_client import delivery_budget
+
+logger = logging.getLogger(__name__)
+
+# Leads per array POST to Zapier (1 = one request per lead, batching off)
+ZAPIER_BATCH_SIZE = int(os.environ.get('ZAPIER_BATCH_SIZE', 1))
+# Longest the first lead of a batch waits for company before the batch is sent anyway
+ZAPIER_BATCH_WINDOW = float(os.environ.get('ZAPIER_BATCH_WINDOW', 0.5))
+# Batches in flight at once per process
+ZAPIER_BATCH_SENDERS = int(os.environ.get('ZAPIER_BATCH_SENDERS', 4))
+
+
+def result_timeout(deadline, window=ZAPIER_BATCH_WINDOW):
+    """Longest a request waits on its lead's Future: the batch's POST is already bounded by
+    the earliest deadline in it (or one fully retried delivery without one), so this only
+    adds the batch window and a few seconds for a stuck sender"""
+    budget = delivery_budget() if deadline is None else max(0, deadline - time.perf_counter())
+    return budget + window + 5
+
+
+def rejects_batch(response, size):
+    """A 4xx (other than 429) for a multi-lead array may be one bad lead - worth resending one by one"""
+    return size > 1 and 400 <= response.status_code < 500 and response.status_code != 429
+
+
+class Coalescer:
+    """Groups leads from concurrent requests into array POSTs; each lead gets its own Future.
+
+    A batch for a destination is sent once it holds `max_size` leads or its first lead
+    has waited `window` seconds. Every lead's Future resolves to the batch's response
+    (or its exception), so callers still see a per-lead outcome. A batch is sent with the
+    earliest request deadline among its leads, so it never holds any of them past theirs.
+    """
+
+    def __init__(self, send, max_size=ZAPIER_BATCH_SIZE, window=ZAPIER_BATCH_WINDOW, senders=ZAPIER_BATCH_SENDERS):
+        self.send = send
+        self.max_size = max(1, max_size)
+        self.window = window
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._senders = ThreadPoolExecutor(max(1, senders), thread_name_prefix="zapier-batch")
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="zapier-coalescer", daemon=True)
+        self._thread.start()
+
+    def submit(self, destination, payload, deadline=None):
+        """Queue one lead; returns a Future for the delivery response (failed at once after stop())"""
+        future = Future()
+        with self._cond:
+            if self._stopping:
+                future.set_exception(DestinationUnavailable(destination, "shutting down", 1))
+                return future
+            batch = self._pending.get(destination)
+            if batch is None:
+                batch = self._pending[destination] = (time.monotonic() + self.window, [])
+            batch[1].append((payload, future, deadline))
+            if len(batch[1]) >= self.max_size:
+                self._flush(destination)
+            elif len(batch[1]) == 1:
+                self._cond.notify()
+        return future
+
+    def _flush(self, destination):
+        """Hand a destination's pending leads to a sender thread; caller holds the lock"""
+        _, items = self._pending.pop(destination)
+        self._senders.submit(self._send_batch, destination, items)
+
+    def _run(self):
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                for destination, (deadline, _) in list(self._pending.items()):
+                    if deadline <= now:
+                        self._flush(destination)
+                deadlines = [deadline for deadline, _ in self._pending.values()]
+                self._cond.wait(max(0, min(deadlines) - now) if deadlines else None)
+
+    def _send_batch(self, destination, items):
+        payloads = [payload for payload, _, _ in items]
+        deadlines = [deadline for _, _, deadline in items if deadline is not None]
+        try:
+            response = self.send(destination, payloads if len(payloads) > 1 else payloads[0],
+                                 min(deadlines) if deadlines else None)
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+        if rejects_batch(response, len(items)):
+            logger.warning(f"⚠️ Batch of {len(items)} leads rejected with {response.status_code} - resending one by one")
+            for item in items:
+                self._send_batch(destination, [item])
+            return
+        for _, future, _ in items:
+            future.set_result(response)
+
+    def stop(self, timeout=30):
+        """Send whatever is pending, then wait for batches in flight"""
+        with self._cond:
+            self._stopping = True
+            for destination in list(self._pending):
+                self._flush(destination)
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._senders.shutdown(wait=True)
@@ -0,0 +1,249 @@
+"""Micro-benchmarks for the extraction and classification hot paths.
+
+    python benchmarks/bench.py -o results.json
+    python benchmarks/bench.py --baseline results.json --fail-on-regression
+
+Transcripts are generated from a fixed seed in every speaker-prefix format the
+parser understands, from a few lines up to ~200 KB, plus adversarial 100 KB
+inputs aimed at the extractor's regexes. Each case is timed over enough
+iterations to fill --min-time and reported as per-call median/min/max in
+microseconds. Results are written as JSON so runs can be diffed against a
+baseline file.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SPEAKER_FORMATS = {
+    "plain": ("AI: ", "Human: "),
+    "caller": ("Agent: ", "Caller: "),
+    "markdown": ("**AI:** ", "**Caller:** "),
+    "loose_markdown": ("* AI:** ", "* Caller:** "),
+}
+
+SIZES = {
+    "short": 6,
+    "medium": 60,
+    "long": 600,
+    "very_long": 2400,
+}
+
+AGENT_LINES = [
+    "Thank you for calling, who am I speaking with?",
+    "Can you tell me a little about what happened?",
+    "What is the best phone number to reach you?",
+    "And what email address should we use?",
+    "I understand. Is there anything else the attorney should know?",
+]
+
+CALLER_LINES = [
+    "My name is {name}.",
+    "I was in a car accident on the highway last week and my neck still hurts.",
+    "My landlord is trying to evict me without notice.",
+    "I got a speeding ticket and I think the officer made a mistake.",
+    "My email is {mailbox} at gmail dot com.",
+    "You can reach me at five five five one two three four five six seven.",
+    "My wife and I are going through a divorce and need help with custody.",
+    "I need help with my workers comp claim after I was injured at work.",
+    "I'm not sure what kind of lawyer I need, honestly.",
+]
+
+NAMES = ["David Glick", "Maria Lopez", "John Smith", "Aisha Khan", "Wei Chen"]
+
+DESCRIPTIONS = [
+    "I was in a car accident",
+    "Need help with careless driving citation and my insurance company is not responding",
+    "Looking for advice on a business partnership dispute over a commercial lease and unpaid wages",
+    "",
+    "My father passed away without a will and my siblings and I disagree about the house, "
+    "the bank accounts and who should be executor of the estate" * 5,
+]
+
+PHONES = ["5551234567", "+1 (555) 123-4567", "555.123.4567", "(555) 123-4567", "12345"]
+
+
+def make_transcript(rng, turns, style):
+    """Synthetic call transcript with `turns` exchanges in the given speaker-prefix style"""
+    agent, caller = SPEAKER_FORMATS[style]
+    name = rng.choice(NAMES)
+    lines = []
+    for _ in range(turns):
+        lines.append(agent + rng.choice(AGENT_LINES))
+        lines.append(caller + rng.choice(CALLER_LINES).format(name=name, mailbox=name.lower()))
+    return "\n".join(lines)
+
+
+def adversarial_transcripts(size=100_000):
+    """Inputs that made the old backtracking regexes blow up"""
+    return {
+        "adversarial_spaces": "Human: 1" + " " * size + "x",
+        "adversarial_letters": "Human: " + "a" * size,
+        "adversarial_spoken_email": "Human: " + "john at gmail " * (size // 14),
+        "adversarial_digit_words": "Human: " + "five five five " * (size // 15),
+        "adversarial_no_match": "Human: " + "hello there my friend " * (size // 22),
+    }
+
+
+def time_call(func, min_time, repeat):
+    """Per-call timings (seconds) over `repeat` rounds, each long enough to fill min_time/repeat"""
+    func()
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat or iterations >= 1_000_000:
+            break
+        iterations *= 2 if elapsed == 0 else max(2, int(min_time / repeat / elapsed))
+
+    samples = [elapsed / iterations]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        samples.append((time.perf_counter() - started) / iterations)
+    return samples, iterations
+
+
+class FakeZapierResponse:
+    status_code = 200
+    text = '{"status": "success"}'
+
+
+def build_cases(rng, include_adversarial=True):
+    import app
+
+    cases = {}
+    for description in DESCRIPTIONS:
+        label = f"extract_practice_area[{len(description)}b]"
+        cases[label] = lambda d=description: app.extract_practice_area(d)
+    # Backfill-style batch of 1000 descriptions: per-lead loop vs the NumPy batch classifier
+    batch = [rng.choice(DESCRIPTIONS[:3] + CALLER_LINES) for _ in range(1000)]
+    cases["classify_loop[1000]"] = lambda b=batch: [app.classify_practice_area(d) for d in b]
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        from classifier import classify_batch
+        cases["classify_batch[1000]"] = lambda b=batch: classify_batch(b, first_match=True)
+    for phone in PHONES:
+        cases[f"format_phone_number[{phone}]"] = lambda p=phone: app.format_phone_number(p)
+
+    transcripts = {}
+    for size, turns in SIZES.items():
+        for style in SPEAKER_FORMATS:
+            transcripts[f"{size}/{style}"] = make_transcript(rng, turns, style)
+    if include_adversarial:
+        transcripts.update(adversarial_transcripts())
+
+    for label, text in transcripts.items():
+        cases[f"extract_caller_info[{label}]"] = lambda t=text: app.extract_caller_info_from_transcript(t)
+        cases[f"summarize_transcript[{label}]"] = lambda t=text: app.summarize_transcript(t)
+
+    # Full request path through Flask with Zapier stubbed out
+    app.DELIVERY_MODE = 'inline'
+    app.deliver_to_zapier = lambda destination, payload, deadline=None: FakeZapierResponse()
+    client = app.app.test_client()
+    for size in ("short", "long"):
+        body = {
+            "contact_id": "bench",
+            "phone": "5551234567",
+            "customData": {"transcript": transcripts[f"{size}/markdown"]},
+        }
+        cases[f"webhook_listener[{size}]"] = lambda b=body: client.post('/', json=b)
+    return cases
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results, baseline, tolerance):
+    """Print the per-case change against a baseline; returns the names that regressed"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        change = result["median_us"] / before["median_us"] - 1
+        flag = ""
+        if change > tolerance:
+            flag = "  <-- REGRESSION"
+            regressions.append(name)
+        print(f"{name:60s} {before['median_us']:12.2f} -> {result['median_us']:12.2f} us  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction and classification hot paths")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed median slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any case regressed past --tolerance")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent timing each case")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per case")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--no-adversarial", action="store_true", help="skip the 100 KB adversarial transcripts")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--with-logging", action="store_true", help="leave the app's INFO logging on")
+    args = parser.parse_args(argv)
+
+    if not args.with_logging:
+        logging.disable(logging.CRITICAL)
+
+    cases = build_cases(random.Random(args.seed), include_adversarial=not args.no_adversarial)
+    results = {}
+    for name, func in cases.items():
+        if args.filter not in name:
+            continue
+        samples, iterations = time_call(func, args.min_time, args.repeat)
+        results[name] = {
+            "median_us": statistics.median(samples) * 1e6,
+            "min_us": min(samples) * 1e6,
+            "max_us": max(samples) * 1e6,
+            "iterations": iterations,
+            "repeat": args.repeat,
+        }
+        print(f"{name:60s} {results[name]['median_us']:12.2f} us  (x{iterations})", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
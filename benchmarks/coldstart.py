@@ -0,0 +1,205 @@
+"""Cold-start benchmark: import-time budgets and time-to-first-200.
+
+    python benchmarks/coldstart.py
+    python benchmarks/coldstart.py --serve "gunicorn -c gunicorn.conf.py app:app" --runs 5 -o cold.json
+    WARM_UP=false python benchmarks/coldstart.py --fail-on-budget
+
+Two measurements, each in fresh processes so nothing is cached in memory:
+
+- `python -X importtime -c "import app"`: the total, and every module app imports
+  directly, checked against IMPORT_BUDGETS_MS (override with --budget name=ms).
+- time-to-first-200: the app command is started with PORT and ZAPIER_WEBHOOK_URL
+  pointing at loadtest.py's fake Zapier, and one synthetic webhook is POSTed as
+  soon as the port accepts it. The clock runs from spawning the process to the 200,
+  so it covers interpreter start, imports, warm-up and the first request.
+
+Runs report the median and worst of --runs attempts.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shlex
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from bench import git_revision, make_transcript
+from loadtest import FakeZapier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import-time budgets (ms, cumulative) for app and the modules it imports directly.
+# Flask is most of what is left; our own modules should stay small, and none of
+# them may pull in requests, asyncio or numpy at import.
+IMPORT_BUDGETS_MS = {
+    "app": 600,
+    "flask": 450,
+    "http_client": 20,
+    "classifier": 20,
+    "rules": 10,
+    "dedupe": 25,
+    "leads": 25,
+    "spool": 25,
+    "profiler": 25,
+    "telemetry": 20,
+    "metrics": 10,
+    "ingest": 10,
+    "routing": 10,
+    "batching": 10,
+    "circuit": 10,
+    "spoken": 10,
+    "transcript": 10,
+}
+FORBIDDEN_AT_IMPORT = ("requests", "asyncio", "numpy", "httpx")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def measure_imports(env):
+    """Cumulative import ms of app and each module it imports directly, and every module under app"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            entries.append((len(match.group(3)) // 2, int(match.group(2)), match.group(4)))
+    # -X importtime prints each module after everything it imported, so app's subtree
+    # is the run of deeper lines just before app's own (interpreter start-up comes earlier)
+    end = next(i for i, (depth, _, name) in enumerate(entries) if depth == 0 and name == "app")
+    start = end
+    while start > 0 and entries[start - 1][0] > 0:
+        start -= 1
+    times = {name: round(cumulative / 1000, 1) for depth, cumulative, name in entries[start:end] if depth == 1}
+    times["app"] = round(entries[end][1] / 1000, 1)
+    return times, {name for _, _, name in entries[start:end]}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_200(command, env, body, timeout):
+    """Seconds from spawning `command` to a 200 for `body`, and to its port first accepting a connection"""
+    port = free_port()
+    zapier = FakeZapier(latency=0.0).start()
+    env = dict(env, PORT=str(port), ZAPIER_WEBHOOK_URL=zapier.url)
+    url = f"http://127.0.0.1:{port}/"
+    started = time.perf_counter()
+    process = subprocess.Popen(shlex.split(command), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    port_open = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"{command!r} exited with {process.returncode} before answering")
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=0.05):
+                    pass
+            except OSError:
+                time.sleep(0.005)
+                continue
+            if port_open is None:
+                port_open = time.perf_counter() - started
+            response = requests.post(url, data=body, headers={'Content-Type': 'application/json'}, timeout=timeout)
+            if response.status_code == 200:
+                return time.perf_counter() - started, port_open
+            raise SystemExit(f"first webhook answered {response.status_code}: {response.text[:200]}")
+        raise SystemExit(f"no 200 within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        zapier.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import-time budgets and time-to-first-200")
+    parser.add_argument("--serve", default=f"{sys.executable} app.py", help="command that starts the app")
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to time")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for the first 200")
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=MS", help="override an import budget")
+    parser.add_argument("--first-200-budget", type=float, default=2000, help="ms allowed for the median time-to-first-200")
+    parser.add_argument("--fail-on-budget", action="store_true", help="exit 1 if any budget is exceeded")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    budgets = dict(IMPORT_BUDGETS_MS)
+    for override in args.budget:
+        name, _, ms = override.partition("=")
+        budgets[name] = float(ms)
+
+    # the app's outbound spool goes in a scratch directory, not the working tree
+    scratch = tempfile.mkdtemp(prefix="coldstart-")
+    env = dict(os.environ)
+    env.setdefault("SPOOL_PATH", os.path.join(scratch, "outbound_spool.db"))
+    over = []
+
+    import_runs = [measure_imports(env) for _ in range(args.runs)]
+    modules = import_runs[0][1]
+    imports = {name: statistics.median(run[0].get(name, 0) for run in import_runs) for name in import_runs[0][0]}
+    print(f"{'module':26s} {'ms':>8s} {'budget':>8s}", file=sys.stderr)
+    for name, ms in sorted(imports.items(), key=lambda item: -item[1]):
+        budget = budgets.get(name)
+        flag = ""
+        if budget is not None and ms > budget:
+            flag = "  <-- OVER BUDGET"
+            over.append(name)
+        print(f"{name:26s} {ms:8.1f} {budget if budget is not None else '':>8}{flag}", file=sys.stderr)
+    eager = [name for name in FORBIDDEN_AT_IMPORT if name in modules]
+    if eager:
+        print(f"imported eagerly by `import app`: {', '.join(eager)}", file=sys.stderr)
+        over.extend(eager)
+
+    rng = random.Random(args.seed)
+    body = json.dumps({"contact_id": "coldstart", "customData": {"transcript": make_transcript(rng, 20, "markdown")}})
+    starts = [time_to_first_200(args.serve, env, body, args.timeout) for _ in range(args.runs)]
+    first_200 = [round(total * 1000, 1) for total, _ in starts]
+    port_open = [round(opened * 1000, 1) for _, opened in starts]
+    median_first_200 = statistics.median(first_200)
+    print(f"time-to-first-200: median {median_first_200} ms, worst {max(first_200)} ms "
+          f"(port open after {statistics.median(port_open)} ms)", file=sys.stderr)
+    if median_first_200 > args.first_200_budget:
+        over.append("first_200")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "serve": args.serve,
+            "warm_up": os.environ.get("WARM_UP", "true"),
+            "runs": args.runs,
+        },
+        "import_ms": imports,
+        "import_budgets_ms": budgets,
+        "eager_imports": eager,
+        "first_200_ms": first_200,
+        "port_open_ms": port_open,
+        "over_budget": over,
+    }
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if over and args.fail_on_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""End-to-end load test against a running webhook bridge and a local fake Zapier.
+
+    python benchmarks/loadtest.py --serve "gunicorn -c gunicorn.conf.py app:app" --rate 50 --duration 30
+    python benchmarks/loadtest.py --target http://127.0.0.1:8080/ --zapier-port 9999 --payloads captured.jsonl
+
+A stand-in for ZAPIER_WEBHOOK_URL is started on 127.0.0.1 with configurable
+latency, 5xx error rate and 429 injection. With --serve the app command is
+started with ZAPIER_WEBHOOK_URL (and PORT) pointing at it; with --target the
+app is already running and must have been started with ZAPIER_WEBHOOK_URL set
+to the URL this script prints.
+
+Webhook bodies are read from a JSONL file of captured GHL payloads (one raw body
+per line, as for replay.py) or generated from the benchmark transcripts, and
+sent open-loop at --rate requests/second. Latency is measured from each
+request's scheduled send time, so a saturated app shows up as latency instead
+of a silently lower send rate. Every body gets a unique contact_id so the
+dedupe cache does not absorb repeats. The report gives p50/p95/p99 ingress
+latency, throughput, status and error counts, and leads delivered to the fake
+Zapier against leads sent (after waiting up to --drain seconds for queued
+deliveries).
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from bench import SPEAKER_FORMATS, SIZES, git_revision, make_transcript
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeZapier:
+    """Local catch-hook stand-in: counts leads, answers after `latency` seconds, injects 5xx and 429"""
+
+    def __init__(self, port=0, latency=0.05, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.statuses = Counter()
+        self.leads_accepted = 0
+        self.contacts = set()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/hooks/catch/load/test/"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-zapier", daemon=True)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, delay = fake._decide()
+                time.sleep(delay)
+                fake._count(status, body)
+                reply = b'{"status": "success"}' if status == 200 else b'{"status": "error"}'
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(reply)))
+                if status == 429 and fake.retry_after:
+                    self.send_header('Retry-After', str(fake.retry_after))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _decide(self):
+        with self.lock:
+            roll = self.rng.random()
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        if roll < self.throttle_rate:
+            return 429, 0.0
+        if roll < self.throttle_rate + self.error_rate:
+            return 503, delay
+        return 200, delay
+
+    def _count(self, status, body):
+        try:
+            leads = json.loads(body)
+        except ValueError:
+            leads = []
+        leads = leads if isinstance(leads, list) else [leads]
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] += 1
+            if status == 200:
+                self.leads_accepted += len(leads)
+                self.contacts.update(lead.get("Contact ID", "") for lead in leads if isinstance(lead, dict))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+                "leads_accepted": self.leads_accepted,
+                "unique_contacts_accepted": len(self.contacts),
+            }
+
+
+def synthetic_bodies(rng):
+    """Endless GHL-style bodies, most with a customData transcript, a few with form fields only"""
+    styles = list(SPEAKER_FORMATS)
+    sizes = list(SIZES.items())
+    while True:
+        if rng.random() < 0.1:
+            yield {"full_name": "Form Lead", "phone": "5551234567", "email": "form@example.com",
+                   "case_description": "I was in a car accident", "state": "FL"}
+            continue
+        _, turns = rng.choices(sizes, weights=[50, 35, 12, 3])[0]
+        yield {"phone": "5551234567", "state": rng.choice(["FL", "TX", "CA"]),
+               "customData": {"transcript": make_transcript(rng, turns, rng.choice(styles))}}
+
+
+def captured_bodies(path):
+    """Bodies from a JSONL capture, cycled for as long as the test runs"""
+    with open(path, encoding="utf-8") as f:
+        bodies = [json.loads(line) for line in f if line.strip()]
+    bodies = [body for body in bodies if isinstance(body, dict)]
+    if not bodies:
+        raise SystemExit(f"{path}: no JSON object bodies")
+    while True:
+        yield from bodies
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+def wait_until_live(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"app exited with {process.returncode} before answering /ping")
+        try:
+            if requests.get(base_url.rstrip('/') + '/ping', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"{base_url} did not answer /ping within {timeout}s")
+
+
+def run_load(target, bodies, rate, duration, concurrency, timeout):
+    """Send bodies open-loop at `rate`/s for `duration` s; returns (latencies, statuses, errors, sent, elapsed)"""
+    local = threading.local()
+    lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+
+    def send(body, scheduled):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            response = session.post(target, data=body, headers={'Content-Type': 'application/json'}, timeout=timeout)
+            outcome = response.status_code
+        except requests.RequestException as e:
+            outcome = e.__class__.__name__
+        latency = time.perf_counter() - scheduled
+        with lock:
+            if isinstance(outcome, int):
+                statuses[outcome] += 1
+                latencies.append(latency)
+            else:
+                errors[outcome] += 1
+
+    total = int(rate * duration)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency, thread_name_prefix="load") as pool:
+        for i in range(total):
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            body = dict(next(bodies))
+            body["contact_id"] = f"{body.get('contact_id') or 'load'}-{i}"
+            pool.submit(send, json.dumps(body), scheduled)
+    return latencies, statuses, errors, total, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the webhook bridge against a local fake Zapier")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--serve", help="command that starts the app (run with PORT and ZAPIER_WEBHOOK_URL set)")
+    target.add_argument("--target", help="URL of an app that is already running")
+    parser.add_argument("--port", type=int, default=8090, help="PORT given to the --serve command")
+    parser.add_argument("--payloads", help="JSONL file of captured webhook bodies (default: synthetic)")
+    parser.add_argument("--rate", type=float, default=20, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=64, help="client threads (caps requests in flight)")
+    parser.add_argument("--timeout", type=float, default=60, help="client timeout per request (seconds)")
+    parser.add_argument("--drain", type=float, default=30, help="seconds to wait for queued deliveries to arrive")
+    parser.add_argument("--zapier-port", type=int, default=0, help="fake Zapier port (default: any free port)")
+    parser.add_argument("--zapier-latency", type=float, default=0.3, help="fake Zapier response time (seconds)")
+    parser.add_argument("--zapier-jitter", type=float, default=0.1, help="+/- uniform jitter on that (seconds)")
+    parser.add_argument("--zapier-error-rate", type=float, default=0.0, help="fraction of POSTs answered 503")
+    parser.add_argument("--zapier-429-rate", type=float, default=0.0, help="fraction of POSTs answered 429")
+    parser.add_argument("--zapier-retry-after", type=int, default=1, help="Retry-After sent with a 429 (0 = none)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("-o", "--output", help="write the report JSON here")
+    args = parser.parse_args(argv)
+
+    zapier = FakeZapier(args.zapier_port, args.zapier_latency, args.zapier_jitter, args.zapier_error_rate,
+                        args.zapier_429_rate, args.zapier_retry_after, args.seed).start()
+    print(f"Fake Zapier listening at {zapier.url}", file=sys.stderr)
+
+    process = None
+    if args.serve:
+        env = dict(os.environ, ZAPIER_WEBHOOK_URL=zapier.url, PORT=str(args.port))
+        process = subprocess.Popen(shlex.split(args.serve), cwd=ROOT, env=env)
+        url = f"http://127.0.0.1:{args.port}/"
+    else:
+        url = args.target
+    rng = random.Random(args.seed)
+    bodies = captured_bodies(args.payloads) if args.payloads else synthetic_bodies(rng)
+
+    try:
+        wait_until_live(url, process)
+        latencies, statuses, errors, sent, elapsed = run_load(url, bodies, args.rate, args.duration,
+                                                              args.concurrency, args.timeout)
+        accepted = statuses.get(200, 0)
+        deadline = time.monotonic() + args.drain
+        while zapier.stats()["unique_contacts_accepted"] < accepted and time.monotonic() < deadline:
+            time.sleep(0.5)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        zapier.stop()
+
+    latencies.sort()
+    fake = zapier.stats()
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "target": url,
+            "serve": args.serve,
+            "payloads": args.payloads or "synthetic",
+            "rate": args.rate,
+            "duration": args.duration,
+            "zapier": {"latency": args.zapier_latency, "jitter": args.zapier_jitter,
+                       "error_rate": args.zapier_error_rate, "429_rate": args.zapier_429_rate},
+        },
+        "sent": sent,
+        "completed": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "client_errors": dict(errors),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+            "p95": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            "p99": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+            "max": round(latencies[-1] * 1000, 1) if latencies else None,
+            "mean": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+        },
+        "fake_zapier": fake,
+        "leads_sent": sent,
+        "leads_delivered": fake["unique_contacts_accepted"],
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not errors and set(statuses) <= {200} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failed (exception, 429/5xx) or slow deliveries that open a destination's breaker
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5))
+# A delivery slower than this counts as a failure even if Zapier eventually answered
+BREAKER_SLOW_SECONDS = float(os.environ.get('BREAKER_SLOW_SECONDS', 10))
+# How long an open breaker fails fast before letting one probe delivery through
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 30))
+# Token bucket per destination: sustained deliveries/second (0 = unlimited) and burst size
+ZAPIER_RATE_LIMIT = float(os.environ.get('ZAPIER_RATE_LIMIT', 0))
+ZAPIER_RATE_BURST = float(os.environ.get('ZAPIER_RATE_BURST', 10))
+# Longest a delivery may wait for a token before it is treated as overload
+ZAPIER_RATE_MAX_WAIT = float(os.environ.get('ZAPIER_RATE_MAX_WAIT', 1))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class DestinationUnavailable(Exception):
+    """Raised instead of attempting a delivery when the breaker is open or the rate limit is exhausted"""
+
+    def __init__(self, destination, reason, retry_after):
+        super().__init__(f"{destination} {reason}, retry in {retry_after:.1f}s")
+        self.destination = destination
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second, holding at most `burst`"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """Take a token; seconds the caller must wait before using it, or None if that exceeds max_wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                return None
+            # tokens may go negative: later callers queue up behind this reservation
+            self._tokens -= 1
+            return wait
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures -> half-open probe after `open_seconds`"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, slow_seconds=BREAKER_SLOW_SECONDS,
+                 open_seconds=BREAKER_OPEN_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """0 when a call may proceed, otherwise the seconds until the breaker will try again"""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            now = time.monotonic()
+            if self.state == OPEN and now >= self._opened_until:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                # exactly one probe; everyone else keeps failing fast until it reports back
+                self._probing = True
+                return 0
+            return max(self._opened_until - now, 0.1)
+
+    def cancel(self):
+        """An admitted call never went out - free the half-open probe slot so it cannot wedge"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok, elapsed, retry_after=0):
+        """Report a finished call; a failure while half-open (or the threshold-th in a row) opens the breaker"""
+        ok = ok and elapsed <= self.slow_seconds
+        with self._lock:
+            if ok:
+                if self.state != CLOSED:
+                    logger.info("✓ Circuit breaker closed again")
+                self.state = CLOSED
+                self.failures = 0
+                self._probing = False
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._probing = False
+                self._opened_until = time.monotonic() + max(self.open_seconds, retry_after)
+                logger.error(f"🚨 Circuit breaker open for {max(self.open_seconds, retry_after):.0f}s "
+                             f"after {self.failures} failed/slow deliveries")
+
+
+class DestinationGuard:
+    """Breaker plus rate limit for one destination URL"""
+
+    def __init__(self, destination):
+        self.destination = destination
+        self.breaker = CircuitBreaker()
+        self.bucket = TokenBucket(ZAPIER_RATE_LIMIT, ZAPIER_RATE_BURST) if ZAPIER_RATE_LIMIT > 0 else None
+
+    def admit(self, max_wait=ZAPIER_RATE_MAX_WAIT):
+        """Seconds to wait before sending, or raise DestinationUnavailable without sending at all"""
+        retry_after = self.breaker.allow()
+        if retry_after:
+            raise DestinationUnavailable(self.destination, "circuit open", retry_after)
+        if self.bucket is None:
+            return 0
+        wait = self.bucket.reserve(max_wait)
+        if wait is None:
+            self.breaker.cancel()
+            raise DestinationUnavailable(self.destination, "rate limited", 1 / self.bucket.rate)
+        return wait
+
+    def record(self, status_code, elapsed, retry_after=''):
+        """Feed a delivery outcome (status_code None for a transport error) to the breaker"""
+        ok = status_code is not None and status_code != 429 and status_code < 500
+        seconds = float(retry_after) if retry_after and retry_after.isdigit() else 0
+        self.breaker.record(ok, elapsed, seconds)
+
+    def status(self):
+        return {"state": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+def get_guard(destination):
+    """The guard for a destination URL, created on first use.
+
+    Keyed on the whole URL: every Zapier hook lives on hooks.zapier.com, and one
+    failing or throttled hook must not open the breaker or drain the bucket of another.
+    """
+    guard = _guards.get(destination)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.setdefault(destination, DestinationGuard(destination))
+    return guard
+
+
+def guard_status():
+    """Breaker state per destination URL, for /health"""
+    return {destination: guard.status() for destination, guard in list(_guards.items())}
+
+
+def open_breakers():
+    return sum(1 for guard in list(_guards.values()) if guard.breaker.state != CLOSED)
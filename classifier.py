@@ -0,0 +1,315 @@
+import os
+from collections import deque, namedtuple
+from itertools import islice
+
+from rules import current_rules
+
+# Only count keywords that stand alone as words ("ice" no longer fires inside "office")
+PRACTICE_AREA_WORD_BOUNDARY = os.environ.get('PRACTICE_AREA_WORD_BOUNDARY', 'False').lower() == 'true'
+
+# Descriptions per vectorized pass of classify_batch, and the padded characters one pass may hold
+BATCH_CHUNK_SIZE = int(os.environ.get('CLASSIFIER_BATCH_CHUNK_SIZE', 10000))
+BATCH_MAX_CELLS = int(os.environ.get('CLASSIFIER_BATCH_MAX_CELLS', 4000000))
+
+Classification = namedtuple('Classification', ['practice_area', 'driving_term'])
+# scores: top-k [(practice_area, share of keyword weight)] best first
+BatchClassification = namedtuple('BatchClassification', ['practice_area', 'driving_term', 'scores'])
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton: every keyword occurrence found in one pass over the text"""
+
+    def __init__(self, patterns):
+        # patterns: iterable of (keyword, tag, is_stem)
+        self.patterns = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for keyword, tag, is_stem in patterns:
+            state = 0
+            for char in keyword:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += (len(self.patterns),)
+            self.patterns.append((keyword, tag, is_stem))
+
+        # Breadth-first fail links; outputs are merged so matching never walks the fail chain
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+        # Fold the fail links into a full transition table (a DFA over the keyword
+        # alphabet) so the scan is a single dict lookup per character
+        queue = deque(self._goto[0].values())
+        self._delta = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        while queue:
+            state = queue.popleft()
+            row = dict(self._delta[self._fail[state]])
+            row.update(self._goto[state])
+            self._delta[state] = row
+            queue.extend(self._goto[state].values())
+
+    def iter_matches(self, text, word_boundary=False):
+        """Yield (end_index, pattern_index) for every keyword hit in `text`"""
+        delta, out, patterns = self._delta, self._out, self.patterns
+        state = 0
+        last = len(text) - 1
+        for i, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if not out[state]:
+                continue
+            for index in out[state]:
+                if word_boundary:
+                    keyword, _, is_stem = patterns[index]
+                    start = i - len(keyword) + 1
+                    if start > 0 and text[start - 1].isalnum():
+                        continue
+                    if not is_stem and i < last and text[i + 1].isalnum():
+                        continue
+                yield i, index
+
+
+def build_automaton(practice_areas, driving_override_terms):
+    """One automaton for every practice-area keyword (tagged with its area's rank) and driving term.
+
+    Areas are in precedence order - the first area with any hit wins. Driving terms
+    force Traffic Law unless DUI/DWI already won; they are stems ("careless driv"
+    covers driving/driver/drove...), so only their start has to sit on a word boundary.
+    The result is read-only, so it is safe to share between threads.
+    """
+    patterns = []
+    for rank, (_, keywords) in enumerate(practice_areas):
+        for keyword in keywords:
+            patterns.append((keyword, rank, False))
+    for term in driving_override_terms:
+        patterns.append((term, None, True))
+    return KeywordAutomaton(patterns)
+
+
+def classify_practice_area(description, word_boundary=None):
+    """Practice area by category precedence plus whether a driving override term is present"""
+    if not description:
+        return Classification("Other", False)
+    if word_boundary is None:
+        word_boundary = PRACTICE_AREA_WORD_BOUNDARY
+
+    rules = current_rules()
+    practice_areas = rules.practice_areas
+    best = len(practice_areas)
+    driving_term = False
+    patterns = rules.automaton.patterns
+    for _, index in rules.automaton.iter_matches(description.lower(), word_boundary):
+        rank = patterns[index][1]
+        if rank is None:
+            driving_term = True
+        elif rank < best:
+            best = rank
+
+    practice_area = practice_areas[best][0] if best < len(practice_areas) else "General"
+    return Classification(practice_area, driving_term)
+
+
+class _DenseAutomaton:
+    """A KeywordAutomaton's DFA as NumPy tables, so a whole batch of texts steps through it together"""
+
+    def __init__(self, automaton):
+        import numpy as np
+
+        self.np = np
+        alphabet = sorted({char for keyword, _, _ in automaton.patterns for char in keyword})
+        # class 0: any other non-alphanumeric character (and padding); class 1: any other alphanumeric
+        self.char_class = {char: i + 2 for i, char in enumerate(alphabet)}
+        self.alnum = np.array([False, True] + [char.isalnum() for char in alphabet])
+        self.ascii_class = np.array([self._class_of(chr(code)) for code in range(128)], dtype=np.uint8)
+
+        delta = np.zeros((len(automaton._delta), len(alphabet) + 2), dtype=np.intp)
+        for state, row in enumerate(automaton._delta):
+            for char, target in row.items():
+                delta[state, self.char_class[char]] = target
+        self.delta = delta
+
+        # CSR list of the patterns ending in each state
+        self.out_len = np.array([len(out) for out in automaton._out], dtype=np.intp)
+        self.out_ptr = np.concatenate(([0], np.cumsum(self.out_len)[:-1]))
+        self.out_idx = np.array([index for out in automaton._out for index in out], dtype=np.intp)
+
+        patterns = automaton.patterns
+        self.pattern_len = np.array([len(keyword) for keyword, _, _ in patterns], dtype=np.intp)
+        self.pattern_stem = np.array([is_stem for _, _, is_stem in patterns])
+        # category rank per pattern, or -1 for a driving override term
+        self.pattern_rank = np.array([-1 if rank is None else rank for _, rank, _ in patterns], dtype=np.intp)
+        # a multi-word phrase is stronger evidence than a single word
+        self.pattern_weight = np.array([len(keyword.split()) for keyword, _, _ in patterns], dtype=np.float64)
+
+    def _class_of(self, char):
+        return self.char_class.get(char, 1 if char.isalnum() else 0)
+
+    def _classes(self, texts, width):
+        """(len(texts), width) matrix of character classes, padded with class 0"""
+        np = self.np
+        padded = "".join(text.ljust(width, "\x00") for text in texts)
+        codes = np.frombuffer(padded.encode('utf-32-le'), dtype=np.uint32).reshape(len(texts), width)
+        classes = self.ascii_class[np.minimum(codes, 127)]
+        wide = codes > 127
+        if wide.any():
+            unique, inverse = np.unique(codes[wide], return_inverse=True)
+            classes[wide] = np.array([self._class_of(chr(code)) for code in unique], dtype=np.uint8)[inverse]
+        return classes
+
+    def hits(self, texts, word_boundary):
+        """(text_index, pattern_index) arrays for every keyword hit, like iter_matches over each text"""
+        np = self.np
+        width = max((len(text) for text in texts), default=0)
+        if width == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        classes = self._classes(texts, width)
+        # column-major copy: each step below reads one contiguous column
+        columns = np.ascontiguousarray(classes.T)
+        delta = self.delta.ravel()
+        stride = self.delta.shape[1]
+
+        state = np.zeros(len(texts), dtype=np.intp)
+        found_rows, found_states, found_ends = [], [], []
+        has_out = self.out_len > 0
+        for i in range(width):
+            state = delta[state * stride + columns[i]]
+            rows = np.flatnonzero(has_out[state])
+            if rows.size:
+                found_rows.append(rows)
+                found_states.append(state[rows])
+                found_ends.append(np.full(rows.size, i, dtype=np.intp))
+        if not found_rows:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        rows, states, ends = (np.concatenate(parts) for parts in (found_rows, found_states, found_ends))
+
+        # expand each (row, state) into the patterns that end there
+        counts = self.out_len[states]
+        offsets = np.repeat(self.out_ptr[states] - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        patterns = self.out_idx[offsets + np.arange(counts.sum())]
+        rows, ends = np.repeat(rows, counts), np.repeat(ends, counts)
+
+        if word_boundary:
+            alnum = self.alnum[classes]
+            starts = ends - self.pattern_len[patterns] + 1
+            before = (starts > 0) & alnum[rows, np.maximum(starts - 1, 0)]
+            after = (ends < width - 1) & alnum[rows, np.minimum(ends + 1, width - 1)]
+            keep = ~before & (self.pattern_stem[patterns] | ~after)
+            rows, patterns = rows[keep], patterns[keep]
+        return rows, patterns
+
+
+def _get_dense_automaton(rules):
+    if rules.dense is None:
+        rules.dense = _DenseAutomaton(rules.automaton)
+    return rules.dense
+
+
+def score_batch(descriptions, word_boundary=None, rules=None):
+    """Raw (scores, driving) arrays for a list of descriptions (needs NumPy).
+
+    scores[i, j] is the weighted keyword hit count of description i for the rules' practice area j;
+    driving[i] says whether a driving override term appears. Backfills that only need
+    the numbers can skip building a BatchClassification per row.
+    """
+    if word_boundary is None:
+        word_boundary = PRACTICE_AREA_WORD_BOUNDARY
+    rules = rules or current_rules()
+    dense = _get_dense_automaton(rules)
+    np = dense.np
+    areas = len(rules.practice_areas)
+    texts = [description.lower() if description else "" for description in descriptions]
+    count = len(texts)
+    scores = np.zeros(count * areas)
+    driving = np.zeros(count, dtype=bool)
+
+    # similar lengths share a pass so short texts are not padded out to the longest one
+    lengths = np.fromiter(map(len, texts), dtype=np.intp, count=count)
+    order = np.argsort(lengths, kind='stable')
+    lengths = lengths[order]
+    start = 0
+    while start < count:
+        # the guess's last row is at least as long as any row the final group keeps
+        guess = start + max(1, BATCH_MAX_CELLS // max(1, lengths[start]))
+        end = min(count, start + max(1, BATCH_MAX_CELLS // max(1, lengths[min(count, guess) - 1])))
+        group = order[start:end]
+        rows, patterns = dense.hits([texts[i] for i in group], word_boundary)
+        rows = group[rows]
+        ranks = dense.pattern_rank[patterns]
+        is_area = ranks >= 0
+        scores += np.bincount(rows[is_area] * areas + ranks[is_area],
+                              weights=dense.pattern_weight[patterns[is_area]], minlength=count * areas)
+        driving[rows[~is_area]] = True
+        start = end
+    return scores.reshape(count, areas), driving
+
+
+def _classify_chunk(descriptions, top_k, first_match, word_boundary, rules):
+    np = _get_dense_automaton(rules).np
+    scores, driving = score_batch(descriptions, word_boundary, rules)
+
+    totals = scores.sum(axis=1)
+    shares = scores / np.where(totals > 0, totals, 1)[:, None]
+    # stable sort on -share keeps category precedence among ties
+    ranked = np.argsort(-shares, axis=1, kind='stable')[:, :top_k]
+    first = np.argmax(scores > 0, axis=1)
+
+    # hand plain Python lists to the per-row loop; NumPy scalars are slow to touch one by one
+    names = [name for name, _ in rules.practice_areas]
+    top_ranks = ranked.tolist()
+    top_shares = np.round(np.take_along_axis(shares, ranked, axis=1), 4).tolist()
+    first, driving = first.tolist(), driving.tolist()
+
+    results = []
+    for i, description in enumerate(descriptions):
+        if not description:
+            results.append(BatchClassification("Other", False, []))
+            continue
+        top = [(names[rank], share) for rank, share in zip(top_ranks[i], top_shares[i]) if share > 0]
+        if not top:
+            practice_area = "General"
+        elif first_match:
+            practice_area = names[first[i]]
+        else:
+            practice_area = top[0][0]
+        results.append(BatchClassification(practice_area, driving[i], top))
+    return results
+
+
+def iter_classify_batch(descriptions, top_k=3, first_match=False, word_boundary=None, chunk_size=BATCH_CHUNK_SIZE):
+    """Stream BatchClassifications for any iterable of descriptions, chunk_size at a time (needs NumPy).
+
+    Every practice area is scored by its weighted keyword hits (a multi-word phrase
+    counts once per word) and `scores` holds the top_k areas with their share of the
+    total. practice_area is the best-scoring area, or with first_match=True the
+    first area in precedence order with any hit - exactly what
+    classify_practice_area returns. One rules version is used for the whole stream.
+    """
+    if word_boundary is None:
+        word_boundary = PRACTICE_AREA_WORD_BOUNDARY
+    rules = current_rules()
+    descriptions = iter(descriptions)
+    while True:
+        chunk = list(islice(descriptions, chunk_size))
+        if not chunk:
+            return
+        yield from _classify_chunk(chunk, top_k, first_match, word_boundary, rules)
+
+
+def classify_batch(descriptions, top_k=3, first_match=False, word_boundary=None, chunk_size=BATCH_CHUNK_SIZE):
+    """List form of iter_classify_batch"""
+    return list(iter_classify_batch(descriptions, top_k, first_match, word_boundary, chunk_size))
@@ -0,0 +1,245 @@
+"""Replay dead-lettered leads through the normal delivery path at a controlled rate.
+
+    python deadletter.py list --limit 20
+    python deadletter.py replay --rate 10 --concurrency 4
+    python deadletter.py replay --destination crm --limit 500
+
+Dead letters are spool entries parked as 'failed': inline deliveries that raised or
+got a non-2xx answer, and queued ones that ran out of SPOOL_MAX_ATTEMPTS. A replay
+claims them one at a time in id order, sends each through app.deliver_to_zapier
+(same routing, breaker, rate limit and pooled client as live traffic), deletes it
+on a 2xx and parks it again with the new error otherwise. The same replay runs
+in the app behind POST /dead-letters/replay.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from circuit import DestinationUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Bearer token for GET /dead-letters and POST /dead-letters/replay (unset disables them)
+DEAD_LETTER_API_TOKEN = os.environ.get('DEAD_LETTER_API_TOKEN', '')
+# Default pace (leads/second) and deliveries in flight for a replay
+DEAD_LETTER_REPLAY_RATE = float(os.environ.get('DEAD_LETTER_REPLAY_RATE', 5))
+DEAD_LETTER_REPLAY_CONCURRENCY = int(os.environ.get('DEAD_LETTER_REPLAY_CONCURRENCY', 4))
+# Seconds between progress log lines while a replay runs
+DEAD_LETTER_PROGRESS_SECONDS = float(os.environ.get('DEAD_LETTER_PROGRESS_SECONDS', 10))
+
+
+class ReplayJob:
+    """Re-deliver the dead letters present when it starts, at `rate`/s with at most `concurrency` in flight.
+
+    A destination that is shedding load (rate limited) pauses the replay for its
+    Retry-After; one whose breaker is open stops it, leaving the rest parked for a
+    later run.
+    """
+
+    def __init__(self, spool, send, rate=DEAD_LETTER_REPLAY_RATE, concurrency=DEAD_LETTER_REPLAY_CONCURRENCY,
+                 destination=None, limit=None):
+        self.spool = spool
+        self.send = send
+        self.rate = rate
+        self.concurrency = max(1, concurrency)
+        self.destination = destination
+        self.limit = limit
+        self.total, self.up_to_id = spool.dead_letter_stats(destination)
+        if limit is not None:
+            self.total = min(self.total, limit)
+        self.claimed = self.delivered = self.failed = 0
+        self.state = 'pending'
+        self.stopped_reason = ''
+        self.last_error = ''
+        self.started_at = self.finished_at = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._slots = threading.Semaphore(self.concurrency)
+        self._thread = None
+
+    def start(self):
+        """Run in a background thread"""
+        self._thread = threading.Thread(target=self.run, name="dead-letter-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.state not in ('pending', 'running')
+
+    def cancel(self):
+        """Stop claiming; deliveries already in flight finish"""
+        self._cancelled.set()
+
+    def running(self):
+        return self.state == 'running'
+
+    def run(self):
+        self.state = 'running'
+        self.started_at = time.time()
+        logger.info(f"📮 Replaying {self.total} dead letter(s) at {self.rate}/s, {self.concurrency} at a time")
+        next_send = next_report = time.monotonic()
+        last_id = 0
+        try:
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="dead-letter") as pool:
+                while not self._cancelled.is_set() and (self.limit is None or self.claimed < self.limit):
+                    self._slots.acquire()
+                    # sends are spaced 1/rate apart, never bunched up to catch up after a wait for a slot
+                    delay = next_send - time.monotonic()
+                    if delay > 0 and self._cancelled.wait(delay):
+                        self._slots.release()
+                        break
+                    if self.rate > 0:
+                        next_send = max(next_send, time.monotonic()) + 1 / self.rate
+                    entry = self.spool.claim_dead_letter(last_id, self.up_to_id, self.destination)
+                    if entry is None:
+                        self._slots.release()
+                        break
+                    last_id = entry[0]
+                    self.claimed += 1
+                    pool.submit(self._deliver, *entry)
+                    if time.monotonic() >= next_report:
+                        next_report = time.monotonic() + DEAD_LETTER_PROGRESS_SECONDS
+                        logger.info(f"📮 Dead-letter replay: {self.progress_line()}")
+        except Exception as e:
+            self._stop(f"{e.__class__.__name__}: {e}")
+            logger.error(f"❌ Dead-letter replay failed: {e}")
+        self.finished_at = time.time()
+        if self.state == 'running':
+            self.state = 'cancelled' if self._cancelled.is_set() else 'finished'
+        logger.info(f"📮 Dead-letter replay {self.state}: {self.progress_line()}")
+        return self.progress()
+
+    def _deliver(self, entry_id, destination, payload, attempts):
+        try:
+            outcome = self._attempt(entry_id, destination, payload)
+        finally:
+            self._slots.release()
+        if outcome is None:
+            return
+        with self._lock:
+            if outcome == 'delivered':
+                self.delivered += 1
+            else:
+                self.failed += 1
+                self.last_error = outcome
+                logger.warning(f"⚠️ Dead letter {entry_id} failed again (attempt {attempts}): {outcome}")
+
+    def _attempt(self, entry_id, destination, payload):
+        """'delivered', the error the entry was parked again with, or None if the replay stopped first"""
+        try:
+            while True:
+                try:
+                    response = self.send(destination, payload)
+                    break
+                except DestinationUnavailable as e:
+                    if e.reason != "rate limited" or self._cancelled.is_set():
+                        self.spool.release(entry_id)
+                        self._stop(str(e))
+                        return None
+                    time.sleep(e.retry_after)
+        except Exception as e:
+            return self._park(entry_id, f"{e.__class__.__name__}: {e}")
+        if not 200 <= response.status_code < 300:
+            return self._park(entry_id, f"HTTP {response.status_code}: {response.text[:200]}")
+        try:
+            self.spool.ack(entry_id)
+        except Exception as e:
+            # the lead is delivered, so it is never parked again; its 'replaying' lease runs
+            # out and a later replay sends it once more
+            logger.error(f"❌ Dead letter {entry_id} was delivered but could not be removed from the spool: {e}")
+        return 'delivered'
+
+    def _park(self, entry_id, error):
+        try:
+            self.spool.fail(entry_id, error)
+        except Exception:
+            pass  # the lease runs out and the next replay picks it up
+        return error
+
+    def _stop(self, reason):
+        with self._lock:
+            if self.state == 'running':
+                self.state = 'stopped'
+                self.stopped_reason = reason
+        self._cancelled.set()
+
+    def progress_line(self):
+        return (f"{self.delivered + self.failed}/{self.total} done, {self.delivered} delivered, "
+                f"{self.failed} failed again")
+
+    def progress(self):
+        with self._lock:
+            elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0
+            done = self.delivered + self.failed
+            return {
+                "state": self.state,
+                "stopped_reason": self.stopped_reason,
+                "destination": self.destination,
+                "rate": self.rate,
+                "concurrency": self.concurrency,
+                "total": self.total,
+                "claimed": self.claimed,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "remaining": max(0, self.total - done),
+                "last_error": self.last_error,
+                "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat() if self.started_at else None,
+                "elapsed_seconds": round(elapsed, 1),
+                "leads_per_second": round(done / elapsed, 2) if elapsed else 0,
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or replay dead-lettered leads")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="show the newest dead letters")
+    listing.add_argument("--limit", type=int, default=50)
+    listing.add_argument("--destination", help="routing table destination name")
+    replay = sub.add_parser("replay", help="re-deliver dead letters")
+    replay.add_argument("--rate", type=float, default=DEAD_LETTER_REPLAY_RATE, help="leads per second (0 = unpaced)")
+    replay.add_argument("--concurrency", type=int, default=DEAD_LETTER_REPLAY_CONCURRENCY, help="deliveries in flight")
+    replay.add_argument("--destination", help="routing table destination name (default: all)")
+    replay.add_argument("--limit", type=int, default=None, help="stop after this many")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    import app
+    from spool import SPOOL_PATH, OutboundSpool
+
+    destination = None
+    if args.destination:
+        route = app.get_routing_table().destinations.get(args.destination)
+        if route is None:
+            parser.error(f"no destination {args.destination!r} in the routing table")
+        destination = route.url
+    if args.command == "list":
+        if os.path.exists(SPOOL_PATH):
+            for entry in OutboundSpool(read_only=True).dead_letters(args.limit, destination):
+                print(json.dumps(entry))
+        return 0
+
+    # the spool directly, without starting its dispatchers in this process
+    spool = OutboundSpool()
+
+    job = ReplayJob(spool, app.deliver_to_zapier, args.rate, args.concurrency, destination, args.limit).start()
+    try:
+        while not job.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        job.cancel()
+        job.wait()
+    progress = job.progress()
+    print(json.dumps(progress, indent=2))
+    return 0 if progress["state"] == "finished" and not progress["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
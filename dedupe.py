@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# How long a processed webhook is remembered (0 turns deduplication off)
+DEDUPE_WINDOW_SECONDS = float(os.environ.get('DEDUPE_WINDOW_SECONDS', 600))
+DEDUPE_MAX_ENTRIES = int(os.environ.get('DEDUPE_MAX_ENTRIES', 10000))
+# How long a retry waits for the original request that is still being processed
+DEDUPE_WAIT_SECONDS = float(os.environ.get('DEDUPE_WAIT_SECONDS', 30))
+# Optional SQLite file shared by all worker processes on the host
+DEDUPE_DB_PATH = os.environ.get('DEDUPE_DB_PATH', '')
+
+
+def request_key(data):
+    """contact_id plus a hash of the canonical (sorted, compact) JSON body"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f"{data.get('contact_id', '')}:{digest}"
+
+
+class IdempotencyCache:
+    """TTL + LRU record of answered webhooks, so GHL retries are answered without reprocessing"""
+
+    def __init__(self, window=DEDUPE_WINDOW_SECONDS, max_entries=DEDUPE_MAX_ENTRIES,
+                 wait_seconds=DEDUPE_WAIT_SECONDS, db_path=DEDUPE_DB_PATH):
+        self.window = window
+        self.max_entries = max_entries
+        self.wait_seconds = wait_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._releases = 0
+        if db_path:
+            self._db().execute("""
+                CREATE TABLE IF NOT EXISTS idempotency (
+                    key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    body TEXT NOT NULL DEFAULT '',
+                    code INTEGER NOT NULL DEFAULT 0,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key):
+        """Recorded (body, status) for a duplicate, or None when the caller should process it.
+
+        A None return makes the caller the owner of `key` until it calls release().
+        If another request for the same key is still in flight, wait for its result;
+        after wait_seconds the caller becomes a second owner of the same key.
+        """
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            with self._lock:
+                result = self._get_local(key)
+                if result is not None:
+                    return result
+                event = self._inflight.get(key)
+                if event is None:
+                    self._inflight[key] = threading.Event()
+                    break
+            if not event.wait(max(0, deadline - time.monotonic())):
+                # the original is taking too long - process this one ourselves, leaving its
+                # event in place so whichever of us releases first wakes every waiter
+                break
+
+        if self.db_path:
+            try:
+                result = self._claim_shared(key, deadline)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared dedupe store unavailable, falling back to local cache: {e}")
+                result = None
+            if result is not None:
+                self._finish_local(key, result)
+                return result
+        return None
+
+    def release(self, key, result=None):
+        """Record the owner's result; None (a failure) lets the next retry process it again"""
+        if self.db_path:
+            try:
+                if result is None:
+                    self._db().execute("DELETE FROM idempotency WHERE key = ? AND state = 'pending'", (key,))
+                else:
+                    self._db().execute(
+                        "UPDATE idempotency SET state = 'done', body = ?, code = ?, expires_at = ? WHERE key = ?",
+                        (result[0], result[1], time.time() + self.window, key)
+                    )
+                self._releases += 1
+                if self._releases % 1000 == 0:
+                    self.prune()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not record dedupe result in shared store: {e}")
+        self._finish_local(key, result)
+
+    def _get_local(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _finish_local(self, key, result):
+        with self._lock:
+            if result is not None:
+                self._entries[key] = (time.monotonic() + self.window, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _claim_shared(self, key, deadline):
+        """Cross-process version of claim() on the SQLite store"""
+        conn = self._db()
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT state, body, code, expires_at FROM idempotency WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[3] < now or (row[0] == 'pending' and time.monotonic() >= deadline):
+                    conn.execute(
+                        "INSERT OR REPLACE INTO idempotency (key, state, expires_at) VALUES (?, 'pending', ?)",
+                        (key, now + self.wait_seconds)
+                    )
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if row[0] == 'done':
+                return (row[1], row[2])
+            # another worker is processing it right now
+            time.sleep(0.05)
+
+    def prune(self):
+        """Drop expired rows from the shared store"""
+        if self.db_path:
+            self._db().execute("DELETE FROM idempotency WHERE expires_at < ?", (time.time(),))
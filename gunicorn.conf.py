@@ -0,0 +1,56 @@
+# Production launcher for the webhook bridge:
+#
+#     gunicorn -c gunicorn.conf.py app:app
+#
+# Pre-forks WEB_CONCURRENCY worker processes (default: one per core), each running
+# GUNICORN_THREADS request threads. The app is imported and warmed up once in the
+# master so workers fork with the classifier and regex tables already built. On
+# SIGTERM gunicorn stops accepting connections and gives in-flight requests (and
+# their Zapier POSTs) up to GRACEFUL_TIMEOUT seconds; each worker then drains its
+# spool dispatchers before exiting.
+import math
+import multiprocessing
+import os
+
+from http_client import delivery_budget
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 8080)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+preload_app = True
+
+# Zapier POSTs can take up to 30 s per attempt, so give in-flight work longer than that
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# Long enough for a delivery already in flight to use all its retries: every attempt
+# timing out plus the backoff between them (170 s with the default HTTP_* settings).
+# Raise it if a route's own `timeout` is longer than HTTP_READ_TIMEOUT.
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', math.ceil(delivery_budget()) + 5))
+keepalive = 5
+
+accesslog = os.environ.get('ACCESS_LOG') or None
+errorlog = '-'
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before any worker forks"""
+    import app
+    if app.WARM_UP:
+        app.warm_up()
+        server.log.info("Warm-up complete - classifier and extraction tables ready")
+
+
+def post_fork(server, worker):
+    # The background log writer thread does not survive fork; start a fresh one
+    import telemetry
+    telemetry.configure_logging()
+
+    # Start this worker's dispatchers now so a backlog left in the spool drains without waiting for traffic
+    import app
+    app.resume_spool()
+
+
+def worker_exit(server, worker):
+    """Let queued deliveries that are already in flight finish before the worker goes away"""
+    import app
+    app.shutdown(timeout=graceful_timeout)
@@ -0,0 +1,222 @@
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per destination host
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+# Per-attempt timeouts in seconds
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 30))
+# Attempts per delivery (1 = no retry) and the exponential backoff envelope
+HTTP_MAX_ATTEMPTS = int(os.environ.get('HTTP_MAX_ATTEMPTS', 4))
+HTTP_BACKOFF_BASE = float(os.environ.get('HTTP_BACKOFF_BASE', 0.5))
+HTTP_BACKOFF_MAX = float(os.environ.get('HTTP_BACKOFF_MAX', 10))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt, base=HTTP_BACKOFF_BASE, cap=HTTP_BACKOFF_MAX, retry_after=''):
+    """Full-jitter exponential delay, honouring a numeric Retry-After header on 429/503"""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), cap)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def delivery_budget(connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                    max_attempts=HTTP_MAX_ATTEMPTS, backoff_max=HTTP_BACKOFF_MAX):
+    """Worst-case seconds for one post_json without a deadline: every attempt timing out,
+    with the longest backoff (HTTP_BACKOFF_MAX, reachable through Retry-After) between them"""
+    max_attempts = max(1, max_attempts)
+    return max_attempts * (connect_timeout + read_timeout) + (max_attempts - 1) * backoff_max
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline left no time for another attempt; `retry_after` is the backoff that was cut short"""
+
+    def __init__(self, url, attempts, retry_after):
+        super().__init__(f"{url} out of time after {attempts} attempt(s)")
+        self.url = url
+        self.attempts = attempts
+        self.retry_after = retry_after
+
+
+def out_of_time(deadline, delay=0):
+    """True when `delay` more seconds would reach a time.perf_counter() `deadline` (never without one)"""
+    return deadline is not None and time.perf_counter() + delay >= deadline
+
+
+def capped_timeout(timeout, deadline):
+    """(connect, read) timeouts cut to the time left before `deadline`"""
+    if deadline is None:
+        return timeout
+    left = deadline - time.perf_counter()
+    return (min(timeout[0], left), min(timeout[1], left))
+
+
+class OutboundClient:
+    """Shared HTTP client: one keep-alive connection pool per host, jittered retries.
+
+    requests is imported here, on first delivery, not with the module - it is a
+    third of the app's import time and queue mode never needs it on a request thread.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, max_attempts=HTTP_MAX_ATTEMPTS,
+                 backoff_base=HTTP_BACKOFF_BASE, backoff_max=HTTP_BACKOFF_MAX):
+        import requests
+
+        self._requests = requests
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, url):
+        """Session for the URL's host, created on first use"""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._requests.Session()
+                    # pool_block keeps us at pool_size sockets instead of opening throwaway ones
+                    adapter = self._requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+                    session.mount(f"{parts.scheme}://", adapter)
+                    self._sessions[key] = session
+        return session
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        return backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after)
+
+    def post_json(self, url, payload, timeout=None, deadline=None):
+        """POST JSON, retrying 429/5xx and connection errors; returns the last response.
+
+        The response, or the exception raised after the last retry, carries the number of
+        POSTs made as `attempts`. With a `deadline` (a time.perf_counter() value) each attempt's timeouts are cut to
+        the time left, and DeadlineExceeded is raised instead of a retry that would not
+        finish before it.
+        """
+        requests = self._requests
+        session = self._session(url)
+        timeout = timeout or self.timeout
+        for attempt in range(1, self.max_attempts + 1):
+            if out_of_time(deadline):
+                raise DeadlineExceeded(url, attempt - 1, 0)
+            try:
+                response = session.post(url, json=payload, timeout=capped_timeout(timeout, deadline))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = self._backoff(attempt)
+                if out_of_time(deadline, delay):
+                    raise DeadlineExceeded(url, attempt, delay) from e
+                if attempt == self.max_attempts:
+                    e.attempts = attempt
+                    raise
+                logger.warning(f"⚠️ POST {url} failed ({e.__class__.__name__}), retry {attempt}/{self.max_attempts - 1} in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_attempts:
+                response.attempts = attempt
+                return response
+            delay = self._backoff(attempt, response)
+            if out_of_time(deadline, delay):
+                response.close()
+                raise DeadlineExceeded(url, attempt, delay)
+            logger.warning(f"⚠️ POST {url} returned {response.status_code}, retry {attempt}/{self.max_attempts - 1} in {delay:.2f}s")
+            response.close()
+            time.sleep(delay)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class AsyncOutboundClient:
+    """asyncio counterpart of OutboundClient for the ASGI app, built on httpx (imported lazily)"""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, max_attempts=HTTP_MAX_ATTEMPTS,
+                 backoff_base=HTTP_BACKOFF_BASE, backoff_max=HTTP_BACKOFF_MAX):
+        import asyncio
+        import httpx
+
+        self._sleep = asyncio.sleep
+        self._httpx = httpx
+        # httpx pools per origin; pool_size caps keep-alive sockets for each Zapier host
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    async def post_json(self, url, payload, timeout=None, deadline=None):
+        """POST JSON, retrying 429/5xx and connection errors; returns the last response (`attempts` and `deadline` as in OutboundClient)"""
+        httpx = self._httpx
+        kwargs = {"timeout": timeout} if timeout else {}
+        for attempt in range(1, self.max_attempts + 1):
+            if out_of_time(deadline):
+                raise DeadlineExceeded(url, attempt - 1, 0)
+            if deadline is not None:
+                connect, read = capped_timeout((self.timeout[0], timeout or self.timeout[1]), deadline)
+                kwargs["timeout"] = httpx.Timeout(read, connect=connect)
+            try:
+                response = await self._client.post(url, json=payload, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if out_of_time(deadline, delay):
+                    raise DeadlineExceeded(url, attempt, delay) from e
+                if attempt == self.max_attempts:
+                    e.attempts = attempt
+                    raise
+                logger.warning(f"⚠️ POST {url} failed ({e.__class__.__name__}), retry {attempt}/{self.max_attempts - 1} in {delay:.2f}s")
+                await self._sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_attempts:
+                response.attempts = attempt
+                return response
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, response.headers.get('Retry-After', ''))
+            if out_of_time(deadline, delay):
+                raise DeadlineExceeded(url, attempt, delay)
+            logger.warning(f"⚠️ POST {url} returned {response.status_code}, retry {attempt}/{self.max_attempts - 1} in {delay:.2f}s")
+            await self._sleep(delay)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_clients = {}
+_client_pid = None
+_client_lock = threading.Lock()
+
+def get_client(name='default', read_timeout=HTTP_READ_TIMEOUT):
+    """Process-wide client per destination name (own pool and timeout); rebuilt after a fork so workers never share sockets"""
+    global _clients, _client_pid
+    if _client_pid != os.getpid():
+        with _client_lock:
+            if _client_pid != os.getpid():
+                _clients = {}
+                _client_pid = os.getpid()
+    client = _clients.get(name)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = OutboundClient(read_timeout=read_timeout)
+    return client
@@ -0,0 +1,76 @@
+import json
+import re
+from json.decoder import scanstring
+
+# Top-level webhook fields the pipeline reads; everything else is dropped while parsing
+WEBHOOK_FIELDS = frozenset([
+    "contact_id", "full_name", "email", "phone", "case_description", "city", "state", "tags",
+    "transcription", "transcript", "customData",
+])
+# Fields read from customData
+CUSTOM_DATA_FIELDS = frozenset([
+    "transcription", "transcript", "case_transcript", "full_name", "email", "phone", "case_description",
+])
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class NotAnObject(ValueError):
+    """The body is empty, or valid JSON that is not an object - there is no lead in it"""
+
+
+def parse_body(raw):
+    """Decode a webhook body keeping only the fields the pipeline uses.
+
+    The top-level object is walked key by key, so an unneeded value (a large
+    attachment, a full contact record) only exists while it is being skipped
+    instead of for the whole request. Raises NotAnObject for an empty body or a
+    non-object one (list, string, number...), ValueError for malformed JSON.
+    """
+    text = raw.decode('utf-8-sig') if isinstance(raw, bytes) else (raw or '')
+    pos = _WHITESPACE.match(text, 0).end()
+    if pos == len(text):
+        raise NotAnObject("empty body")
+    if not text.startswith('{', pos):
+        value = _decoder.decode(text)  # garbage stays a plain ValueError
+        raise NotAnObject(f"body is a JSON {type(value).__name__}, not an object")
+
+    data = {}
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    if text.startswith('}', pos):
+        return _finish(text, pos + 1, data)
+    while True:
+        if not text.startswith('"', pos):
+            raise ValueError(f"Expecting property name at char {pos}")
+        key, pos = scanstring(text, pos + 1)
+        pos = _WHITESPACE.match(text, pos).end()
+        if not text.startswith(':', pos):
+            raise ValueError(f"Expecting ':' at char {pos}")
+        value, pos = _decoder.raw_decode(text, _WHITESPACE.match(text, pos + 1).end())
+        if key in WEBHOOK_FIELDS:
+            if key == "customData" and isinstance(value, dict):
+                value = {k: v for k, v in value.items() if k in CUSTOM_DATA_FIELDS}
+            data[key] = value
+        pos = _WHITESPACE.match(text, pos).end()
+        if text.startswith('}', pos):
+            return _finish(text, pos + 1, data)
+        if not text.startswith(',', pos):
+            raise ValueError(f"Expecting ',' delimiter at char {pos}")
+        pos = _WHITESPACE.match(text, pos + 1).end()
+
+
+def _finish(text, pos, data):
+    if _WHITESPACE.match(text, pos).end() != len(text):
+        raise ValueError(f"Extra data at char {pos}")
+    return data
+
+
+def truncate(value, limit):
+    """Bounded text for logs: str/bytes cut to `limit` characters with a note of what was dropped"""
+    if isinstance(value, bytes):
+        value = value[:limit + 1].decode('utf-8', 'replace')
+    value = str(value)
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}... [truncated]"
@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# SQLite file every processed lead is recorded in (unset turns the lead store off)
+LEADS_DB_PATH = os.environ.get('LEADS_DB_PATH', '')
+# A lead is a repeat caller if the same phone, email or contact_id came in this many days before
+LEADS_REPEAT_DAYS = float(os.environ.get('LEADS_REPEAT_DAYS', 7))
+# Leads written per transaction, and the longest one waits in memory before it is written
+LEADS_BATCH_SIZE = int(os.environ.get('LEADS_BATCH_SIZE', 200))
+LEADS_FLUSH_SECONDS = float(os.environ.get('LEADS_FLUSH_SECONDS', 1))
+# Bearer token for GET /leads (unset disables the endpoint - the store holds PII)
+LEADS_API_TOKEN = os.environ.get('LEADS_API_TOKEN', '')
+
+LOOKUP_FIELDS = ('phone', 'email', 'contact_id')
+
+
+def phone_key(phone):
+    """Digits of a phone as format_phone_number leaves it: "(555) 123-4567" -> "5551234567" """
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits
+
+
+def email_key(email):
+    return (email or '').strip().lower()
+
+
+class LeadStore:
+    """Indexed SQLite (WAL) record of every lead, written in batches by a background thread.
+
+    Phone, email and contact_id are each indexed together with received_at, so a
+    lookup or a repeat-caller check is a few index range scans however many rows
+    the table holds.
+    """
+
+    def __init__(self, path=LEADS_DB_PATH, batch_size=LEADS_BATCH_SIZE, flush_seconds=LEADS_FLUSH_SECONDS):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._local = threading.local()
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leads (
+                id INTEGER PRIMARY KEY,
+                request_key TEXT NOT NULL UNIQUE,
+                received_at REAL NOT NULL,
+                contact_id TEXT NOT NULL DEFAULT '',
+                phone TEXT NOT NULL DEFAULT '',
+                email TEXT NOT NULL DEFAULT '',
+                full_name TEXT NOT NULL DEFAULT '',
+                practice_area TEXT NOT NULL DEFAULT '',
+                payload TEXT NOT NULL
+            )
+        """)
+        for field in LOOKUP_FIELDS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS leads_{field} ON leads ({field}, received_at)")
+
+    def _conn(self):
+        """One connection per thread; WAL lets lookups run while the writer commits"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # a lost last second of lead history is acceptable; an fsync per batch is enough
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, key, outbound_payload):
+        """Queue a lead for the writer thread; never touches the disk on the caller's thread"""
+        self._ensure_writer()
+        self._queue.put((key, time.time(), outbound_payload))
+
+    def _ensure_writer(self):
+        # pid check: a writer started before a fork does not exist in the child
+        if self._writer is None or self._writer[0] != os.getpid():
+            with self._writer_lock:
+                if self._writer is None or self._writer[0] != os.getpid():
+                    thread = threading.Thread(target=self._write_loop, name="lead-writer", daemon=True)
+                    self._writer = (os.getpid(), thread)
+                    thread.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = None in batch
+            rows = [item for item in batch if item is not None]
+            if rows:
+                try:
+                    self._insert(rows)
+                except sqlite3.Error as e:
+                    logger.error(f"❌ Could not record {len(rows)} lead(s) in {self.path}: {e}")
+            if stop:
+                return
+
+    def _insert(self, rows):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """INSERT OR IGNORE INTO leads
+                   (request_key, received_at, contact_id, phone, email, full_name, practice_area, payload)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(key, received_at, payload.get("Contact ID", ""), phone_key(payload.get("Phone")),
+                  email_key(payload.get("Email")), payload.get("Full Name", ""), payload.get("Practice Area", ""),
+                  json.dumps(payload)) for key, received_at, payload in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _matching_ids(self, identity, since, exclude_key=''):
+        """SQL and params selecting ids of leads matching any non-empty identity field since `since`"""
+        selects, params = [], []
+        for field in LOOKUP_FIELDS:
+            if identity.get(field):
+                selects.append(f"SELECT id FROM leads WHERE {field} = ? AND received_at >= ? AND request_key != ?")
+                params += [identity[field], since, exclude_key]
+        return " UNION ".join(selects), params
+
+    def previous_leads(self, outbound_payload, key='', days=LEADS_REPEAT_DAYS):
+        """How many earlier leads in the last `days` share this lead's phone, email or contact_id"""
+        identity = {
+            'phone': phone_key(outbound_payload.get("Phone")),
+            'email': email_key(outbound_payload.get("Email")),
+            'contact_id': outbound_payload.get("Contact ID", ""),
+        }
+        sql, params = self._matching_ids(identity, time.time() - days * 86400, key)
+        if not sql:
+            return 0
+        return self._conn().execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+    def lookup(self, phone='', email='', contact_id='', days=None, limit=50):
+        """Newest-first leads matching any of the given identities"""
+        identity = {'phone': phone_key(phone), 'email': email_key(email), 'contact_id': contact_id}
+        since = time.time() - days * 86400 if days else 0
+        sql, params = self._matching_ids(identity, since)
+        if not sql:
+            return []
+        rows = self._conn().execute(
+            f"""SELECT id, received_at, contact_id, phone, email, full_name, practice_area, payload
+                FROM leads WHERE id IN ({sql}) ORDER BY received_at DESC LIMIT ?""",
+            params + [limit]
+        ).fetchall()
+        return [{
+            "id": row[0],
+            "received_at": datetime.fromtimestamp(row[1], timezone.utc).isoformat(),
+            "contact_id": row[2],
+            "phone": row[3],
+            "email": row[4],
+            "full_name": row[5],
+            "practice_area": row[6],
+            "payload": json.loads(row[7]),
+        } for row in rows]
+
+    def stop(self, timeout=10):
+        """Write whatever is queued, then stop the writer"""
+        if self._writer is not None and self._writer[0] == os.getpid():
+            self._queue.put(None)
+            self._writer[1].join(timeout)
+            self._writer = None
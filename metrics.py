@@ -0,0 +1,167 @@
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds: sub-millisecond parsing up to the 30 s Zapier timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labels, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Current value; either set directly or read from `callback` at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback=None):
+        super().__init__(name, documentation)
+        self._value = 0
+        self._callback = callback
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def _samples(self):
+        value = self._value
+        if self._callback is not None:
+            try:
+                value = self._callback()
+            except Exception:
+                return []
+        return [f"{self.name} {value}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        # bucket counts are stored non-cumulatively and summed at scrape time
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        label_names = self.labels + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_label_text(label_names, key + (bound,))} {cumulative}")
+            labels = _label_text(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render():
+    """Everything registered, in Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Webhook pipeline
+STAGE_SECONDS = Histogram(
+    "webhook_stage_seconds", "Time spent in each webhook processing stage", labels=("stage",))
+REQUEST_SECONDS = Histogram(
+    "webhook_request_seconds", "End-to-end webhook handling time", labels=("status",))
+REQUESTS_IN_FLIGHT = Gauge("webhook_requests_in_flight", "Webhook requests currently being handled")
+LEADS = Counter("webhook_leads_total", "Leads processed by detected practice area", labels=("practice_area",))
+DUPLICATES = Counter("webhook_duplicates_total", "GHL retries answered from the idempotency cache")
+ENRICHMENT_SKIPPED = Counter(
+    "webhook_enrichment_skipped_total", "Optional enrichment steps skipped to stay inside the request deadline",
+    labels=("step",))
+
+# Zapier delivery
+ZAPIER_SECONDS = Histogram("zapier_request_seconds", "Zapier POST round-trip time including retries")
+ZAPIER_RESPONSES = Counter(
+    "zapier_responses_total", "Zapier responses by status code ('error' when no response)", labels=("status_code",))
+ZAPIER_BATCH_LEADS = Histogram(
+    "zapier_batch_leads", "Leads per Zapier POST (1 unless batching is on)", buckets=(1, 2, 5, 10, 25, 50, 100))
+ZAPIER_IN_FLIGHT = Gauge("zapier_deliveries_in_flight", "Zapier POSTs currently waiting on a response")
+QUEUED_DELIVERIES = Gauge("zapier_deliveries_queued", "Leads waiting in the outbound spool")
+DEAD_LETTERS = Gauge("zapier_dead_letters", "Leads parked after a failed delivery, waiting for a replay")
+BREAKERS_OPEN = Gauge("zapier_breakers_open", "Destinations whose circuit breaker is open or half-open")
+SHED = Counter(
+    "webhook_shed_total", "Leads not delivered inline because the destination was open, rate limited or out of time",
+    labels=("reason", "action"))
+
+
+def observe_request(trace, status):
+    """Fold a finished RequestTrace into the pipeline metrics"""
+    for stage, elapsed_ms in trace.stages.items():
+        STAGE_SECONDS.observe(elapsed_ms / 1000, stage)
+    REQUEST_SECONDS.observe(trace.elapsed(), str(status))
+    practice_area = trace.fields.get("practice_area")
+    if practice_area:
+        LEADS.inc(practice_area)
+    for step in trace.skipped:
+        ENRICHMENT_SKIPPED.inc(step)
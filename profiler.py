@@ -0,0 +1,202 @@
+import cProfile
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from telemetry import current_trace, record
+
+logger = logging.getLogger(__name__)
+
+# "cprofile" (deterministic, .prof files) or "sampling" (stack samples, .folded files); unset = off
+PROFILER = os.environ.get('PROFILER', '').lower()
+# Fraction of requests profiled once PROFILER is set; 0 = only requests carrying the header
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 1))
+# Shared secret: a request whose X-Profile-Token header matches is always profiled
+PROFILE_SECRET = os.environ.get('PROFILE_SECRET', '')
+PROFILE_HEADER = 'X-Profile-Token'
+# Where profiles are written, and how many of the newest are kept
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+# Seconds between stack samples in sampling mode
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.001))
+
+_current_profile = ContextVar('request_profile', default=None)
+# One profiled request per process at a time: profilers are not cheap, and cProfile
+# cannot run twice at once on Python 3.12+
+_busy = threading.Lock()
+
+
+class RequestProfile:
+    """Profile of one webhook across every thread that works on it, plus timed sections"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.sections = Counter()
+        self.profiles = []
+        self.stacks = Counter()
+        self.threads = set()
+        self._done = threading.Event()
+        self._sampler = None
+        if mode == 'sampling':
+            self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def attach(self):
+        """Profile the calling thread until the block exits"""
+        if self.mode == 'sampling':
+            ident = threading.get_ident()
+            self.threads.add(ident)
+            try:
+                yield
+            finally:
+                self.threads.discard(ident)
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler already owns this interpreter (3.12+) - time sections only
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.profiles.append(profile)
+
+    def _sample(self):
+        while not self._done.wait(PROFILE_INTERVAL):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[_fold(frame)] += 1
+
+    def dominant_section(self):
+        return max(self.sections, key=self.sections.get) if self.sections else None
+
+    def finish(self, trace):
+        """Stop profiling and write the dump files; returns their common path prefix"""
+        self._done.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + f"{int(now * 1e6) % 1000000:06d}"
+        stem = os.path.join(PROFILE_DIR, f"webhook-{stamp}-{os.getpid()}")
+
+        if self.mode == 'sampling':
+            with open(stem + '.folded', 'w', encoding='utf-8') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        elif self.profiles:
+            import pstats
+            pstats.Stats(*self.profiles).dump_stats(stem + '.prof')
+
+        summary = {
+            "mode": self.mode,
+            "contact_id": trace.fields.get("contact_id", "") if trace else "",
+            "duration_ms": round(trace.elapsed() * 1000, 3) if trace else None,
+            "stages_ms": dict(trace.stages) if trace else {},
+            "sections_ms": {name: round(ms, 3) for name, ms in self.sections.most_common()},
+            "dominant_section": self.dominant_section(),
+        }
+        with open(stem + '.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        _rotate()
+        return stem
+
+
+def _fold(frame):
+    """A thread's stack in collapsed form (root first, ';'-separated), as flamegraph.pl and speedscope read it"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _rotate():
+    """Delete all but the PROFILE_KEEP newest profiles (names sort by time)"""
+    stems = sorted({name.rsplit('.', 1)[0] for name in os.listdir(PROFILE_DIR) if name.startswith('webhook-')})
+    for stem in stems[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else ():
+        for suffix in ('.prof', '.folded', '.json'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _wanted(token):
+    if not PROFILER:
+        return False
+    if token and PROFILE_SECRET and hmac.compare_digest(token.encode(), PROFILE_SECRET.encode()):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+@contextmanager
+def profile_request(token=None, attach=True):
+    """Profile the enclosed request if PROFILER is on and it is sampled or carries the secret header.
+
+    `attach=False` leaves the calling thread out (the ASGI event loop); work handed to
+    threads through run_attached is profiled either way.
+    """
+    if not _wanted(token):
+        yield None
+        return
+    if not _busy.acquire(blocking=False):
+        record(profile_skipped="busy")
+        yield None
+        return
+    try:
+        session = RequestProfile(PROFILER)
+        reset = _current_profile.set(session)
+        try:
+            if attach:
+                with session.attach():
+                    yield session
+            else:
+                yield session
+        finally:
+            _current_profile.reset(reset)
+            try:
+                stem = session.finish(current_trace())
+                record(profile=stem, profile_dominant_section=session.dominant_section())
+            except OSError as e:
+                logger.error(f"❌ Could not write profile: {e}")
+    finally:
+        _busy.release()
+
+
+def run_attached(func, *args):
+    """Call func, profiling this thread too if the current request is being profiled"""
+    session = _current_profile.get()
+    if session is None:
+        return func(*args)
+    with session.attach():
+        return func(*args)
+
+
+@contextmanager
+def section(name):
+    """Time a named step of a profiled request (no-op otherwise); the slowest is reported as dominant"""
+    session = _current_profile.get()
+    if session is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.sections[name] += (time.perf_counter() - started) * 1000
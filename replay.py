@@ -0,0 +1,136 @@
+"""Replay captured GHL webhook payloads (JSONL) through the webhook pipeline.
+
+    python replay.py captured.jsonl -o outbound.ndjson --dry-run
+    python replay.py captured.jsonl --workers 8 --chunksize 500
+    python replay.py transcripts/ --dry-run     # an ARCHIVE_DIR, streamed straight from its segments
+
+Each input line is one raw webhook body; an archive directory yields one body per
+archived transcript (contact_id and transcript only). Lines are processed in parallel across
+a process pool and the outbound payloads are written as NDJSON in input order.
+Only a bounded number of chunks is in flight at once, so memory stays flat no
+matter how large the input is.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+logger = logging.getLogger("replay")
+
+
+def _init_worker(log_level):
+    import app  # noqa: F401 - pay the import (and its logging setup) once per worker
+    logging.getLogger().setLevel(log_level)
+
+
+def _process_chunk(job):
+    """Build outbound payloads for a chunk of (line_number, raw_line); delivers them unless dry-run"""
+    lines, dry_run = job
+    import app
+
+    results = []
+    for line_number, raw in lines:
+        try:
+            data = json.loads(raw)
+            if not isinstance(data, dict):
+                raise ValueError("payload is not a JSON object")
+            payload = app.build_outbound_payload(data)
+        except Exception as e:
+            results.append((line_number, None, f"{e.__class__.__name__}: {e}"))
+            continue
+
+        error = None
+        if not dry_run:
+            try:
+                for destination in app.get_routing_table().route(payload):
+                    response = app.deliver_to_zapier(destination.url, payload)
+                    if not 200 <= response.status_code < 300:
+                        error = f"{destination.name} returned {response.status_code}"
+            except Exception as e:
+                error = f"delivery failed: {e}"
+        results.append((line_number, payload, error))
+    return results
+
+
+def _read_chunks(stream, chunksize):
+    chunk = []
+    for line_number, raw in enumerate(stream, 1):
+        if not raw.strip():
+            continue
+        chunk.append((line_number, raw))
+        if len(chunk) >= chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replay(stream, out, workers=None, chunksize=200, dry_run=True, log_level=logging.WARNING):
+    """Stream JSONL webhook bodies through the pipeline; returns (processed, failed) counts"""
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 2
+    processed = failed = 0
+
+    with Pool(workers, initializer=_init_worker, initargs=(log_level,)) as pool:
+        pending = deque()
+
+        def drain_one():
+            nonlocal processed, failed
+            for line_number, payload, error in pending.popleft().get():
+                if payload is not None:
+                    out.write(json.dumps(payload) + "\n")
+                    processed += 1
+                if error:
+                    failed += 1
+                    logger.warning(f"line {line_number}: {error}")
+
+        for chunk in _read_chunks(stream, chunksize):
+            pending.append(pool.apply_async(_process_chunk, ((chunk, dry_run),)))
+            if len(pending) >= max_pending:
+                drain_one()
+        while pending:
+            drain_one()
+
+    return processed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured GHL webhook payloads through the webhook pipeline")
+    parser.add_argument("input", help="JSONL file of raw webhook bodies ('-' for stdin), or a transcript archive directory")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON file for outbound payloads (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=200, help="records handed to a worker at a time")
+    parser.add_argument("--dry-run", action="store_true", help="build payloads only; never contact Zapier")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's per-record INFO logging")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    log_level = logging.INFO if args.verbose else logging.WARNING
+
+    if os.path.isdir(args.input):
+        from archive import iter_transcripts, webhook_body
+        stream = (json.dumps(webhook_body(entry)) for entry in iter_transcripts(args.input))
+    else:
+        stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    started = time.perf_counter()
+    try:
+        processed, failed = replay(stream, out, args.workers, args.chunksize, args.dry_run, log_level)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    mode = "dry run" if args.dry_run else "delivered to Zapier"
+    logger.info(f"Replayed {processed} records ({failed} failed) in {elapsed:.1f}s - {mode}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
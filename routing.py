@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+from collections import namedtuple
+
+from http_client import HTTP_READ_TIMEOUT
+from rules import current_rules
+
+logger = logging.getLogger(__name__)
+
+# JSON routing table; unset sends every lead to ZAPIER_WEBHOOK_URL only
+ROUTES_PATH = os.environ.get('ROUTES_PATH', '')
+# Practice areas the classifier answers when no keyword matches or there is no description
+FALLBACK_PRACTICE_AREAS = ('General', 'Other')
+
+Destination = namedtuple('Destination', ['name', 'url', 'timeout'])
+Route = namedtuple('Route', ['match', 'destinations', 'copy'])
+
+
+def _normalize(value):
+    return str(value).strip().lower()
+
+
+class RoutingTable:
+    """Maps an outbound payload to the destinations it should be delivered to.
+
+    Routes are tried in order: the first matching route picks the lead's primary
+    destinations (`default` if none matches), and every matching `copy` route adds
+    its destinations on top. `match` maps payload fields (e.g. "Practice Area",
+    "State") to a value or list of values, compared case-insensitively; an empty
+    match matches every lead.
+    """
+
+    def __init__(self, destinations, routes=(), default=()):
+        self.destinations = destinations
+        self.routes = list(routes)
+        self.default = list(default)
+        self._by_url = {destination.url: destination for destination in destinations.values()}
+
+    @classmethod
+    def from_dict(cls, config, default_url=None):
+        destinations = {}
+        for name, spec in config.get("destinations", {}).items():
+            if isinstance(spec, str):
+                spec = {"url": spec}
+            if not spec.get("url"):
+                raise ValueError(f"Routing destination '{name}' has no url")
+            destinations[name] = Destination(name, spec["url"], float(spec.get("timeout", HTTP_READ_TIMEOUT)))
+        if default_url and "zapier" not in destinations:
+            destinations["zapier"] = Destination("zapier", default_url, HTTP_READ_TIMEOUT)
+
+        def resolve(names, where):
+            missing = [name for name in names if name not in destinations]
+            if missing:
+                raise ValueError(f"Routing {where} refers to unknown destination(s): {', '.join(missing)}")
+            return [destinations[name] for name in names]
+
+        routes = []
+        for i, spec in enumerate(config.get("routes", [])):
+            match = {}
+            for field, values in spec.get("match", {}).items():
+                values = values if isinstance(values, list) else [values]
+                match[field] = frozenset(_normalize(value) for value in values)
+            routes.append(Route(match, resolve(spec.get("to", []), f"route {i}"), bool(spec.get("copy"))))
+        default = resolve(config.get("default", ["zapier"] if "zapier" in destinations else []), "default")
+        return cls(destinations, routes, default)
+
+    def route(self, payload):
+        """Destinations for one lead, primary first, without duplicates"""
+        primary = None
+        copies = []
+        for route in self.routes:
+            if route.copy or primary is None:
+                if all(_normalize(payload.get(field, "")) in values for field, values in route.match.items()):
+                    if route.copy:
+                        copies.extend(route.destinations)
+                    else:
+                        primary = route.destinations
+        selected = []
+        for destination in (self.default if primary is None else primary) + copies:
+            if destination not in selected:
+                selected.append(destination)
+        return selected
+
+    def destination(self, url):
+        """The configured Destination for a URL (e.g. a spool entry's), or None"""
+        return self._by_url.get(url)
+
+
+def load_routing_table(default_url, path=ROUTES_PATH):
+    """Read ROUTES_PATH, or route everything to `default_url` when it is unset"""
+    if not path:
+        return RoutingTable.from_dict({}, default_url)
+    with open(path, encoding='utf-8') as f:
+        table = RoutingTable.from_dict(json.load(f), default_url)
+    warn_unknown_practice_areas(table)
+    logger.info(f"Loaded {len(table.routes)} route(s) to {len(table.destinations)} destination(s) from {path}")
+    return table
+
+
+def warn_unknown_practice_areas(table):
+    """Routes match "Practice Area" exactly, so a name missing from rules.json never matches"""
+    names = [name for name, _ in current_rules().practice_areas] + list(FALLBACK_PRACTICE_AREAS)
+    known = {_normalize(name) for name in names}
+    for i, route in enumerate(table.routes):
+        unknown = sorted(route.match.get("Practice Area", frozenset()) - known)
+        if unknown:
+            logger.warning(f"⚠️ Route {i} matches unknown practice area(s) that will never match: {', '.join(unknown)}")
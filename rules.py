@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Versioned keyword taxonomy and extraction rules (see rules.json)
+RULES_PATH = os.environ.get('RULES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json'))
+# How often each process checks RULES_PATH for a new version (0 = load once, never reload)
+RULES_CHECK_SECONDS = float(os.environ.get('RULES_CHECK_SECONDS', 5))
+
+
+class Rules:
+    """One compiled, read-only version of rules.json.
+
+    Callers take a snapshot with current_rules() and use it for the whole call; a
+    reload builds a new Rules and swaps the reference, so a request never sees a
+    half-updated taxonomy.
+    """
+
+    def __init__(self, config, source=""):
+        import classifier
+
+        self.version = str(config["version"])
+        self.source = source
+        self.practice_areas = [(area["name"], list(area["keywords"])) for area in config["practice_areas"]]
+        if not self.practice_areas:
+            raise ValueError("rules define no practice areas")
+        self.driving_override_terms = list(config.get("driving_override_terms", []))
+        self.automaton = classifier.build_automaton(self.practice_areas, self.driving_override_terms)
+        self.dense = None  # classifier's NumPy tables, built on the first batch call
+
+        self.name_patterns = [re.compile(spec["pattern"], re.IGNORECASE) for spec in config.get("name_patterns", [])]
+        self.name_false_positives = tuple(config.get("name_false_positives", []))
+        self.legal_issue_lead_ins = [(spec["lead_in"], spec.get("joiner")) for spec in config.get("legal_issue_lead_ins", [])]
+        self.issue_admin_words = tuple(config.get("issue_admin_words", []))
+        self.legal_keywords = list(config.get("legal_keywords", {}).items())
+
+
+def load_rules(path=RULES_PATH):
+    """Read and compile a rules file; raises on a missing, malformed or invalid one"""
+    with open(path, encoding='utf-8') as f:
+        return Rules(json.load(f), path)
+
+
+_active = None
+_signature = None
+_next_check = 0.0
+_lock = threading.Lock()
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _reload():
+    """Swap in RULES_PATH if it changed; a broken file is logged once and the old version kept"""
+    global _active, _signature, _next_check
+    _next_check = time.monotonic() + RULES_CHECK_SECONDS
+    try:
+        signature = _file_signature(RULES_PATH)
+    except OSError as e:
+        if _active is None:
+            raise
+        logger.error(f"❌ Rules file {RULES_PATH} unreadable, keeping version {_active.version}: {e}")
+        return
+    if signature == _signature:
+        return
+    previous = _active
+    try:
+        rules = load_rules(RULES_PATH)
+    except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+        if previous is None:
+            raise
+        _signature = signature  # don't retry this same file every check
+        logger.error(f"❌ Rules file {RULES_PATH} rejected, keeping version {previous.version}: "
+                     f"{e.__class__.__name__}: {e}")
+        return
+    _signature = signature
+    _active = rules
+    if previous is None:
+        logger.info(f"📚 Loaded rules version {rules.version} from {RULES_PATH}")
+    else:
+        logger.info(f"📚 Rules reloaded: version {previous.version} → {rules.version}")
+
+
+def current_rules():
+    """The active Rules, re-checking RULES_PATH at most every RULES_CHECK_SECONDS"""
+    rules = _active
+    if rules is None:
+        with _lock:
+            if _active is None:
+                _reload()
+            return _active
+    if RULES_CHECK_SECONDS > 0 and time.monotonic() >= _next_check and _lock.acquire(blocking=False):
+        # one thread recompiles while the others carry on with the snapshot they have
+        try:
+            _reload()
+        finally:
+            _lock.release()
+        return _active
+    return rules
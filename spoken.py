@@ -0,0 +1,110 @@
+import re
+
+# Word tokens plus a literal "@"; everything else only separates tokens
+_TOKEN_RE = re.compile(r"[a-z0-9]+|@")
+
+DIGIT_WORDS = {
+    'zero': '0', 'one': '1', 'two': '2', 'three': '3', 'four': '4',
+    'five': '5', 'six': '6', 'seven': '7', 'eight': '8', 'nine': '9'
+}
+
+EMAIL_EXTENSIONS = {'com', 'net', 'org', 'edu', 'gov'}
+
+# Common domain mappings for spoken emails
+DOMAIN_MAPPINGS = {
+    'gmail': 'gmail.com',
+    'g mail': 'gmail.com',
+    'outlook': 'outlook.com',
+    'out look': 'outlook.com',
+    'hotmail': 'hotmail.com',
+    'hot mail': 'hotmail.com',
+    'yahoo': 'yahoo.com',
+    'aol': 'aol.com',
+    'mail': 'mail.com',
+    'live': 'live.com',
+    'msn': 'msn.com',
+    'comcast': 'comcast.net',
+    'verizon': 'verizon.net',
+    'att': 'att.net',
+    'icloud': 'icloud.com',
+    'me': 'me.com'
+}
+
+# Filler that comes before the spoken mailbox name ("my email is john at ...")
+EMAIL_LEAD_IN_WORDS = {
+    'my', 'email', 'mail', 'e', 'address', 'is', 'it', 'its', 's', 'that', 'the',
+    'and', 'yes', 'yeah', 'sure', 'ok', 'okay', 'um', 'uh', 'so', 'oh',
+    'you', 'can', 'reach', 'me', 'at'
+}
+
+# Bounded look-around per "at" keeps the whole scan linear in transcript length
+EMAIL_MAX_NAME_TOKENS = 4
+EMAIL_MAX_DOMAIN_TOKENS = 3
+
+
+def tokenize(text):
+    """Lowercase word tokens with a run id; the run id changes whenever punctuation separates two tokens"""
+    tokens = []
+    run = 0
+    prev_end = 0
+    for match in _TOKEN_RE.finditer(text):
+        start = match.start()
+        if start > prev_end and not text[prev_end:start].isspace():
+            run += 1
+        tokens.append((match.group(), run))
+        prev_end = match.end()
+    return tokens
+
+
+def find_spoken_phone(tokens):
+    """First run of ten spoken digits ("five five five ..."), as a 10-digit string, or ''"""
+    digits = []
+    last_run = None
+    for token, run in tokens + [('', None)]:
+        digit = DIGIT_WORDS.get(token)
+        if digit is not None and run == last_run:
+            digits.append(digit)
+            continue
+        if len(digits) >= 10:
+            # a spoken country code ("one five five five ...") is dropped
+            if len(digits) >= 11 and digits[0] == '1':
+                return "".join(digits[1:11])
+            return "".join(digits[:10])
+        digits = [digit] if digit is not None else []
+        last_run = run
+    return ""
+
+
+def find_spoken_email(tokens):
+    """First spoken email ("john smith at gmail dot com") as (name_part, domain_part, extension), or None"""
+    count = len(tokens)
+    for i, (token, run) in enumerate(tokens):
+        if token not in ('at', '@') or i == 0:
+            continue
+
+        name = []
+        j = i - 1
+        while j >= 0 and len(name) < EMAIL_MAX_NAME_TOKENS:
+            word, word_run = tokens[j]
+            if word_run != run or word in EMAIL_LEAD_IN_WORDS or word == '@':
+                break
+            name.append(word)
+            j -= 1
+        if not name:
+            continue
+
+        domain = []
+        k = i + 1
+        while k < count and len(domain) < EMAIL_MAX_DOMAIN_TOKENS:
+            word, word_run = tokens[k]
+            if word_run != run or word in ('dot', 'at', '@'):
+                break
+            domain.append(word)
+            k += 1
+        if not domain or k + 1 >= count:
+            continue
+        if tokens[k] != ('dot', run) or tokens[k + 1][1] != run or tokens[k + 1][0] not in EMAIL_EXTENSIONS:
+            continue
+
+        return " ".join(reversed(name)), " ".join(domain), tokens[k + 1][0]
+    return None
@@ -0,0 +1,345 @@
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from batching import rejects_batch
+from circuit import DestinationUnavailable
+from http_client import delivery_budget
+
+logger = logging.getLogger(__name__)
+
+# Where queued leads live until Zapier accepts them
+SPOOL_PATH = os.environ.get('SPOOL_PATH', 'outbound_spool.db')
+SPOOL_WORKERS = int(os.environ.get('SPOOL_WORKERS', 2))
+SPOOL_MAX_ATTEMPTS = int(os.environ.get('SPOOL_MAX_ATTEMPTS', 10))
+# How long a claimed entry is held before another dispatcher may take it back. The default
+# outlasts one delivery using all its retries (delivery_budget(), 170 s with the default
+# HTTP_* settings), so a slow but live delivery is never handed out a second time
+SPOOL_LEASE_SECONDS = float(os.environ.get('SPOOL_LEASE_SECONDS', delivery_budget() + 30))
+SPOOL_POLL_INTERVAL = float(os.environ.get('SPOOL_POLL_INTERVAL', 0.5))
+
+
+class OutboundSpool:
+    """Crash-safe SQLite (WAL) queue of outbound payloads waiting for delivery.
+
+    read_only=True opens an existing spool for inspection only: no schema setup and
+    no writes, so looking at it never changes it.
+    """
+
+    def __init__(self, path=SPOOL_PATH, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self._local = threading.local()
+        if read_only:
+            return
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbound (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                destination TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                lease_until REAL NOT NULL DEFAULT 0,
+                last_error TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS outbound_ready ON outbound (status, next_attempt_at)")
+
+    def _conn(self):
+        """One connection per thread; WAL lets readers and the writer overlap"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None and self.read_only:
+            # not mode=ro: a WAL database needs its -shm file, which a read-only open cannot create
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+        elif conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL fsyncs each commit so an acknowledged lead survives power loss
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, destination, payload):
+        """Durably store a payload; returns its spool id once it is on disk"""
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO outbound (destination, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+            (destination, json.dumps(payload), now, now)
+        )
+        return cur.lastrowid
+
+    def claim(self, limit=1):
+        """Lease up to `limit` ready entries; expired leases from a crashed worker are reclaimed"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                """SELECT id, destination, payload, attempts FROM outbound
+                   WHERE (status = 'pending' AND next_attempt_at <= ?)
+                      OR (status = 'inflight' AND lease_until <= ?)
+                   ORDER BY id LIMIT ?""",
+                (now, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbound SET status = 'inflight', lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(now + SPOOL_LEASE_SECONDS, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [(row[0], row[1], json.loads(row[2]), row[3] + 1) for row in rows]
+
+    def renew(self, *entry_ids):
+        """Extend the lease of entries still being worked on, so they are not reclaimed mid-delivery"""
+        placeholders = ",".join("?" * len(entry_ids))
+        self._conn().execute(
+            f"UPDATE outbound SET lease_until = ? WHERE id IN ({placeholders}) AND status = 'inflight'",
+            (time.time() + SPOOL_LEASE_SECONDS, *entry_ids)
+        )
+
+    def ack(self, *entry_ids):
+        """Delivery succeeded - drop the entries (one commit for a whole batch)"""
+        placeholders = ",".join("?" * len(entry_ids))
+        self._conn().execute(f"DELETE FROM outbound WHERE id IN ({placeholders})", entry_ids)
+
+    def retry(self, entry_id, attempts, error):
+        """Delivery failed - back off, or park the entry as failed after too many attempts"""
+        if attempts >= SPOOL_MAX_ATTEMPTS:
+            self._conn().execute(
+                "UPDATE outbound SET status = 'failed', last_error = ? WHERE id = ?",
+                (error, entry_id)
+            )
+            logger.error(f"❌ Spool entry {entry_id} gave up after {attempts} attempts: {error}")
+            return
+        delay = min(300, 2 ** attempts) * random.uniform(0.5, 1.0)
+        self._conn().execute(
+            "UPDATE outbound SET status = 'pending', next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (time.time() + delay, error, entry_id)
+        )
+
+    def defer(self, entry_id, delay, error):
+        """Destination is shedding load - try again later without spending one of the entry's attempts"""
+        self._conn().execute(
+            "UPDATE outbound SET status = 'pending', attempts = attempts - 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (time.time() + delay * random.uniform(1.0, 1.5), error, entry_id)
+        )
+
+    def depth(self):
+        """Number of entries still waiting for delivery"""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM outbound WHERE status IN ('pending', 'inflight')"
+        ).fetchone()[0]
+
+    # Dead letters: entries parked as 'failed' - by retry() after SPOOL_MAX_ATTEMPTS, or by
+    # dead_letter() when an inline delivery failed - wait here until a replay re-delivers them
+
+    def dead_letter(self, destination, payload, attempts, error):
+        """Durably park a payload whose delivery failed; returns its spool id"""
+        now = time.time()
+        cur = self._conn().execute(
+            """INSERT INTO outbound (destination, payload, status, attempts, next_attempt_at, last_error, created_at)
+               VALUES (?, ?, 'failed', ?, ?, ?, ?)""",
+            (destination, json.dumps(payload), attempts, now, error, now)
+        )
+        return cur.lastrowid
+
+    def claim_dead_letter(self, after_id=0, up_to_id=None, destination=None):
+        """Lease the next dead letter after `after_id` for a replay (a dead replay's leases are reclaimed)"""
+        now = time.time()
+        sql = """SELECT id, destination, payload, attempts FROM outbound
+                 WHERE id > ? AND (status = 'failed' OR (status = 'replaying' AND lease_until <= ?))"""
+        params = [after_id, now]
+        if up_to_id is not None:
+            sql += " AND id <= ?"
+            params.append(up_to_id)
+        if destination:
+            sql += " AND destination = ?"
+            params.append(destination)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(sql + " ORDER BY id LIMIT 1", params).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE outbound SET status = 'replaying', lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                    (now + SPOOL_LEASE_SECONDS, row[0])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return None if row is None else (row[0], row[1], json.loads(row[2]), row[3] + 1)
+
+    def fail(self, entry_id, error):
+        """A replayed dead letter failed again - park it with the new error"""
+        self._conn().execute(
+            "UPDATE outbound SET status = 'failed', last_error = ? WHERE id = ?",
+            (error, entry_id)
+        )
+
+    def release(self, entry_id):
+        """Hand a claimed dead letter back untried, without spending one of its attempts"""
+        self._conn().execute(
+            "UPDATE outbound SET status = 'failed', attempts = attempts - 1 WHERE id = ?",
+            (entry_id,)
+        )
+
+    def dead_letters(self, limit=50, destination=None):
+        """Newest-first dead letters, for inspection"""
+        sql = "SELECT id, destination, payload, attempts, last_error, created_at FROM outbound WHERE status = 'failed'"
+        params = []
+        if destination:
+            sql += " AND destination = ?"
+            params.append(destination)
+        rows = self._conn().execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [{
+            "id": row[0],
+            "destination": row[1],
+            "contact_id": json.loads(row[2]).get("Contact ID", ""),
+            "attempts": row[3],
+            "last_error": row[4],
+            "created_at": datetime.fromtimestamp(row[5], timezone.utc).isoformat(),
+        } for row in rows]
+
+    def dead_letter_stats(self, destination=None):
+        """(count, highest id) of the dead letters waiting for a replay"""
+        sql = "SELECT COUNT(*), MAX(id) FROM outbound WHERE status = 'failed'"
+        params = []
+        if destination:
+            sql += " AND destination = ?"
+            params.append(destination)
+        count, last_id = self._conn().execute(sql, params).fetchone()
+        return count, last_id or 0
+
+    def dead_letter_count(self):
+        return self.dead_letter_stats()[0]
+
+
+class Dispatcher:
+    """Background threads that drain the spool through `send(destination, payload)`.
+
+    With batch_size > 1 each thread claims up to batch_size entries (waiting up to
+    batch_window for more after the first) and sends each destination's share as one
+    JSON array; every entry is still acked or retried on its own.
+    """
+
+    def __init__(self, spool, send, workers=SPOOL_WORKERS, poll_interval=SPOOL_POLL_INTERVAL,
+                 batch_size=1, batch_window=0):
+        self.spool = spool
+        self.send = send
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"spool-dispatcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} spool dispatcher(s) on {self.spool.path}")
+
+    def stop(self, timeout=30):
+        """Stop claiming new work and wait for in-flight deliveries to finish"""
+        self._stopping.set()
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.time()))
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                entries = self.spool.claim(self.batch_size)
+                if entries and len(entries) < self.batch_size and self.batch_window > 0:
+                    # give a spike a moment to fill the batch
+                    self._stopping.wait(self.batch_window)
+                    entries += self.spool.claim(self.batch_size - len(entries))
+            except sqlite3.Error as e:
+                logger.error(f"Spool claim failed: {e}")
+                entries = []
+            if not entries:
+                self._stopping.wait(self.poll_interval)
+                continue
+            by_destination = OrderedDict()
+            for entry in entries:
+                by_destination.setdefault(entry[1], []).append(entry)
+            for i, (destination, batch) in enumerate(by_destination.items()):
+                self._guarded(self._deliver_share, i > 0, destination, batch)
+
+    def _guarded(self, func, *args):
+        """Run one delivery with its spool bookkeeping; an error (e.g. "database is locked" from
+        ack/retry/defer) is logged and the entries wait for their lease to run out, while the
+        dispatcher thread keeps draining"""
+        try:
+            func(*args)
+        except Exception as e:
+            logger.error(f"❌ Spool delivery failed, entries stay leased until they expire: {e.__class__.__name__}: {e}")
+
+    def _deliver_share(self, renew, destination, batch):
+        if renew:
+            # these waited while earlier destinations were delivered
+            self.spool.renew(*[entry[0] for entry in batch])
+        if len(batch) == 1:
+            self._deliver(*batch[0])
+        else:
+            self._deliver_batch(destination, batch)
+
+    def _deliver(self, entry_id, destination, payload, attempts):
+        try:
+            response = self.send(destination, payload)
+        except DestinationUnavailable as e:
+            self.spool.defer(entry_id, e.retry_after, str(e))
+            return
+        except Exception as e:
+            self.spool.retry(entry_id, attempts, str(e))
+            return
+        if 200 <= response.status_code < 300:
+            self.spool.ack(entry_id)
+            logger.info(f"✓ Delivered spool entry {entry_id} (attempt {attempts}): {response.status_code}")
+        else:
+            self.spool.retry(entry_id, attempts, f"HTTP {response.status_code}: {response.text[:200]}")
+
+    def _resend(self, renew, entry):
+        if renew:
+            # each resend may use all its retries; a lease taken at claim time would run out
+            self.spool.renew(entry[0])
+        self._deliver(*entry)
+
+    def _deliver_batch(self, destination, batch):
+        try:
+            response = self.send(destination, [entry[2] for entry in batch])
+        except DestinationUnavailable as e:
+            for entry_id, _, _, _ in batch:
+                self.spool.defer(entry_id, e.retry_after, str(e))
+            return
+        except Exception as e:
+            for entry_id, _, _, attempts in batch:
+                self.spool.retry(entry_id, attempts, str(e))
+            return
+        if 200 <= response.status_code < 300:
+            self.spool.ack(*[entry[0] for entry in batch])
+            logger.info(f"✓ Delivered {len(batch)} spool entries in one batch: {response.status_code}")
+        elif rejects_batch(response, len(batch)):
+            # find the lead Zapier objects to instead of failing its neighbours with it
+            logger.warning(f"⚠️ Batch of {len(batch)} spool entries rejected with {response.status_code} - sending one by one")
+            for i, entry in enumerate(batch):
+                self._guarded(self._resend, i > 0, entry)
+        else:
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            for entry_id, _, _, attempts in batch:
+                self.spool.retry(entry_id, attempts, error)
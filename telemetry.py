@@ -0,0 +1,209 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# "text" keeps the classic synchronous log lines; "structured" writes JSON lines
+# from a background thread so the request thread never blocks on stdout/disk
+LOG_MODE = os.environ.get('LOG_MODE', 'text').lower()
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Fraction of requests whose payload/transcript details are logged even above DEBUG
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_current_trace = ContextVar('request_trace', default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; a `structured` dict passed via `extra` is merged in as-is"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        structured = getattr(record, 'structured', None)
+        if structured:
+            entry.update(structured)
+        else:
+            entry["msg"] = record.getMessage()
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Hand the record over untouched - message formatting happens on the writer thread"""
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging():
+    """Install root handlers for LOG_MODE; safe to call again (e.g. in a forked worker)"""
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+
+    if LOG_MODE != 'structured':
+        if not root.handlers:
+            logging.basicConfig(level=LOG_LEVEL, format=TEXT_FORMAT)
+        return
+
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
+
+
+class RequestTrace:
+    """Per-request stage timings and summary fields, emitted as one record at the end"""
+
+    def __init__(self, budget=0):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+        self.sampled = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+        self.deadline = self.started + budget if budget > 0 else None
+        self.skipped = []
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[name] = round(self.stages.get(name, 0) + elapsed, 3)
+
+    def elapsed(self):
+        """Seconds since the request started"""
+        return time.perf_counter() - self.started
+
+    def remaining(self):
+        """Seconds left of the request's budget (None when it has none)"""
+        return None if self.deadline is None else self.deadline - time.perf_counter()
+
+    def summary(self):
+        record = {"event": "webhook", "duration_ms": round(self.elapsed() * 1000, 3)}
+        record.update(self.fields)
+        record["stages_ms"] = self.stages
+        return record
+
+
+@contextmanager
+def request_trace(budget=0):
+    """Make a new RequestTrace current for the duration of a request, with `budget` seconds to finish in (0 = no limit)"""
+    trace = RequestTrace(budget)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current request (no-op outside a request, e.g. in replay.py)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+def record(**fields):
+    """Attach summary fields to the current request record"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def within_budget(step, reserve):
+    """Whether optional `step` may still run: False, and the step noted as skipped, once the
+    current request has `reserve` seconds or less of its budget left (always True outside one)"""
+    trace = _current_trace.get()
+    if trace is None or trace.deadline is None or trace.remaining() > reserve:
+        return True
+    trace.skipped.append(step)
+    return False
+
+
+def skipped_steps():
+    """Optional steps the current request has skipped so far"""
+    trace = _current_trace.get()
+    return list(trace.skipped) if trace is not None else []
+
+
+def request_deadline():
+    """The current request's deadline as a time.perf_counter() value, None without one"""
+    trace = _current_trace.get()
+    return trace.deadline if trace is not None else None
+
+
+def details_enabled(logger):
+    """Whether payload dumps / transcript previews are worth building for this request"""
+    if logger.isEnabledFor(logging.DEBUG):
+        return True
+    trace = _current_trace.get()
+    return trace is not None and trace.sampled
+
+
+def detail(logger, msg, *args):
+    """Log a verbose detail line: DEBUG normally, INFO for sampled requests; formatting is lazy"""
+    trace = _current_trace.get()
+    if trace is not None and trace.sampled:
+        logger.info(msg, *args)
+    else:
+        logger.debug(msg, *args)
+
+
+def emit_summary(logger, trace, level=logging.INFO):
+    """Write the request's one summary record"""
+    if not logger.isEnabledFor(level):
+        return
+    summary = trace.summary()
+    logger.log(level, "webhook %s", _JsonArg(summary), extra={"structured": summary})
+
+
+class _JsonArg:
+    """Defers json.dumps until a text handler actually formats the message"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, default=str)
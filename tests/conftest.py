@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the app's modules and benchmarks/ are imported as top-level modules, as the app runs them
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
@@ -0,0 +1,51 @@
+"""Transcript archive writer: bad input must never stop archiving."""
+import time
+
+from archive import TranscriptArchive
+
+
+def wait_for(archive, contact_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        entries = archive.get(contact_id)
+        if entries:
+            return entries
+        time.sleep(0.02)
+    return []
+
+
+def test_numeric_contact_id_is_archived(tmp_path):
+    archive = TranscriptArchive(str(tmp_path), flush_seconds=0.01)
+    archive.add(12345, "Caller: hello")
+    entries = wait_for(archive, "12345")
+    archive.stop()
+    assert [entry["transcript"] for entry in entries] == ["Caller: hello"]
+
+
+def test_writer_survives_a_failing_batch(tmp_path, monkeypatch):
+    archive = TranscriptArchive(str(tmp_path), batch_size=1, flush_seconds=0.01)
+    append = archive._append
+    calls = []
+
+    def flaky(rows):
+        calls.append(rows)
+        if len(calls) == 1:
+            raise ValueError("bad record")
+        append(rows)
+
+    monkeypatch.setattr(archive, "_append", flaky)
+    archive.add("c1", "first")
+    archive.add("c2", "second")
+    assert wait_for(archive, "c2")
+    archive.stop()
+
+
+def test_dead_writer_is_restarted(tmp_path):
+    archive = TranscriptArchive(str(tmp_path), flush_seconds=0.01)
+    archive.add("c1", "first")
+    assert wait_for(archive, "c1")
+    archive._queue.put(None)  # ends the writer thread
+    archive._writer[1].join(5)
+    archive.add("c2", "second")
+    assert wait_for(archive, "c2")
+    archive.stop()
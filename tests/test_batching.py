@@ -0,0 +1,76 @@
+"""Coalescer shutdown and the spool dispatcher: per-lead resends of a rejected batch, spool errors."""
+import sqlite3
+import time
+
+import pytest
+
+from batching import Coalescer
+from circuit import DestinationUnavailable
+from spool import OutboundSpool, Dispatcher
+
+
+class Response:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+def test_submit_after_stop_fails_at_once():
+    coalescer = Coalescer(lambda destination, payload, deadline=None: Response(200), max_size=2, window=0.01)
+    coalescer.stop()
+    future = coalescer.submit("https://hooks.example/a", {"Contact ID": "c1"})
+    with pytest.raises(DestinationUnavailable, match="shutting down"):
+        future.result(timeout=1)
+
+
+def test_rejected_batch_renews_each_lease_before_its_resend(tmp_path):
+    spool = OutboundSpool(str(tmp_path / "spool.db"))
+    ids = [spool.enqueue("https://hooks.example/a", {"Contact ID": f"c{i}"}) for i in range(3)]
+    leases = {}
+
+    def send(destination, payload):
+        if isinstance(payload, list):
+            return Response(400, "bad lead in batch")
+        # the lease this entry holds when its own resend starts
+        entry_id = ids[int(payload["Contact ID"][1:])]
+        leases[entry_id] = spool._conn().execute(
+            "SELECT lease_until FROM outbound WHERE id = ?", (entry_id,)).fetchone()[0]
+        time.sleep(0.05)
+        return Response(200)
+
+    dispatcher = Dispatcher(spool, send, batch_size=3)
+    batch = spool.claim(3)
+    claimed_until = spool._conn().execute("SELECT MAX(lease_until) FROM outbound").fetchone()[0]
+    dispatcher._deliver_batch("https://hooks.example/a", batch)
+    assert sorted(leases) == ids
+    assert leases[ids[1]] > claimed_until and leases[ids[2]] > leases[ids[1]]
+    assert spool.depth() == 0
+
+
+def test_dispatcher_survives_spool_errors(tmp_path):
+    spool = OutboundSpool(str(tmp_path / "spool.db"))
+    first = spool.enqueue("https://hooks.example/a", {"Contact ID": "c1"})
+    ack = spool.ack
+    acked = []
+
+    def locked_once(*entry_ids):
+        if not acked:
+            acked.append(None)
+            raise sqlite3.OperationalError("database is locked")
+        acked.extend(entry_ids)
+        ack(*entry_ids)
+
+    spool.ack = locked_once
+    dispatcher = Dispatcher(spool, lambda destination, payload: Response(200), workers=1, poll_interval=0.01)
+    dispatcher.start()
+    try:
+        second = spool.enqueue("https://hooks.example/a", {"Contact ID": "c2"})
+        deadline = time.monotonic() + 5
+        while second not in acked and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert second in acked
+        assert dispatcher._threads[0].is_alive()
+        # the entry whose ack failed is still leased, not lost
+        assert spool._conn().execute("SELECT status FROM outbound WHERE id = ?", (first,)).fetchone()[0] == 'inflight'
+    finally:
+        dispatcher.stop()
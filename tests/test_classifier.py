@@ -0,0 +1,216 @@
+"""Practice-area classification: the automaton against the keyword loops it replaced."""
+import random
+
+import pytest
+
+import app
+from classifier import classify_practice_area, classify_batch
+
+# The keyword loops of the original extract_practice_area, in their original order
+
+LEGACY_PRACTICE_AREAS = [
+    ("Personal Injury", [
+        "personal injury", "accident", "injury", "hurt", "slip and fall", "car accident", "auto accident",
+        "motor vehicle", "medical malpractice", "wrongful death", "premises liability", "product liability",
+        "dog bite", "bicycle accident", "motorcycle accident", "pedestrian accident", "nursing home abuse",
+        "construction accident", "workplace injury"
+    ]),
+    ("Family Law", [
+        "divorce", "custody", "child support", "alimony", "spousal support", "marriage", "separation",
+        "adoption", "family", "spouse", "prenup", "prenuptial", "domestic violence", "restraining order",
+        "paternity", "visitation", "guardianship", "child custody", "domestic relations"
+    ]),
+    ("DUI/DWI", [
+        "dui", "dwi", "owi", "drunk driving", "driving under influence", "driving under the influence",
+        "intoxicated driving", "impaired driving"
+    ]),
+    ("Traffic Law", [
+        "speeding ticket", "traffic ticket", "speeding", "traffic violation", "traffic offense",
+        "moving violation", "reckless driving", "careless driving"
+    ]),
+    ("Criminal Law", [
+        "criminal", "arrest", "arrested", "charge", "charged", "offense", "crime", "theft", "shoplifting",
+        "stealing", "assault", "battery", "probation", "jail", "prison", "felony", "misdemeanor", "warrant",
+        "drug", "trafficking", "possession", "domestic violence", "fraud", "embezzlement", "burglary",
+        "robbery", "homicide", "manslaughter", "larceny", "petty theft", "grand theft", "citation"
+    ]),
+    ("Estate Planning", [
+        "estate", "will", "trust", "inheritance", "probate", "executor", "beneficiary", "death", "asset",
+        "living will", "power of attorney", "estate planning", "succession", "heir", "testamentary",
+        "guardian", "conservatorship", "elder law", "medicaid planning"
+    ]),
+    ("Bankruptcy", [
+        "bankruptcy", "chapter 7", "chapter 13", "debt", "creditor", "discharge", "filing bankruptcy",
+        "debt relief", "debt settlement"
+    ]),
+    ("Real Estate", [
+        "real estate", "property", "house", "home", "closing", "deed", "title", "mortgage", "foreclosure",
+        "landlord", "tenant", "lease", "eviction", "zoning", "easement", "boundary", "construction",
+        "homeowners association", "hoa", "purchase agreement"
+    ]),
+    ("Business Law", [
+        "business", "contract", "llc", "corporation", "partnership", "employment", "fired",
+        "wrongful termination", "discrimination", "harassment", "wage", "overtime", "breach of contract",
+        "lawsuit", "commercial", "intellectual property", "trademark", "copyright", "non-compete",
+        "partnership dispute", "shareholder"
+    ]),
+    ("Immigration", [
+        "immigration", "visa", "green card", "citizenship", "deportation", "asylum", "refugee",
+        "work permit", "naturalization", "ice", "immigration court", "removal proceedings",
+        "family petition"
+    ]),
+    ("Social Security Disability", [
+        "disability", "social security", "ssdi", "ssi", "disabled", "disability benefits",
+        "social security disability"
+    ]),
+    ("Workers' Compensation", [
+        "workers compensation", "workers comp", "work injury", "on the job injury", "workplace accident",
+        "injured at work"
+    ]),
+    ("Civil Rights", [
+        "civil rights", "discrimination", "police brutality", "excessive force", "constitutional rights",
+        "section 1983", "civil lawsuit"
+    ]),
+    ("Tax Law", [
+        "tax", "irs", "tax debt", "tax lien", "tax levy", "audit", "tax resolution", "offer in compromise",
+        "innocent spouse"
+    ]),
+]
+LEGACY_DRIVING_TERMS = ['careless driv', 'reckless driv', 'traffic ticket', 'speeding ticket']
+
+
+def legacy_extract_practice_area(description):
+    if not description:
+        return "Other"
+    description_lower = description.lower()
+    for practice_area, keywords in LEGACY_PRACTICE_AREAS:
+        for keyword in keywords:
+            if keyword in description_lower:
+                return practice_area
+    return "General"
+
+
+def legacy_practice_area(description):
+    """The old keyword loop plus the driving-term override applied after it"""
+    practice_area = legacy_extract_practice_area(description)
+    if any(term in (description or "").lower() for term in LEGACY_DRIVING_TERMS):
+        if practice_area not in ['Traffic Law', 'DUI/DWI']:
+            practice_area = "Traffic Law"
+    return practice_area
+
+
+CORPUS = [
+    None,
+    "",
+    "   ",
+    "Legal consultation request",
+    "I was in a car accident and my neck hurts",
+    "Slip and fall at the grocery store",
+    "My wife wants a divorce and custody of the kids",
+    "Arrested for DUI last night",
+    "Got a speeding ticket on the highway",
+    "Charged with reckless driving after a crash",
+    "Careless driving citation, the officer said I was at fault",
+    "Shoplifting charge, first offense",
+    "Need to update my will and set up a trust",
+    "Filing bankruptcy, chapter 7, creditors keep calling",
+    "Landlord is trying to evict me from my apartment, lease dispute",
+    "Fired after complaining about harassment at work",
+    "Green card renewal and a work permit question",
+    "Applying for SSDI after my back surgery",
+    "Injured at work, need workers compensation",
+    "Police brutality during a traffic stop",
+    "IRS audit and a tax lien on my house",
+    "Questions about the office lease for my business",
+    "He is willing to sign the deed over",
+    "Domestic violence - I need a restraining order",
+    "DWI and speeding, also careless driving",
+    "My heirloom jewelry was stolen",
+    "Trafficking charges dropped, now a civil lawsuit",
+    "PERSONAL INJURY CLAIM AFTER MOTORCYCLE ACCIDENT",
+    "Accidente de coche - necesito ayuda",
+    "Café owner sued for breach of contract",
+    "Drunk driving arrest, caller also mentioned a traffic ticket",
+    "Medical malpractice during childbirth, wrongful death of my father",
+]
+
+
+def generated_corpus(count=2000, seed=1234):
+    """Descriptions stitched from keywords of several areas, filler words and driving terms"""
+    rng = random.Random(seed)
+    keywords = [keyword for _, area_keywords in LEGACY_PRACTICE_AREAS for keyword in area_keywords]
+    filler = ["the", "my", "office", "willing", "police", "called", "about", "a", "driver", "help", "need"]
+    corpus = []
+    for _ in range(count):
+        words = rng.sample(filler, rng.randint(0, 5)) + rng.sample(keywords, rng.randint(0, 3))
+        if rng.random() < 0.2:
+            words.append(rng.choice(LEGACY_DRIVING_TERMS) + rng.choice(["", "ing", "er", "e"]))
+        rng.shuffle(words)
+        text = " ".join(words)
+        corpus.append(text.upper() if rng.random() < 0.1 else text)
+    return corpus
+
+
+@pytest.mark.parametrize("description", CORPUS)
+def test_matches_legacy_keyword_loop(description):
+    assert classify_practice_area(description, word_boundary=False).practice_area == legacy_extract_practice_area(description)
+
+
+def test_matches_legacy_keyword_loop_on_generated_corpus():
+    for description in generated_corpus():
+        classification = classify_practice_area(description, word_boundary=False)
+        assert classification.practice_area == legacy_extract_practice_area(description), description
+        assert classification.driving_term == any(term in description.lower() for term in LEGACY_DRIVING_TERMS), description
+
+
+def test_batch_first_match_agrees_with_single():
+    pytest.importorskip("numpy")
+    corpus = CORPUS + generated_corpus(500, seed=99)
+    batch = classify_batch(corpus, first_match=True, word_boundary=False)
+    for description, result in zip(corpus, batch):
+        single = classify_practice_area(description, word_boundary=False)
+        assert (result.practice_area, result.driving_term) == tuple(single), description
+
+
+DRIVING_CASES = [
+    ("I got hurt because the other guy was careless driving", "Traffic Law"),
+    ("Divorce, and my husband's reckless driver record", "Traffic Law"),
+    ("The careless drivers of this town, my estate plan", "Traffic Law"),
+    ("Got a speeding ticket", "Traffic Law"),
+    ("Drunk driving arrest, and a speeding ticket", "DUI/DWI"),
+    ("DWI and careless driving", "DUI/DWI"),
+    ("Car accident with a drunk driver", "Personal Injury"),
+]
+
+
+@pytest.mark.parametrize("description, expected", DRIVING_CASES)
+def test_driving_term_overrides_practice_area(description, expected):
+    payload = app.build_outbound_payload({"contact_id": "test", "tags": description})
+    assert payload["Practice Area"] == expected == legacy_practice_area(description)
+
+
+@pytest.mark.parametrize("description", [description for description, _ in DRIVING_CASES])
+def test_driving_term_flag(description):
+    assert classify_practice_area(description).driving_term == any(term in description.lower() for term in LEGACY_DRIVING_TERMS)
+
+
+@pytest.mark.parametrize("description, substring, boundary", [
+    ("Questions about the office lease", "Real Estate", "Real Estate"),
+    ("Trouble at my office", "Immigration", "General"),
+    ("He is willing to talk", "Estate Planning", "General"),
+    ("My heirloom jewelry", "Estate Planning", "General"),
+    ("Taxonomy of my legal questions", "Tax Law", "General"),
+    ("Detained by ICE yesterday", "Immigration", "Immigration"),
+    ("Need a will, a living will too", "Estate Planning", "Estate Planning"),
+    ("Injury (neck), car-accident", "Personal Injury", "Personal Injury"),
+])
+def test_word_boundary(description, substring, boundary):
+    assert classify_practice_area(description, word_boundary=False).practice_area == substring
+    assert classify_practice_area(description, word_boundary=True).practice_area == boundary
+
+
+def test_word_boundary_keeps_driving_stems():
+    # driving terms are stems: only their start must sit on a word boundary
+    assert classify_practice_area("two careless drivers", word_boundary=True).driving_term
+    assert classify_practice_area("a reckless driving charge", word_boundary=True).driving_term
+    assert not classify_practice_area("uncareless driving", word_boundary=True).driving_term
@@ -0,0 +1,106 @@
+"""Dead-letter replay outcomes and read-only inspection."""
+import sqlite3
+
+import pytest
+
+import app
+from deadletter import ReplayJob
+from http_client import OutboundClient
+from routing import Destination
+from spool import OutboundSpool
+
+
+class Response:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+def park(spool, count, destination="https://hooks.example/a"):
+    return [spool.dead_letter(destination, {"Contact ID": f"c{i}"}, 1, "HTTP 500") for i in range(count)]
+
+
+def status_of(spool, entry_id):
+    row = spool._conn().execute("SELECT status FROM outbound WHERE id = ?", (entry_id,)).fetchone()
+    return row[0] if row else None
+
+
+def test_replay_acks_delivered_and_parks_failed(tmp_path):
+    spool = OutboundSpool(str(tmp_path / "spool.db"))
+    ok, bad = park(spool, 2)
+    sent = {}
+
+    def send(destination, payload):
+        sent[payload["Contact ID"]] = True
+        return Response(200 if payload["Contact ID"] == "c0" else 502, "bad gateway")
+
+    progress = ReplayJob(spool, send, rate=0).run()
+    assert (progress["delivered"], progress["failed"]) == (1, 1)
+    assert status_of(spool, ok) is None
+    assert status_of(spool, bad) == 'failed'
+
+
+def test_ack_failure_never_parks_a_delivered_lead(tmp_path):
+    spool = OutboundSpool(str(tmp_path / "spool.db"))
+    entry_id, = park(spool, 1)
+    failed = []
+
+    def broken_ack(*entry_ids):
+        raise sqlite3.OperationalError("database is locked")
+
+    spool.ack = broken_ack
+    spool.fail = lambda entry_id, error: failed.append(entry_id)
+    progress = ReplayJob(spool, lambda destination, payload: Response(200), rate=0).run()
+    assert progress["delivered"] == 1 and progress["failed"] == 0
+    assert failed == []
+    # left leased: the lease runs out and a later replay picks it up again
+    assert status_of(spool, entry_id) == 'replaying'
+
+
+def test_listing_dead_letters_starts_no_dispatcher(tmp_path, monkeypatch):
+    path = str(tmp_path / "spool.db")
+    park(OutboundSpool(path), 3)
+    monkeypatch.setattr(app, "SPOOL_PATH", path)
+    monkeypatch.setattr(app, "DEAD_LETTER_API_TOKEN", "secret")
+    monkeypatch.setattr(app, "_spool", None)
+    monkeypatch.setattr(app, "_spool_reader", None)
+    monkeypatch.setattr(app, "get_spool", lambda: (_ for _ in ()).throw(AssertionError("spool opened for writing")))
+    body, status = app.list_dead_letters({}, "Bearer secret")
+    assert status == 200
+    assert body["count"] == 3 and len(body["dead_letters"]) == 3
+    assert app._dispatcher is None
+
+
+def test_read_only_spool_cannot_write(tmp_path):
+    path = str(tmp_path / "spool.db")
+    park(OutboundSpool(path), 1)
+    reader = OutboundSpool(path, read_only=True)
+    assert reader.dead_letter_count() == 1
+    with pytest.raises(sqlite3.OperationalError):
+        reader.enqueue("https://hooks.example/a", {})
+
+
+class FakeSession:
+    def __init__(self, status_codes):
+        self.status_codes = list(status_codes)
+
+    def post(self, url, json=None, timeout=None):
+        response = Response(self.status_codes.pop(0))
+        response.headers = {}
+        response.close = lambda: None
+        return response
+
+
+def test_dead_letter_records_every_attempt(tmp_path, monkeypatch):
+    spool = OutboundSpool(str(tmp_path / "spool.db"))
+    monkeypatch.setattr(app, "get_spool", lambda: spool)
+    monkeypatch.setattr(app, "DEAD_LETTERS", True)
+    client = OutboundClient(max_attempts=3, backoff_base=0, backoff_max=0)
+    monkeypatch.setattr(client, "_session", lambda url: FakeSession([500, 503, 500]))
+    destination = Destination("zapier", "https://hooks.example/a", 30)
+
+    response = client.post_json(destination.url, {"Contact ID": "c1"})
+    app.settle_deliveries([(destination, response)], {"Contact ID": "c1"})
+
+    assert response.attempts == 3
+    assert spool.dead_letters()[0]["attempts"] == 3
@@ -0,0 +1,66 @@
+"""In-process idempotency cache: duplicates wait for the original and get its answer."""
+import threading
+import time
+
+from dedupe import IdempotencyCache
+
+
+def claim_in_thread(cache, key, results):
+    def run():
+        started = time.monotonic()
+        results.append((cache.claim(key), time.monotonic() - started))
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_duplicate_gets_the_recorded_result():
+    cache = IdempotencyCache(window=60, wait_seconds=5, db_path='')
+    assert cache.claim("k") is None
+    cache.release("k", ("OK", 200))
+    assert cache.claim("k") == ("OK", 200)
+
+
+def test_failure_lets_the_next_retry_process_it():
+    cache = IdempotencyCache(window=60, wait_seconds=5, db_path='')
+    assert cache.claim("k") is None
+    waiter = []
+    thread = claim_in_thread(cache, "k", waiter)
+    time.sleep(0.05)
+    cache.release("k", None)
+    thread.join(2)
+    assert waiter[0][0] is None
+
+
+def test_timed_out_waiter_does_not_strand_the_others():
+    cache = IdempotencyCache(window=60, wait_seconds=0.5, db_path='')
+    assert cache.claim("k") is None  # the original
+    first, second = [], []
+    first_thread = claim_in_thread(cache, "k", first)  # gives up at 0.5 s and processes it too
+    time.sleep(0.3)
+    second_thread = claim_in_thread(cache, "k", second)  # would give up at 0.8 s
+    first_thread.join(2)
+    assert first[0][0] is None
+    time.sleep(0.1)
+    cache.release("k", ("OK", 200))  # the original finishes at ~0.6 s
+    second_thread.join(2)
+    result, waited = second[0]
+    assert result == ("OK", 200)
+    assert waited < 0.45
+    cache.release("k", ("OK", 200))  # the second owner finishing is harmless
+    assert cache.claim("k") == ("OK", 200)
+
+
+def test_second_owner_release_wakes_waiters():
+    cache = IdempotencyCache(window=60, wait_seconds=0.3, db_path='')
+    assert cache.claim("k") is None  # the original, which never finishes
+    owner = []
+    claim_in_thread(cache, "k", owner).join(2)
+    assert owner[0][0] is None
+    waiter = []
+    thread = claim_in_thread(cache, "k", waiter)
+    time.sleep(0.1)
+    cache.release("k", ("OK", 200))
+    thread.join(2)
+    assert waiter[0][0] == ("OK", 200)
+    assert waiter[0][1] < 0.25
@@ -0,0 +1,63 @@
+"""Caller-info extraction on adversarial 100 KB transcripts: every pass must stay linear."""
+import threading
+
+import pytest
+
+import app
+from bench import adversarial_transcripts
+from spoken import find_spoken_email, find_spoken_phone, tokenize
+
+# Each call takes well under 0.2 s; the backtracking regexes these inputs were built
+# against did not finish a 20 KB slice in two minutes
+TIME_BOUND_SECONDS = 2
+
+ADVERSARIAL = adversarial_transcripts()
+
+
+def run_within(seconds, func, *args):
+    """func(*args), failing the test if it is still running after `seconds`.
+
+    The call runs on a daemon thread so a runaway regex cannot hang the suite.
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func(*args)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    if thread.is_alive():
+        pytest.fail(f"{func.__name__} still running after {seconds}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+@pytest.mark.parametrize("label", sorted(ADVERSARIAL))
+def test_extract_caller_info_is_bounded(label):
+    info = run_within(TIME_BOUND_SECONDS, app.extract_caller_info_from_transcript, ADVERSARIAL[label])
+    assert isinstance(info, dict)
+
+
+@pytest.mark.parametrize("label", sorted(ADVERSARIAL))
+def test_summarize_is_bounded(label):
+    summary = run_within(TIME_BOUND_SECONDS, app.summarize_transcript, ADVERSARIAL[label])
+    assert len(summary) <= 203
+
+
+@pytest.mark.parametrize("label", sorted(ADVERSARIAL))
+def test_spoken_scans_are_bounded(label):
+    tokens = run_within(TIME_BOUND_SECONDS, tokenize, ADVERSARIAL[label].lower())
+    run_within(TIME_BOUND_SECONDS, find_spoken_phone, tokens)
+    run_within(TIME_BOUND_SECONDS, find_spoken_email, tokens)
+
+
+@pytest.mark.parametrize("label", sorted(ADVERSARIAL))
+def test_webhook_payload_is_bounded(label):
+    data = {"contact_id": label, "customData": {"transcript": ADVERSARIAL[label]}}
+    payload = run_within(TIME_BOUND_SECONDS, app.build_outbound_payload, data)
+    assert payload["Contact ID"] == label
@@ -0,0 +1,41 @@
+"""Webhook body parsing, and the answer for bodies that hold no lead."""
+import asyncio
+
+import pytest
+
+import app
+import asgi
+from ingest import NotAnObject, parse_body
+
+
+def test_keeps_only_pipeline_fields():
+    body = b'{"contact_id": "c1", "attachment": "' + b"x" * 1000 + b'", "customData": {"transcript": "hi", "junk": 1}}'
+    assert parse_body(body) == {"contact_id": "c1", "customData": {"transcript": "hi"}}
+
+
+@pytest.mark.parametrize("body", [b"", b"  \r\n", b"[]", b'[{"contact_id": "c1"}]', b'"text"', b"42", b"null", b"true"])
+def test_non_object_bodies_are_rejected(body):
+    with pytest.raises(NotAnObject):
+        parse_body(body)
+
+
+@pytest.mark.parametrize("body", [b"{", b"[1,", b"nope", b'{"a": 1} x'])
+def test_malformed_json_is_a_value_error(body):
+    with pytest.raises(ValueError) as info:
+        parse_body(body)
+    assert not isinstance(info.value, NotAnObject)
+
+
+@pytest.mark.parametrize("body", [b"", b"[]", b'["contact_id"]', b'"lead"', b"0"])
+def test_flask_answers_400_without_delivering(body, monkeypatch):
+    monkeypatch.setattr(app, "deliver_lead", lambda *args: pytest.fail("a blank lead was delivered"))
+    response = app.app.test_client().post('/', data=body, content_type='application/json')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("body", [b"", b"[]", b'["contact_id"]', b'"lead"', b"0"])
+def test_asgi_answers_400_without_delivering(body, monkeypatch):
+    monkeypatch.setattr(asgi, "_send_lead", lambda *args: pytest.fail("a blank lead was delivered"))
+    monkeypatch.setattr(asgi, "_executor", None)
+    text, status = asyncio.run(asgi.webhook_listener(body))
+    assert status == 400
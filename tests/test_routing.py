@@ -0,0 +1,80 @@
+"""Multi-destination delivery: only the primary destination decides the answer to GHL."""
+import json
+import logging
+
+import pytest
+
+import app
+import routing
+from circuit import DestinationUnavailable
+from routing import Destination
+from spool import OutboundSpool
+
+PRIMARY = Destination("primary", "https://hooks.example/primary", 30)
+COPY = Destination("copy", "https://hooks.example/copy", 30)
+PAYLOAD = {"Contact ID": "c1"}
+
+
+class Response:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    spool = OutboundSpool(str(tmp_path / "spool.db"))
+    monkeypatch.setattr(app, "get_spool", lambda: spool)
+    return spool
+
+
+def pending(spool):
+    return [row[0] for row in spool._conn().execute("SELECT destination FROM outbound WHERE status = 'pending'")]
+
+
+def test_unavailable_copy_is_spilled_even_when_rejecting(spool, monkeypatch):
+    monkeypatch.setattr(app, "OVERLOAD_ACTION", "reject")
+    outcomes = [(PRIMARY, Response(200)), (COPY, DestinationUnavailable(COPY.url, "circuit open", 30))]
+
+    assert app.settle_deliveries(outcomes, PAYLOAD) == ("OK", 200)
+    assert pending(spool) == [COPY.url]
+
+
+def test_unavailable_primary_still_rejects(spool, monkeypatch):
+    monkeypatch.setattr(app, "OVERLOAD_ACTION", "reject")
+    outcomes = [(PRIMARY, DestinationUnavailable(PRIMARY.url, "circuit open", 30)), (COPY, Response(200))]
+
+    assert app.settle_deliveries(outcomes, PAYLOAD)[1] == 503
+    assert pending(spool) == []
+
+
+def test_failed_copy_is_spooled_without_dead_letters(spool, monkeypatch):
+    monkeypatch.setattr(app, "DEAD_LETTERS", False)
+    outcomes = [(PRIMARY, Response(200)), (COPY, ConnectionError("reset"))]
+
+    assert app.settle_deliveries(outcomes, PAYLOAD) == ("OK", 200)
+    assert pending(spool) == [COPY.url]
+
+
+def test_failed_primary_without_dead_letters_fails_the_request(spool, monkeypatch):
+    monkeypatch.setattr(app, "DEAD_LETTERS", False)
+    outcomes = [(PRIMARY, ConnectionError("reset")), (COPY, Response(200))]
+
+    with pytest.raises(ConnectionError):
+        app.settle_deliveries(outcomes, PAYLOAD)
+
+
+def test_unknown_practice_area_in_routes_is_flagged(tmp_path, caplog):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({
+        "destinations": {"pi": "https://hooks.example/pi"},
+        "routes": [{"match": {"Practice Area": ["Personal Injury", "Workers Compensation"]}, "to": ["pi"]},
+                   {"match": {"Practice Area": ["Workers' Compensation", "General"]}, "to": ["pi"]}],
+    }))
+
+    with caplog.at_level(logging.WARNING, logger="routing"):
+        routing.load_routing_table("https://hooks.example/zapier", str(path))
+
+    warnings = [r.getMessage() for r in caplog.records]
+    assert len(warnings) == 1
+    assert "Route 0" in warnings[0] and "workers compensation" in warnings[0]
@@ -0,0 +1,57 @@
+import re
+from collections import namedtuple
+
+# Speaker labels that mark the person calling in (vs the AI receptionist)
+CALLER_SPEAKERS = ('human', 'caller')
+
+# "Human: ...", "caller: ...", "**Caller:** ...", "* Caller:** ..." - label plus any markdown stars
+_PREFIX_RE = re.compile(r"[ \t]*\**[ \t]*([A-Za-z][A-Za-z ]{0,24}?)[ \t]*\**[ \t]*:[ \t]*\**[ \t]*")
+
+# speaker: lowercased label ('' when the line has none); start/end: offsets of `text`
+# in the original transcript; text: the line with its prefix removed; lower: text.lower()
+Turn = namedtuple('Turn', ['speaker', 'start', 'end', 'text', 'lower'])
+
+ParsedTranscript = namedtuple('ParsedTranscript', ['text', 'lower', 'turns'])
+
+
+def parse_transcript(transcription):
+    """Tokenize a transcript once into immutable speaker turns"""
+    if isinstance(transcription, ParsedTranscript):
+        return transcription
+    text = transcription or ""
+    lower = text.lower()
+    # lower() can change the length of some non-ASCII text; then offsets into it are useless
+    aligned = len(lower) == len(text)
+
+    turns = []
+    pos = 0
+    length = len(text)
+    while pos <= length:
+        newline = text.find('\n', pos)
+        if newline == -1:
+            newline = length
+        start, end = pos, newline
+        pos = newline + 1
+
+        prefix = _PREFIX_RE.match(text, start, end)
+        speaker = ''
+        if prefix:
+            speaker = prefix.group(1).lower()
+            start = prefix.end()
+        # strip surrounding whitespace without copying the line first
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            continue
+
+        line = text[start:end]
+        turns.append(Turn(speaker, start, end, line, lower[start:end] if aligned else line.lower()))
+
+    return ParsedTranscript(text, lower, tuple(turns))
+
+
+def caller_turns(parsed):
+    """Turns spoken by the caller, in order"""
+    return [turn for turn in parsed.turns if turn.speaker in CALLER_SPEAKERS]